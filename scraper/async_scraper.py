@@ -0,0 +1,246 @@
+# scraper/async_scraper.py
+
+import os
+import random
+import asyncio
+
+from scraper.playwright_scraper import USER_AGENTS, VIEWPORTS, get_scraper, print_flush
+from scraper.events import emit, is_ndjson, log_prefix
+from scraper.domains import get_site, load_scraper, scrape_kwargs, FALLBACK_SITE
+from scraper.playwright_utils import simulate_human_behavior_async, iter_adaptive_scroll_async, extract_images_async
+from scraper.request_filter import install_request_filter_async
+from scraper.network_capture import ImageCapture, capture_enabled
+from scraper.static_fetch import scrape_static, static_first_enabled
+from scraper.metrics import track_scrape, span, current_metrics
+from scraper.host_scheduler import get_scheduler
+from scraper import nav_policy
+from scraper.recurring_assets import drop_recurring, recurring_for, record_chapter, normalize_asset
+
+# same fingerprint randomizing as new_context() in playwright_scraper, just awaited
+async def new_context_async(browser):
+    user_agent = random.choice(USER_AGENTS)
+    viewport_width, viewport_height = random.choice(VIEWPORTS)
+    return await browser.new_context(
+        user_agent=user_agent,
+        viewport={"width": viewport_width, "height": viewport_height}
+    )
+
+# scrape one chapter on an async page, picks the domain scraper the same way scrape_page does
+async def scrape_page_async(page, url, use_lazy=False, capture=None):
+    site = get_site(url)
+    scraper = load_scraper(site)
+
+    if capture is not None:
+        await capture.install_async(page)
+
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.watch_page(page)
+
+    # the host's slot is only held for the navigation, see scrape_page.
+    # timeouts and retries come from the site's latency history, all of it within one deadline
+    scheduler = get_scheduler()
+    with nav_policy.scrape_deadline():
+        # the generic scraper's request filter has to be on before the first request goes out
+        if site is FALLBACK_SITE:
+            await install_request_filter_async(page, url)
+        async with scheduler.slot_async(url):
+            print_flush(f"[*] Navigating to URL: {url}")
+            with span("goto"):
+                response = await nav_policy.goto_async(page, url)
+        if response is not None:
+            scheduler.report(url, response.status, response.headers.get("retry-after"))
+
+        image_urls = await scraper.scrape_async(page, url, **scrape_kwargs(site, use_lazy))
+
+    # sqlite (and range requests with RECURRING_HASHES) stay off the event loop
+    image_urls = await asyncio.to_thread(drop_recurring, url, image_urls)
+
+    if capture is not None:
+        image_urls = capture.report(image_urls)
+    return image_urls
+
+# async iter_page_images (playwright_scraper.py), yields (page_index, url) while the page scrolls
+async def iter_page_images_async(page, url, use_lazy=True):
+    site = get_site(url)
+    scraper = load_scraper(site)
+    scroll = use_lazy if site["lazy_scroll"] is None else site["lazy_scroll"]
+
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.watch_page(page)
+    request_stats = await install_request_filter_async(page, url)
+
+    # slot only for the navigation, same as scrape_page_async
+    scheduler = get_scheduler()
+    with nav_policy.scrape_deadline():
+        async with scheduler.slot_async(url):
+            print_flush(f"[*] Navigating to URL: {url}")
+            with span("goto"):
+                response = await nav_policy.goto_async(page, url)
+        if response is not None:
+            scheduler.report(url, response.status, response.headers.get("retry-after"))
+
+        with span("simulate"):
+            await simulate_human_behavior_async(page)
+
+        recurring = await asyncio.to_thread(recurring_for, url)
+        seen = set()
+        found = []
+        def keep(record):
+            src = scraper.keep_image(record, url)
+            if not src or src in seen:
+                return None
+            seen.add(src)
+            if normalize_asset(src) in recurring:
+                return None
+            found.append(src)
+            return src
+
+        if scroll:
+            async for record in iter_adaptive_scroll_async(page):
+                src = keep(record)
+                if src:
+                    yield len(found) - 1, src
+        else:
+            if site is not FALLBACK_SITE:
+                with span("wait_selector"):
+                    await nav_policy.wait_for_selector_async(page, url, site["image_selector"])
+            with span("extract"):
+                records = await extract_images_async(page, site["image_selector"])
+            for record in records:
+                src = keep(record)
+                if src:
+                    yield len(found) - 1, src
+
+    await asyncio.to_thread(record_chapter, url, list(seen))
+    request_stats.summary()
+
+#   async with contextlib.aclosing(iter_chapter_images_async(url)) as images:
+#       async for index, src in images: ...
+# own playwright + browser. aclosing() shuts the browser right away if the loop breaks early,
+# without it that waits until the generator gets garbage collected
+async def iter_chapter_images_async(url, use_lazy=True):
+    from playwright.async_api import async_playwright
+
+    with track_scrape(url) as metrics:
+        async with async_playwright() as p:
+            with span("launch"):
+                browser = await p.chromium.launch(headless=True)
+                page = await (await new_context_async(browser)).new_page()
+            try:
+                async for item in iter_page_images_async(page, url, use_lazy):
+                    metrics.count("images_found")
+                    yield item
+            finally:
+                with span("close"):
+                    await browser.close()
+
+# scrape a bunch of chapters at the same time in one browser.
+# every url gets its own context, results come back in the same order as urls and one bad
+# chapter just gets ok=False instead of taking the whole batch down
+async def scrape_many(urls, concurrency=4, use_lazy=False, on_result=None, capture_images=False, static_first=False):
+    results = [None] * len(urls)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+
+        # one chapter, everything that can go wrong for it stays in here so gather() never sees it
+        async def scrape_one(url, result):
+            # each gather() task has its own context, so chapters in flight don't mix their timings
+            with track_scrape(url) as metrics:
+
+                # static tier runs in a thread so the blocking http call doesn't stall the other pages
+                if static_first:
+                    try:
+                        _, scraper = get_scraper(url)
+                        with span("static"):
+                            image_urls = await asyncio.to_thread(scrape_static, url, scraper)
+                    except Exception as e:
+                        print_flush(f"[!] Static tier failed for {url}, trying the browser ({e})", level="warn")
+                        image_urls = None
+                    if image_urls is not None:
+                        result.update(images=image_urls, ok=True, tier="static")
+
+                if not result["ok"]:
+                    context = None
+                    try:
+                        with span("launch"):
+                            context = await new_context_async(browser)
+                        page = await context.new_page()
+                        capture = ImageCapture() if capture_images else None
+                        result["images"] = await scrape_page_async(page, url, use_lazy=use_lazy, capture=capture)
+                        result["ok"] = True
+                    except Exception as e:
+                        result["error"] = str(e)
+                        print_flush(f"[!] Failed to scrape {url}: {e}")
+                    finally:
+                        if context is not None:
+                            with span("close"):
+                                await context.close()
+
+                metrics.tier = result["tier"]
+                metrics.ok = result["ok"]
+                metrics.error = result.get("error")
+                metrics.count("images_found", len(result["images"]))
+            return metrics.summary()
+
+        # every line this chapter logs gets its [Chapter N], the admin page drops lines without one
+        async def run(index, url):
+            with log_prefix(f"[Chapter {index + 1}]"):
+                await run_chapter(index, url)
+
+        async def run_chapter(index, url):
+            async with semaphore:
+                result = {"url": url, "ok": False, "images": [], "tier": "playwright"}
+                try:
+                    result["metrics"] = await scrape_one(url, result)
+                except Exception as e:
+                    # closing the context or the metrics bookkeeping blew up, still just this url
+                    result.update(ok=False, error=result.get("error") or str(e))
+                    print_flush(f"[!] Failed to scrape {url}: {e}")
+
+                results[index] = result
+                if on_result:
+                    on_result(index, result)
+
+        await asyncio.gather(*(run(i, url) for i, url in enumerate(urls)))
+        await browser.close()
+
+    return results
+
+# print a finished chapter the way the multi chapter admin page already parses it
+def print_chapter_result(index, result):
+    if is_ndjson():
+        emit("chapter", chapter=index + 1, **result)
+        return
+
+    prefix = f"[Chapter {index + 1}]"
+    if not result["ok"]:
+        print_flush(f"{prefix} Failed: {result.get('error', 'unknown error')}")
+    print_flush(f"{prefix} Served by tier: {result['tier']}")
+    for i, src in enumerate(result["images"], 1):
+        if i == 1:
+            print_flush(f"{prefix} Grabbed {i} picture: {src}")
+        else:
+            print_flush(f"{prefix} Grabbed {i} pictures: {src}")
+    print_flush(f"{prefix} Finished scraping.")
+
+# cli entry point, TARGET_URLS is one url per line (commas work too)
+if __name__ == "__main__":
+    raw_urls = os.getenv("TARGET_URLS") or input("Paste chapter URLs (comma separated): ")
+    target_urls = [u.strip() for u in raw_urls.replace(",", "\n").splitlines() if u.strip()]
+    use_lazy = os.getenv("USE_LAZY", "false").lower() == "true"
+    concurrency = int(os.getenv("SCRAPE_CONCURRENCY", "4"))
+
+    results = asyncio.run(scrape_many(
+        target_urls, concurrency=concurrency, use_lazy=use_lazy,
+        on_result=print_chapter_result, capture_images=capture_enabled(),
+        static_first=static_first_enabled(),
+    ))
+    if is_ndjson():
+        emit("result", ok=all(r["ok"] for r in results), chapters=results)
+    print_flush("Worm has wormed goodbye.")
@@ -0,0 +1,198 @@
+# scraper/benchmarks/fixture_site.py
+
+import zlib
+import struct
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# synthetic chapter / series pages served from localhost so scraping strategies can be timed
+# without touching a real site. everything is generated in memory, nothing on disk
+
+ASURA_MEDIA = "https://gg.asuracomic.net/storage/media/"
+AD_HOST = "https://pagead2.googlesyndication.com"
+
+# solid color png of any size. compresses down to a few KB so the server isn't the bottleneck
+def make_png(width, height):
+    row = b"\x00" + b"\xcc\xcc\xcc" * width
+    raw = zlib.compress(row * height, 9)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", raw) + chunk(b"IEND", b"")
+
+# swaps data-src into src once an image gets near the viewport, like most reader themes do
+LAZY_LOADER_JS = """
+<script>
+const io = new IntersectionObserver((entries) => {
+  for (const e of entries) {
+    if (!e.isIntersecting) continue;
+    e.target.src = e.target.dataset.src;
+    io.unobserve(e.target);
+  }
+}, { rootMargin: "200px" });
+document.querySelectorAll("img[data-src]").forEach((img) => io.observe(img));
+</script>
+"""
+
+# keeps appending pages while you scroll, until `total` are on the page
+INFINITE_SCROLL_JS = """
+<script>
+let next = %(start)d;
+const total = %(total)d;
+window.addEventListener("scroll", () => {
+  if (next >= total) return;
+  if (window.innerHeight + window.scrollY < document.body.scrollHeight - 400) return;
+  for (let i = 0; i < 5 && next < total; i++, next++) {
+    const img = document.createElement("img");
+    img.src = "/img/infinite/page-" + String(next).padStart(3, "0") + ".png";
+    img.width = 800; img.height = 1200;
+    document.getElementById("reader").appendChild(img);
+  }
+});
+</script>
+"""
+
+def page_html(body, extra=""):
+    return f"<!doctype html><html><head><title>bench</title></head><body>{body}{extra}</body></html>"
+
+class FixtureSite:
+    def __init__(self, pages=40, chapters=300, per_index_page=100):
+        self.pages = pages
+        self.chapters = chapters
+        self.per_index_page = per_index_page
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.expected = {}
+        self.reset_counters()
+        self.build()
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes = 0
+
+    def record(self, size):
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+
+    def add(self, path, body, content_type):
+        self.routes[path] = (content_type, body if isinstance(body, bytes) else body.encode("utf-8"))
+
+    # look up a path, counting it like a real request. None if we don't serve it
+    def serve(self, path):
+        path = path.split("?", 1)[0]
+        route = self.routes.get(path)
+        if route is None:
+            self.record(0)
+            return None
+        self.record(len(route[1]))
+        return route
+
+    def build(self):
+        page_png = make_png(800, 1200)
+        thumb_png = make_png(150, 200)
+        banner_png = make_png(728, 90)
+
+        def page_names(kind, count):
+            return [f"/img/{kind}/page-{i:03}.png" for i in range(count)]
+
+        # plain <img src> chapter, everything is in the html
+        static = page_names("static", self.pages)
+        for path in static:
+            self.add(path, page_png, "image/png")
+        self.add("/chapter/static/chapter-1", page_html(
+            '<div id="reader">' + "".join(f'<img src="{p}" width="800" height="1200">' for p in static) + "</div>"
+        ), "text/html")
+        self.expected["static"] = static
+
+        # lazy chapter, real urls only in data-src until the image scrolls into view
+        lazy = page_names("lazy", self.pages)
+        for path in lazy:
+            self.add(path, page_png, "image/png")
+        self.add("/img/placeholder.gif", make_png(1, 1), "image/png")
+        self.add("/chapter/lazy/chapter-2", page_html(
+            '<div id="reader">' + "".join(
+                f'<img src="/img/placeholder.gif" data-src="{p}" style="width:800px;height:1200px">' for p in lazy
+            ) + "</div>", LAZY_LOADER_JS
+        ), "text/html")
+        self.expected["lazy"] = lazy
+
+        # infinite scroll, only the first 5 pages exist until you scroll
+        infinite = page_names("infinite", self.pages)
+        for path in infinite:
+            self.add(path, page_png, "image/png")
+        self.add("/chapter/infinite/chapter-3", page_html(
+            '<div id="reader">' + "".join(f'<img src="{p}" width="800" height="1200">' for p in infinite[:5]) + "</div>",
+            INFINITE_SCROLL_JS % {"start": 5, "total": self.pages}
+        ), "text/html")
+        self.expected["infinite"] = infinite
+
+        # asura style: img.object-cover from the media cdn, plus small "suggested series" covers
+        asura = [f"{ASURA_MEDIA}{1000 + i}/page-{i:03}.png" for i in range(self.pages)]
+        for url in asura:
+            self.add(url[len("https://gg.asuracomic.net"):], page_png, "image/png")
+        suggested = [f"{ASURA_MEDIA}cover-{i}.png" for i in range(6)]
+        for url in suggested:
+            self.add(url[len("https://gg.asuracomic.net"):], thumb_png, "image/png")
+        self.add("/chapter/asura/chapter-4", page_html(
+            "".join(f'<img class="object-cover" src="{u}" style="width:800px;height:1200px">' for u in asura)
+            + "".join(f'<img class="object-cover" src="{u}" style="width:150px;height:200px">' for u in suggested)
+        ), "text/html")
+        self.expected["asura"] = asura
+
+        # real pages mixed with banners, a logo, ad scripts and a font
+        ads = page_names("ads", self.pages)
+        for path in ads:
+            self.add(path, page_png, "image/png")
+        self.add("/img/ads/banner.png", banner_png, "image/png")
+        self.add("/img/ads/logo.png", thumb_png, "image/png")
+        self.add("/static/font.woff2", b"\x00" * 20000, "font/woff2")
+        self.add("/chapter/ads/chapter-5", page_html(
+            '<img src="/img/ads/logo.png" width="150" height="200">'
+            '<img src="/img/ads/banner.png" width="728" height="90">'
+            '<div id="reader">' + "".join(f'<img src="{p}" width="800" height="1200">' for p in ads) + "</div>"
+            '<img src="/img/ads/banner.png" width="728" height="90">',
+            f'<script src="{AD_HOST}/pagead/js/adsbygoogle.js"></script>'
+            '<link rel="preload" href="/static/font.woff2" as="font" crossorigin>'
+        ), "text/html")
+        self.expected["ads"] = ads
+
+        # series index: lots of anchors, newest chapters first, split over a few pages with rel=next
+        index_pages = (self.chapters + self.per_index_page - 1) // self.per_index_page
+        numbers = list(range(self.chapters, 0, -1))
+        for page in range(index_pages):
+            chunk = numbers[page * self.per_index_page:(page + 1) * self.per_index_page]
+            anchors = "".join(f'<a href="/series/bench/chapter-{n}">Chapter {n}</a>' for n in chunk)
+            noise = "".join(f'<a href="/tag/genre-{i}">genre {i}</a>' for i in range(200))
+            nxt = f'<a rel="next" href="/series/bench/page/{page + 2}">Next</a>' if page + 1 < index_pages else ""
+            path = "/series/bench" if page == 0 else f"/series/bench/page/{page + 1}"
+            self.add(path, page_html(noise + anchors + nxt), "text/html")
+        self.expected["series"] = [f"/series/bench/chapter-{n}" for n in numbers[:self.per_index_page]]
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        route = self.server.site.serve(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+        content_type, body = route
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass # keep the benchmark output readable
+
+# start the fixture server on a random local port, returns (server, base_url)
+def start_server(site):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    server.site = site
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
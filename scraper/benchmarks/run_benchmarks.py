@@ -0,0 +1,321 @@
+# scraper/benchmarks/run_benchmarks.py
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import urllib.request
+
+# same as metrics.py: no resource module on windows, benchmarks still run there just without rss
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# runs every scraping strategy against the local fixture site and writes one comparable json file.
+# each case runs in its own python process so peak memory belongs to that case alone
+#
+#   python -m scraper.benchmarks.run_benchmarks --out bench.json
+#   python -m scraper.benchmarks.run_benchmarks --out new.json --compare bench.json
+
+ASURA_HOST = "https://gg.asuracomic.net"
+
+# chapters the incremental link case already "has", so only the newest ones should come back
+KNOWN_CHAPTERS = 250
+
+# scenario, strategy
+CASES = {
+    "static/slow": ("static", "slow"),
+    "static/adaptive": ("static", "adaptive"),
+    "static/capture": ("static", "capture"),
+    "static/static-tier": ("static", "static-tier"),
+    "lazy/slow": ("lazy", "slow"),
+    "lazy/adaptive": ("lazy", "adaptive"),
+    "lazy/capture": ("lazy", "capture"),
+    "lazy/static-tier": ("lazy", "static-tier"),
+    "infinite/slow": ("infinite", "slow"),
+    "infinite/adaptive": ("infinite", "adaptive"),
+    "infinite/capture": ("infinite", "capture"),
+    "ads/adaptive": ("ads", "adaptive"),
+    "ads/static-tier": ("ads", "static-tier"),
+    "asura/asura": ("asura", "asura"),
+    "series/links-legacy": ("series", "links-legacy"),
+    "series/links-incremental": ("series", "links-incremental"),
+}
+
+SCENARIO_PATHS = {
+    "static": "/chapter/static/chapter-1",
+    "lazy": "/chapter/lazy/chapter-2",
+    "infinite": "/chapter/infinite/chapter-3",
+    "asura": "/chapter/asura/chapter-4",
+    "ads": "/chapter/ads/chapter-5",
+    "series": "/series/bench",
+}
+
+# env each strategy runs the normal scrape_images path with
+STRATEGY_ENV = {
+    "slow": {"SCROLL_MODE": "slow"},
+    "adaptive": {"SCROLL_MODE": "adaptive"},
+    "capture": {"SCROLL_MODE": "adaptive", "CAPTURE_IMAGES": "true"},
+    "static-tier": {"SCROLL_MODE": "adaptive", "STATIC_FIRST": "true"},
+}
+
+# how much worse than the baseline counts as a regression
+DEFAULT_THRESHOLD = 0.15
+COMPARED_METRICS = ("seconds", "requests", "bytes", "peak_rss_mb")
+
+def absolute(base, path):
+    return path if path.startswith("http") else base + path
+
+# what a perfect run of this case returns
+def expected_for(site, base, scenario, strategy):
+    if scenario == "series":
+        if strategy == "links-incremental":
+            return [f"{base}/series/bench/chapter-{n}" for n in range(KNOWN_CHAPTERS + 1, site.chapters + 1)]
+        return [absolute(base, p) for p in site.expected["series"]]
+    return [absolute(base, p) for p in site.expected[scenario]]
+
+def score(found, expected):
+    found_set, expected_set = set(found), set(expected)
+    hits = len(found_set & expected_set)
+    return {
+        "found": len(found),
+        "expected": len(expected),
+        "precision": round(hits / len(found_set), 4) if found_set else 0.0,
+        "recall": round(hits / len(expected_set), 4) if expected_set else 1.0,
+        "in_order": [u for u in found if u in expected_set] == [u for u in expected if u in found_set],
+    }
+
+def peak_rss_mb():
+    if resource is None:
+        return None, None
+    # ru_maxrss is KB on linux, bytes on mac. children is the biggest single child (the browser driver tree)
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+# asura images live on their cdn, send those requests to the fixture server instead
+def route_asura_to_fixture(context, base):
+    def handle(route):
+        path = route.request.url[len(ASURA_HOST):]
+        try:
+            with urllib.request.urlopen(base + path, timeout=10) as response:
+                route.fulfill(status=200, body=response.read(), content_type=response.headers.get("Content-Type"))
+        except Exception:
+            route.fulfill(status=404, body=b"")
+
+    context.route(f"{ASURA_HOST}/**", handle)
+
+# ---- child side: one case, one process ----
+
+def run_case(scenario, strategy, base):
+    url = base + SCENARIO_PATHS[scenario]
+
+    if strategy == "links-legacy":
+        from scraper.scrape_chapter_links import scrape_chapter_links
+        return [ch["url"] for ch in scrape_chapter_links(url)]
+
+    if strategy == "links-incremental":
+        from scraper.scrape_chapter_links import scrape_chapter_links
+        chapters = scrape_chapter_links(url, known=[str(n) for n in range(1, KNOWN_CHAPTERS + 1)])
+        return [ch["url"] for ch in chapters]
+
+    if strategy == "asura":
+        from playwright.sync_api import sync_playwright
+        from scraper.playwright_scraper import new_context, scrape_page
+        from scraper.domains import asurascans
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            context = new_context(browser)
+            route_asura_to_fixture(context, base)
+            image_urls = scrape_page(context.new_page(), url, scraper=asurascans)
+            browser.close()
+        return image_urls
+
+    # every other strategy is the normal entry point with a different env
+    from scraper.domains import fallback
+    from scraper.playwright_scraper import scrape_images
+    fallback.SCROLL_MODE = os.environ["SCROLL_MODE"]
+    return scrape_images(url, use_lazy=True)
+
+def child_main(case, base, seed):
+    random.seed(seed)
+    scenario, strategy = CASES[case]
+    started = time.perf_counter()
+    error = None
+    try:
+        found = run_case(scenario, strategy, base)
+    except Exception as e:
+        found, error = [], f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    own_rss, browser_rss = peak_rss_mb()
+
+    # last line of stdout, everything above it is the scraper's own logging
+    print(json.dumps({
+        "found": found, "seconds": round(seconds, 3), "error": error,
+        "python_rss_mb": own_rss, "browser_rss_mb": browser_rss,
+    }), flush=True)
+
+# ---- parent side: fixture server, runs, scoring, comparing ----
+
+def run_child(case, base, seed, verbose):
+    env = dict(os.environ)
+    env.update({"SCRAPE_CACHE": "false", "PROBE_IMAGES": "false", "CAPTURE_IMAGES": "false", "STATIC_FIRST": "false"})
+    env.update(STRATEGY_ENV.get(CASES[case][1], {}))
+    env["LOG_LEVEL"] = "info" if verbose else "warn"
+    env["OUTPUT_FORMAT"] = "text"
+
+    command = [sys.executable, "-m", "scraper.benchmarks.run_benchmarks", "--child", case, "--base", base, "--seed", str(seed)]
+    proc = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=None if verbose else subprocess.DEVNULL, text=True)
+
+    lines = [line for line in proc.stdout.splitlines() if line.strip()]
+    if verbose:
+        print("\n".join(lines[:-1]))
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, json.JSONDecodeError):
+        return {"found": [], "seconds": 0.0, "error": f"benchmark process exited with {proc.returncode}",
+                "python_rss_mb": 0.0, "browser_rss_mb": 0.0}
+
+# rss is None on windows
+def max_or_none(values):
+    return max(values, default=None)
+
+def benchmark(site, base, case, repeat, seed, verbose):
+    scenario, strategy = CASES[case]
+    expected = expected_for(site, base, scenario, strategy)
+    runs = []
+    for i in range(repeat):
+        site.reset_counters()
+        result = run_child(case, base, seed + i, verbose)
+        result["requests"] = site.requests
+        result["bytes"] = site.bytes
+        runs.append(result)
+
+    last = runs[-1]
+    summary = {
+        "scenario": scenario,
+        "strategy": strategy,
+        "seconds": round(statistics.median(r["seconds"] for r in runs), 3),
+        "seconds_min": min(r["seconds"] for r in runs),
+        "seconds_max": max(r["seconds"] for r in runs),
+        "requests": int(statistics.median(r["requests"] for r in runs)),
+        "bytes": int(statistics.median(r["bytes"] for r in runs)),
+        "peak_rss_mb": max_or_none(
+            r["python_rss_mb"] + r["browser_rss_mb"] for r in runs
+            if r["python_rss_mb"] is not None and r["browser_rss_mb"] is not None
+        ),
+        "python_rss_mb": max_or_none(r["python_rss_mb"] for r in runs if r["python_rss_mb"] is not None),
+        "browser_rss_mb": max_or_none(r["browser_rss_mb"] for r in runs if r["browser_rss_mb"] is not None),
+        "errors": [r["error"] for r in runs if r["error"]],
+    }
+    summary.update(score(last["found"], expected))
+    return summary
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def print_row(case, r):
+    flag = " !" if r["errors"] else ""
+    rss = f"{r['peak_rss_mb']:>7.1f} MB rss" if r["peak_rss_mb"] is not None else "    n/a    rss"
+    print(
+        f"{case:<28} {r['seconds']:>7.2f}s {r['requests']:>5} req {r['bytes'] / 1e6:>7.2f} MB "
+        f"{rss}  p={r['precision']:.2f} r={r['recall']:.2f}{flag}",
+        flush=True,
+    )
+
+# anything slower/heavier than the baseline by more than threshold, or any drop in correctness
+def compare(results, baseline, threshold):
+    regressions = []
+    for case, new in results.items():
+        old = baseline.get("results", {}).get(case)
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if old.get(metric) and new[metric] is not None and new[metric] > old[metric] * (1 + threshold):
+                regressions.append(f"{case}: {metric} {old[metric]} -> {new[metric]} (+{(new[metric] / old[metric] - 1) * 100:.0f}%)")
+        for metric in ("precision", "recall"):
+            if new[metric] < old.get(metric, 0):
+                regressions.append(f"{case}: {metric} {old[metric]} -> {new[metric]}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraping strategies against a local fixture site")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="baseline json from an earlier run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--only", default=None, help="comma separated case names or scenario/strategy prefixes")
+    parser.add_argument("--pages", type=int, default=40, help="images per chapter")
+    parser.add_argument("--chapters", type=int, default=300, help="chapters on the series index")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--base", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args.child, args.base, args.seed)
+        return 0
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    cases = list(CASES)
+    if args.only:
+        wanted = [w.strip() for w in args.only.split(",") if w.strip()]
+        cases = [c for c in cases if any(c == w or c.startswith(w) for w in wanted)]
+
+    from scraper.benchmarks.fixture_site import FixtureSite, start_server
+    site = FixtureSite(pages=args.pages, chapters=args.chapters)
+    server, base = start_server(site)
+    print(f"[*] Fixture site on {base}, {len(cases)} cases x {args.repeat} runs")
+
+    results = {}
+    try:
+        for case in cases:
+            results[case] = benchmark(site, base, case, args.repeat, args.seed, args.verbose)
+            print_row(case, results[case])
+    finally:
+        server.shutdown()
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "pages": args.pages,
+            "chapters": args.chapters,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[*] Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"[!] Regression {line}")
+        if regressions:
+            return 1
+        print("[*] No regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
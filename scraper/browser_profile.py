@@ -0,0 +1,215 @@
+# scraper/browser_profile.py
+
+import os
+import re
+import json
+import time
+import random
+import shutil
+from contextlib import contextmanager
+
+from scraper.events import print_flush
+from scraper.metrics import span
+from scraper.request_filter import get_page_domain, host_resolver_rules, routes_disabled
+
+# one persistent chromium profile per site. the site's js bundles, css and fonts stay in the disk
+# cache and cookies / local storage survive between runs, so chapter two of a series doesn't
+# download everything chapter one already did.
+#
+# BROWSER_PROFILES=true turns it on. because page.route() disables chromium's http cache, scrapes in
+# a profile don't install the route filter (ad hosts are blocked with --host-resolver-rules instead)
+# and network capture mode can't be used with it
+
+PROFILE_ROOT = os.getenv("BROWSER_PROFILE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "wormscans", "profiles"
+)
+
+# chromium's own cap on the http cache of one profile
+DISK_CACHE_BYTES = int(os.getenv("BROWSER_PROFILE_CACHE_BYTES", str(128 * 1024 * 1024)))
+# a profile bigger than this after a run gets its caches wiped (cookies and storage stay)
+MAX_PROFILE_BYTES = int(os.getenv("BROWSER_PROFILE_MAX_BYTES", str(256 * 1024 * 1024)))
+# all profiles together, least recently used ones get deleted past this
+MAX_TOTAL_BYTES = int(os.getenv("BROWSER_PROFILE_TOTAL_BYTES", str(1024 * 1024 * 1024)))
+
+# throwaway parts of a chromium profile, relative to the profile dir
+CACHE_DIRS = (
+    os.path.join("Default", "Cache"),
+    os.path.join("Default", "Code Cache"),
+    os.path.join("Default", "GPUCache"),
+    os.path.join("Default", "Service Worker", "CacheStorage"),
+    os.path.join("Default", "Service Worker", "ScriptCache"),
+)
+
+META_NAME = "wormscans_profile.json"
+LOCK_NAME = "wormscans_profile.lock"
+
+# flock on linux / mac, msvcrt's byte range lock on windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+def profiles_enabled():
+    return os.getenv("BROWSER_PROFILES", "false").lower() in ("true", "1", "yes")
+
+def profile_path(domain):
+    return os.path.join(PROFILE_ROOT, re.sub(r"[^a-z0-9.-]", "_", domain.lower()) or "default")
+
+def dir_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass # chromium deletes cache entries while we walk
+    return total
+
+def load_meta(path):
+    try:
+        with open(os.path.join(path, META_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_meta(path, meta):
+    tmp_path = os.path.join(path, META_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, META_NAME))
+
+def try_lock(lock_file):
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+# chromium refuses to open one profile from two browsers, so only one scrape per profile at a time.
+# the lock goes away with the process, a crashed scrape never leaves a profile stuck.
+# no way to lock at all means the profile can't be shared safely, so it's treated as busy
+@contextmanager
+def lock_profile(path):
+    if fcntl is None and msvcrt is None:
+        yield False
+        return
+    with open(os.path.join(path, LOCK_NAME), "w") as lock_file:
+        if not try_lock(lock_file):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            unlock(lock_file)
+
+# profile got too big, drop the caches and keep the cookies
+def trim_profile(path):
+    size = dir_size(path)
+    if size <= MAX_PROFILE_BYTES:
+        return size
+    for cache_dir in CACHE_DIRS:
+        shutil.rmtree(os.path.join(path, cache_dir), ignore_errors=True)
+    print_flush(f"[*] Profile {os.path.basename(path)} was {size / 1e6:.0f} MB, cleared its caches")
+    return dir_size(path)
+
+# delete whole least recently used profiles until everything fits, never one that's open right now
+def evict_profiles(keep=None):
+    if not os.path.isdir(PROFILE_ROOT):
+        return 0
+    profiles = []
+    for name in os.listdir(PROFILE_ROOT):
+        path = os.path.join(PROFILE_ROOT, name)
+        if os.path.isdir(path):
+            profiles.append((load_meta(path).get("last_used", 0), path, dir_size(path)))
+
+    total = sum(size for _, _, size in profiles)
+    removed = 0
+    for _, path, size in sorted(profiles):
+        if total <= MAX_TOTAL_BYTES:
+            break
+        if path == keep:
+            continue
+        with lock_profile(path) as locked:
+            if not locked:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+        print_flush(f"[*] Evicted browser profile {os.path.basename(path)} ({size / 1e6:.0f} MB)")
+    return removed
+
+# a browser context for this url's site. persistent profile when it's free, otherwise a plain
+# throwaway context with the same fingerprint so the scrape still happens.
+# one profile keeps one user agent / viewport, the same cookies showing up with a new browser
+# every visit looks stranger than a steady one
+@contextmanager
+def open_profile_context(playwright, url, user_agents, viewports, headless=True):
+    domain = get_page_domain(url)
+    path = profile_path(domain)
+    os.makedirs(path, exist_ok=True)
+
+    meta = load_meta(path)
+    if "user_agent" not in meta:
+        meta["user_agent"] = random.choice(user_agents)
+        meta["viewport"] = list(random.choice(viewports))
+    viewport = {"width": meta["viewport"][0], "height": meta["viewport"][1]}
+
+    print_flush(f"[*] Using user agent: {meta['user_agent']}")
+    print_flush(f"[*] Using viewport size: {viewport['width']}x{viewport['height']}")
+
+    with lock_profile(path) as locked:
+        if not locked:
+            print_flush(f"[!] Profile for {domain} is busy with another scrape, using a fresh context", level="warn")
+            with span("launch"):
+                browser = playwright.chromium.launch(headless=headless)
+                context = browser.new_context(user_agent=meta["user_agent"], viewport=viewport)
+            try:
+                yield context
+            finally:
+                with span("close"):
+                    browser.close()
+            return
+
+        visits = meta.get("visits", 0)
+        print_flush(f"[*] Using persistent profile for {domain} (visit {visits + 1}, {dir_size(path) / 1e6:.1f} MB)")
+        with span("launch"):
+            context = playwright.chromium.launch_persistent_context(
+                path,
+                headless=headless,
+                user_agent=meta["user_agent"],
+                viewport=viewport,
+                args=[
+                    f"--disk-cache-size={DISK_CACHE_BYTES}",
+                    f"--host-resolver-rules={host_resolver_rules(domain)}",
+                ],
+            )
+        try:
+            with routes_disabled():
+                yield context
+        finally:
+            with span("close"):
+                context.close()
+            meta.update(visits=visits + 1, last_used=time.time())
+            save_meta(path, meta)
+            trim_profile(path)
+
+    evict_profiles(keep=path)
+
+# persistent contexts come with a tab already open
+def first_page(context):
+    return context.pages[0] if context.pages else context.new_page()
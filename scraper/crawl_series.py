@@ -0,0 +1,205 @@
+# scraper/crawl_series.py
+
+import os
+import sys
+import json
+import argparse
+
+from scraper.events import print_flush, emit, is_ndjson
+from scraper.metrics import track_scrape, span
+from scraper.scrape_cache import open_cache, force_refresh
+from scraper.scrape_chapter_links import links_from_page, parse_known, MAX_INDEX_PAGES
+from scraper.playwright_scraper import USER_AGENTS, VIEWPORTS, new_context, scrape_page
+from scraper.browser_profile import profiles_enabled, open_profile_context
+from scraper.recurring_assets import drop_recurring
+from scraper.prefetch import Prefetcher
+
+# a whole series in one go: chapter list, then every chapter's images, all in one warm browser, and
+# out comes one payload for /api/addData/addMultipleChapters. the upload is then a single batched
+# write instead of an addNewChapter + addChapterImages pair per chapter.
+#
+#   python -m scraper.crawl_series https://site/series/foo --series-id 12 --known 1,2,3 --out foo.json
+#   python -m scraper.crawl_series https://site/series/foo --series-id 12 --post http://localhost:3000
+#
+# --prefetch N (default 1) loads the next N chapters in background tabs while the current one is
+# being scrolled, 0 turns it off
+#
+# payload: {"series_id": 12, "chapters": [{"chapter_number", "title", "chapter_cover_url", "images"}]}
+# chapters come oldest first. ones without a number or without images are left out and get listed
+# at the end (and under "failed" in the ndjson result) so they can be done by hand
+
+UPLOAD_ROUTE = "/api/addData/addMultipleChapters"
+
+# first pages are usually credits / recruitment banners, somewhere in the middle is an actual panel
+def pick_cover(images):
+    return images[len(images) // 2] if images else None
+
+# one chapter on a fresh tab in the shared context (or the tab the prefetcher already loaded it in).
+# request filter routes stick to a page, so a new tab per chapter keeps them from piling up.
+# upcoming: the chapters after this one, they start loading once this one's tab is taken.
+# cached: the images crawl_in_context already found in the cache for this url (it looks every
+# chapter up once before the loop), cache itself is only written to here
+def crawl_chapter(context, url, use_lazy=True, cache=None, prefetcher=None, upcoming=(), cached=None):
+    variant = "lazy" if use_lazy else "static-dom"
+    with track_scrape(url) as metrics:
+        if cached is not None:
+            metrics.tier = "cache"
+            images = drop_recurring(url, cached) # same as scrape_images' cache hits
+            metrics.count("images_found", len(images))
+            return images
+
+        page = None
+        if prefetcher is not None:
+            with span("goto"):
+                page = prefetcher.take(url)
+            prefetcher.fill(upcoming)
+
+        metrics.tier = "playwright" if page is None else "prefetch"
+        page = page or context.new_page()
+        try:
+            images = scrape_page(page, url, use_lazy=use_lazy)
+        except Exception as e:
+            print_flush(f"[!] Chapter failed: {url} ({e})", level="warn")
+            metrics.ok = False
+            metrics.error = str(e)
+            images = []
+        finally:
+            try:
+                page.close()
+            except Exception:
+                pass
+
+        metrics.count("images_found", len(images))
+        if cache is not None and images:
+            cache.put("images", url, images, variant)
+        return images
+
+def crawl_in_context(context, series_url, series_id=None, known=None, max_pages=MAX_INDEX_PAGES, use_lazy=True, limit=None, prefetch=1):
+    # known mode (even with nothing known) walks the index pages and sorts chapters oldest first
+    index_page = context.new_page()
+    with track_scrape(series_url, kind="chapter_links") as metrics:
+        chapters = links_from_page(index_page, series_url, True, parse_known(known or []), max_pages)
+        metrics.count("links_found", len(chapters))
+    index_page.close()
+
+    payload = {"series_id": series_id, "chapters": []}
+    failed = [ch["url"] for ch in chapters if ch["chapter_number"] is None]
+    for url in failed:
+        print_flush(f"[!] No chapter number in {url}, skipping", level="warn")
+    # --limit counts chapters that can actually go in the payload
+    chapters = [ch for ch in chapters if ch["chapter_number"] is not None]
+    if limit:
+        chapters = chapters[:limit]
+    print_flush(f"[*] Crawling {len(chapters)} chapters of {series_url}")
+
+    cache = open_cache()
+    variant = "lazy" if use_lazy else "static-dom"
+    cached = {}
+    if cache is not None and not force_refresh():
+        for ch in chapters:
+            images = cache.get("images", ch["url"], variant)
+            if images is not None:
+                cached[ch["url"]] = images
+    # cached chapters never open a tab, no point loading them ahead
+    to_fetch = [ch["url"] for ch in chapters if ch["url"] not in cached]
+    prefetcher = Prefetcher(context, prefetch) if prefetch and len(to_fetch) > 1 else None
+    try:
+        for i, chapter in enumerate(chapters, 1):
+            url, number = chapter["url"], chapter["chapter_number"]
+            print_flush(f"[*] Chapter {number:g} ({i}/{len(chapters)})")
+
+            upcoming = to_fetch[to_fetch.index(url) + 1:] if url in to_fetch else ()
+            images = crawl_chapter(context, url, use_lazy, cache, prefetcher, upcoming, cached.get(url))
+            if not images:
+                failed.append(url)
+                continue
+
+            payload["chapters"].append({
+                "chapter_number": int(number) if number.is_integer() else number,
+                "title": None,
+                "chapter_cover_url": pick_cover(images),
+                "images": images,
+            })
+            if is_ndjson():
+                emit("chapter", index=i, url=url, chapter_number=number, ok=True, images=len(images))
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+        if cache is not None:
+            cache.close()
+
+    print_flush(f"[*] Crawled {len(payload['chapters'])} chapters, {len(failed)} failed")
+    for url in failed:
+        print_flush(f"[!] Not in payload: {url}", level="warn")
+    return payload, failed
+
+# the whole crawl with its own browser (or the site's persistent profile). returns (payload, failed urls)
+def crawl_series(series_url, series_id=None, known=None, max_pages=MAX_INDEX_PAGES, use_lazy=True, limit=None, prefetch=1):
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        if profiles_enabled():
+            with open_profile_context(p, series_url, USER_AGENTS, VIEWPORTS) as context:
+                return crawl_in_context(context, series_url, series_id, known, max_pages, use_lazy, limit, prefetch)
+
+        with span("launch"):
+            browser = p.chromium.launch(headless=True)
+            context = new_context(browser)
+        try:
+            return crawl_in_context(context, series_url, series_id, known, max_pages, use_lazy, limit, prefetch)
+        finally:
+            browser.close()
+
+def post_payload(base_url, payload):
+    import requests
+
+    response = requests.post(base_url.rstrip("/") + UPLOAD_ROUTE, json=payload, timeout=120)
+    body = response.json() if response.headers.get("Content-Type", "").startswith("application/json") else {}
+    if not response.ok:
+        raise RuntimeError(body.get("error") or f"upload failed with {response.status_code}")
+    return body
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a whole series into one addMultipleChapters payload")
+    parser.add_argument("series_url")
+    parser.add_argument("--series-id", type=int, default=None, help="series the chapters belong to, needed for --post")
+    parser.add_argument("--known", default=os.getenv("KNOWN_CHAPTERS", ""), help="comma separated chapter numbers / urls to skip")
+    parser.add_argument("--max-pages", type=int, default=MAX_INDEX_PAGES, help="index pages to walk at most")
+    parser.add_argument("--limit", type=int, default=None, help="only the first N new chapters")
+    parser.add_argument("--no-lazy", action="store_true", help="don't lazy scroll chapter pages")
+    parser.add_argument("--prefetch", type=int, default=int(os.getenv("PREFETCH_DEPTH", "1")), help="chapters to load ahead in background tabs, 0 turns it off")
+    parser.add_argument("--out", default="-", help="payload file, - prints it as the last line")
+    parser.add_argument("--post", default=None, help="site base url to upload the payload to")
+    args = parser.parse_args()
+
+    if args.post and args.series_id is None:
+        parser.error("--post needs --series-id")
+
+    payload, failed = crawl_series(
+        args.series_url,
+        series_id=args.series_id,
+        known=[value for value in args.known.split(",") if value.strip()],
+        max_pages=args.max_pages,
+        use_lazy=not args.no_lazy,
+        limit=args.limit,
+        prefetch=args.prefetch,
+    )
+
+    if args.out != "-":
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        print_flush(f"[*] Wrote payload for {len(payload['chapters'])} chapters to {args.out}")
+
+    uploaded = None
+    if args.post and payload["chapters"]:
+        uploaded = post_payload(args.post, payload)
+        print_flush(f"[*] Uploaded {len(uploaded.get('uploaded', []))} chapters, skipped {len(uploaded.get('skipped', []))} that already existed")
+
+    if is_ndjson():
+        emit("result", url=args.series_url, ok=True, payload=payload, failed=failed, upload=uploaded)
+    elif args.out == "-":
+        sys.stdout.write(json.dumps(payload, separators=(",", ":")) + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# scraper/domains/__init__.py
+
+import time
+import fnmatch
+import importlib
+from urllib.parse import urlparse
+
+from scraper.events import print_flush
+from scraper.metrics import span
+
+# every site we have special handling for, described as data. the module only gets imported once a
+# url actually matches, so adding a site doesn't slow down scrapes of the others.
+#   domains       - host names, subdomains match too ("asuracomic.net" covers www. and gg.), globs work
+#   module        - the scraper module with scrape() / scrape_async()
+#   image_selector- which <img> tags hold chapter pages (also used by the static html tier)
+#   url_prefix    - chapter images always start with this, None to not filter on it
+#   min_width / min_height - pages have to be bigger than this, None to skip the size check
+#   lazy_scroll   - True always scrolls, None lets the caller decide (USE_LAZY), False means the
+#                   module doesn't scroll at all (and scrape() takes no use_lazy)
+#   host_limits   - {host: {"concurrency", "rate" (req/s), "burst"}} for host_scheduler.py, the
+#                   reader site and its image cdn usually want different numbers
+#   allowed_hosts - third-party hosts (cdns) request_filter.py lets through on this site's pages, the
+#                   site's own domains always are
+SITES = {
+    "asurascans": {
+        "domains": ("asuracomic.net", "asurascans.com"),
+        "module": "scraper.domains.asurascans",
+        "image_selector": "img.object-cover",
+        "url_prefix": "https://gg.asuracomic.net/storage/media/",
+        "min_width": 300,
+        "min_height": 400,
+        "lazy_scroll": False,
+        "host_limits": {
+            "asuracomic.net": {"concurrency": 2, "rate": 2.0, "burst": 4},
+            "gg.asuracomic.net": {"concurrency": 8, "rate": 16.0, "burst": 16},
+        },
+        "allowed_hosts": (),
+    },
+}
+
+# anything not listed above
+FALLBACK_SITE = {
+    "domains": (),
+    "module": "scraper.domains.fallback",
+    "image_selector": "img",
+    "url_prefix": None,
+    "min_width": None,
+    "min_height": None,
+    "lazy_scroll": None,
+    "host_limits": {},
+    "allowed_hosts": (),
+}
+
+for name, site in SITES.items():
+    site["name"] = name
+FALLBACK_SITE["name"] = "fallback"
+
+# exact host -> site, plus the few glob patterns that can't go in a dict
+DOMAIN_INDEX = {}
+DOMAIN_GLOBS = []
+for site in SITES.values():
+    for pattern in site["domains"]:
+        if "*" in pattern or "?" in pattern:
+            DOMAIN_GLOBS.append((pattern, site))
+        else:
+            DOMAIN_INDEX[pattern.lower()] = site
+
+# module name -> (module, seconds it took to import)
+LOADED = {}
+
+def get_domain(url):
+    return urlparse(url).netloc.replace("www.", "")
+
+# which site config handles this url. a.b.example.com tries a.b.example.com, b.example.com, example.com
+def get_site(url):
+    host = (urlparse(url).hostname or "").lower()
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        site = DOMAIN_INDEX.get(".".join(labels[i:]))
+        if site is not None:
+            return site
+    for pattern, site in DOMAIN_GLOBS:
+        if fnmatch.fnmatch(host, pattern):
+            return site
+    return FALLBACK_SITE
+
+def site_for_module(module):
+    for site in SITES.values():
+        if site["module"] == module.__name__:
+            return site
+    return FALLBACK_SITE
+
+# import the site's module the first time it's needed
+def load_scraper(site):
+    name = site["module"]
+    if name not in LOADED:
+        started = time.perf_counter()
+        with span("import"):
+            module = importlib.import_module(name)
+        LOADED[name] = (module, time.perf_counter() - started)
+        print_flush(f"[*] Loaded {name} in {LOADED[name][1] * 1000:.1f}ms", level="debug")
+    return LOADED[name][0]
+
+# (domain, scraper module) for a url, same thing playwright_scraper always handed out
+def get_scraper(url):
+    return get_domain(url), load_scraper(get_site(url))
+
+# extra keyword arguments for this site's scrape(), only the scrolling scrapers take use_lazy
+def scrape_kwargs(site, use_lazy):
+    if site["lazy_scroll"] is False:
+        return {}
+    return {"use_lazy": True if site["lazy_scroll"] else use_lazy}
+
+def import_report():
+    return {name: round(seconds * 1000, 1) for name, (_, seconds) in LOADED.items()}
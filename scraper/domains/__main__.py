@@ -0,0 +1,44 @@
+# scraper/domains/__main__.py
+
+import sys
+import time
+import subprocess
+
+from scraper.domains import SITES, FALLBACK_SITE, load_scraper, import_report
+
+# python -m scraper.domains
+# shows the site registry, how long a fresh interpreter takes to get to a scraper that's ready to go
+# and what each domain module costs to import on top of that
+
+STARTUP_TARGETS = ("scraper.playwright_scraper", "scraper.scrape_chapter_links", "scraper.async_scraper")
+
+def time_startup(module, runs=3):
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True)
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == "__main__":
+    print("[*] Registered sites:")
+    for site in list(SITES.values()) + [FALLBACK_SITE]:
+        domains = ", ".join(site["domains"]) or "(everything else)"
+        print(f"    {site['name']:<14} {domains:<36} selector={site['image_selector']!r} lazy={site['lazy_scroll']}")
+
+    print("[*] Fresh interpreter startup (best of 3):")
+    for module in STARTUP_TARGETS:
+        seconds = time_startup(module)
+        print(f"    {module:<32} " + (f"{seconds * 1000:.0f}ms" if seconds is not None else "import failed"))
+
+    print("[*] Domain module import cost:")
+    for site in list(SITES.values()) + [FALLBACK_SITE]:
+        try:
+            load_scraper(site)
+        except ImportError as e:
+            print(f"    {site['module']:<32} import failed ({e})")
+    for name, ms in import_report().items():
+        print(f"    {name:<32} {ms}ms")
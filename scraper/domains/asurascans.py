@@ -1,45 +1,54 @@
 # scraper/sites/asurascans.py
 
-from scraper.playwright_utils import simulate_human_behavior
+from scraper.playwright_utils import (
+    print_flush, simulate_human_behavior, simulate_human_behavior_async,
+    extract_images, extract_images_async,
+)
+from scraper.metrics import span, count
+from scraper.domains import SITES
+from scraper import nav_policy
 
-def scrape(page, url):
-    print("[*] Using AsuraScans-specific scraper")
+# selector, cdn prefix and page size all live in the registry (domains/__init__.py)
+SITE = SITES["asurascans"]
 
-    # wait until network is idle / no new requests. Then pretend to be human lol
-    # page.goto(url, wait_until="networkidle")
-    simulate_human_behavior(page)
+# which <img> tags this scraper looks at (also used by the static html tier)
+IMAGE_SELECTOR = SITE["image_selector"]
 
-    # waiting for any image to actually be on the page
-    print("[*] Waiting for chapter images to load...")
-    page.wait_for_selector("img.object-cover")
+# the src if this one record is a chapter page, None if not. filter_images runs every record
+# through it, the streaming api (iter_chapter_images) calls it one image at a time.
+# records come from extract_images, rendered size is already in there so no bounding_box calls.
+# static html records only have width/height attributes, when those are missing keep the image
+# (static_fetch.check_sizes reads the real size from the image header afterwards)
+def keep_image(record, url=None):
+
+    # get image source and filter based on the routing of these images
+    src = record.get("src") or ""
+    if not src.startswith(SITE["url_prefix"]):
+        return None
 
-    # grab all images
-    images = page.query_selector_all("img.object-cover")
+    #  use size filter to exclude small thumbnails or suggested series images
+    if record["height"] is None or record["width"] is None:
+        return src
+    if record["height"] > SITE["min_height"] and record["width"] > SITE["min_width"]:
+        return src
+    return None
+
+def filter_images(records, url=None):
 
     seen_srcs = set() # avoid duplicates with set
     valid_images = [] # then store it all here
 
     # go through all images that were grabbed
-    for index, img in enumerate(images):
-
-        # get image source and filter based on the routing of these images
-        src = img.get_attribute("src") or ""
-        if not src.startswith("https://gg.asuracomic.net/storage/media/"):
+    for record in records:
+        src = keep_image(record, url)
+        if not src:
             continue
 
         # avoid duplicates. if not just add it to the set
         if src in seen_srcs:
             continue
         seen_srcs.add(src)
-
-        #  use size filter to exclude small thumbnails or suggested series images
-        try:
-            box = img.bounding_box()
-            if box and box["height"] > 400 and box["width"] > 300:
-                valid_images.append((index, src))
-        except Exception:
-            # if bounding box fails, keep it anyway
-            valid_images.append((index, src))
+        valid_images.append((record["index"], src))
 
     # sort by order of appearance in DOM
     valid_images.sort(key=lambda tup: tup[0])
@@ -47,5 +56,42 @@ def scrape(page, url):
     # extract only urls
     final_images = [src for _, src in valid_images]
 
-    print(f"[*] Retained {len(final_images)} valid chapter images.")
+    print_flush(f"[*] Retained {len(final_images)} valid chapter images.")
     return final_images
+
+def scrape(page, url):
+    print_flush("[*] Using AsuraScans-specific scraper")
+
+    # wait until network is idle / no new requests. Then pretend to be human lol
+    # page.goto(url, wait_until="networkidle")
+    with span("simulate"):
+        simulate_human_behavior(page)
+
+    # waiting for any image to actually be on the page
+    print_flush("[*] Waiting for chapter images to load...")
+    with span("wait_selector"):
+        nav_policy.wait_for_selector(page, url, IMAGE_SELECTOR)
+
+    # grab all images (src + rendered size) in a single round trip
+    with span("extract"):
+        images = extract_images(page, IMAGE_SELECTOR)
+    count("img_tags", len(images))
+    with span("filter"):
+        return filter_images(images, url)
+
+# same thing as scrape() but on the async api, used by the concurrent engine
+async def scrape_async(page, url):
+    print_flush("[*] Using AsuraScans-specific scraper (async)")
+
+    with span("simulate"):
+        await simulate_human_behavior_async(page)
+
+    print_flush("[*] Waiting for chapter images to load...")
+    with span("wait_selector"):
+        await nav_policy.wait_for_selector_async(page, url, IMAGE_SELECTOR)
+
+    with span("extract"):
+        images = await extract_images_async(page, IMAGE_SELECTOR)
+    count("img_tags", len(images))
+    with span("filter"):
+        return filter_images(images, url)
@@ -1,68 +1,82 @@
 # scraper/sites/fallback.py
 
-import re
-import time
-from scraper.playwright_utils import simulate_human_behavior, slow_scroll_to_bottom_with_images
-from scraper.playwright_scraper import print_flush
-from urllib.parse import urlparse
+import os
+import asyncio
+from scraper.playwright_utils import (
+    simulate_human_behavior, slow_scroll_to_bottom_with_images,
+    simulate_human_behavior_async, slow_scroll_to_bottom_with_images_async, print_flush,
+    extract_images, extract_images_async, pick_src,
+    adaptive_scroll_to_bottom, adaptive_scroll_to_bottom_async,
+)
+from scraper.request_filter import install_request_filter, install_request_filter_async
+from scraper.image_probe import probe_enabled, filter_by_size
+from scraper.metrics import span, count
+from scraper.domains import FALLBACK_SITE
 
-def scrape(page, url, use_lazy=True):
-    print_flush("[*] Using fallback scraper (generic)")
+# which <img> tags this scraper looks at (also used by the static html tier)
+IMAGE_SELECTOR = FALLBACK_SITE["image_selector"]
 
-    # extensions we allow (only images)
-    ALLOWED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+# extensions we allow (only images)
+ALLOWED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
 
-    # get domain, helps with determining api requests that we probably want
-    parsed_url = urlparse(url)
-    page_domain = parsed_url.hostname.replace("www.", "") if parsed_url.hostname else ""
+# "adaptive" watches image loads in the page, "slow" is the old fixed 800px / 500ms scroll
+SCROLL_MODE = os.getenv("SCROLL_MODE", "adaptive").lower()
 
-    # method of determinig if we want to block a domain request
-    def should_allow_request(request, page_domain):
-        url = request.url.lower()
-        parsed_url = urlparse(url)
-        request_domain = parsed_url.hostname
+# the cleaned url if this one record is a chapter image, None if not. filter_images runs every
+# record through it, the streaming api (iter_chapter_images) calls it one image at a time
+def keep_image(record, url):
+    src = pick_src(record)
+    print_flush(f"    -> Found image src: {src!r}", level="debug")
 
-        # allow main document and image resources
-        if request.resource_type in ("document", "image"):
-            return True
+    if not src: return None
 
-        # allow images based on file extension
-        if any(url.endswith(ext) for ext in ALLOWED_EXTENSIONS):
-            return True
+    # trim the whitespace in front, god it actually prevents some image urls from working properly
+    src = src.strip()
+    print_flush(f"    Cleaned image src: {src}", level="debug")
 
-        # allow site's own scripts and styles (first-party only) (like the domain we got from parsing you know)
-        if request.resource_type in ("script", "stylesheet", "fetch", "xhr"):
-            if request_domain and page_domain in request_domain:
-                return True
+    if not src.startswith("http"): return None
 
-        # otherwise block block block block
-        print_flush(f"[x] Blocking request: {request.url}")
-        return False
+    # filter only by file extension
+    if not any(src.lower().endswith(ext) for ext in ALLOWED_EXTENSIONS):
+        return None
 
-    # intercept all network requests and determine if we want them or nah
-    page.route("**/*", lambda route, request: (
-        route.continue_() if should_allow_request(request, page_domain) else route.abort()
-    ))
+    # used to prefer images with the chapter number in them (chapter-12 in the url, 12 in the src),
+    # didn't filter anything in practice so everything with a good extension gets kept
+    return src
 
-    # try loading the page
-    try:
-        print_flush(f"[*] Navigating to URL: {url}")
-        page.goto(url, wait_until="domcontentloaded", timeout=15000)
+# run the image records from extract_images through the filters, keeps DOM order
+def filter_images(records, url):
 
-    except Exception as e:
+    # yep store em here.
+    image_urls = []
 
-        print_flush(f"[!] First load failed, retrying once... ({e})")
-        time.sleep(1)
+    # loop through all the images we got, not what we want to display yet
+    for record in records:
+        src = keep_image(record, url)
+        if src:
+            image_urls.append(src)
 
-        try:
-            page.goto(url, wait_until="domcontentloaded", timeout=15000)
+    print_flush(f"[*] Found {len(image_urls)} valid images.")
+    return image_urls
+
+# fallback keeps anything with an image extension, so banners and thumbnails get through.
+# with PROBE_IMAGES on, read just the image headers and drop the ones that are too small or too wide
+def post_filter(image_urls, url):
+    if not probe_enabled() or not image_urls:
+        return image_urls
+    return filter_by_size(image_urls, referer=url)
+
+def scrape(page, url, use_lazy=True):
+    print_flush("[*] Using fallback scraper (generic)")
 
-        except Exception as e2:
-            print_flush(f"[!] Retry failed: {e2}")
-            return []
+    # block ads / fonts / third-party junk. compiled into narrow route patterns so first-party
+    # requests never come through python at all. scrape_page (or the prefetcher) already put it on
+    # before loading the page, this just picks up its stats
+    request_stats = install_request_filter(page, url)
 
     # human time
-    simulate_human_behavior(page)
+    with span("simulate"):
+        simulate_human_behavior(page)
 
     # suck on this lazy loaders
 
@@ -71,53 +85,47 @@ def scrape(page, url, use_lazy=True):
     # scroll slowly and grab images live if its set up, otherwise don't do, set it None so we don't get hit by the checker
     if use_lazy:
         print_flush("[*] Looking for images (with lazy scroll)...")
-        slow_scroll_to_bottom_with_images(page)
+        with span("scroll"):
+            if SCROLL_MODE == "slow":
+                slow_scroll_to_bottom_with_images(page)
+            else:
+                adaptive_scroll_to_bottom(page)
     else:
         print_flush("[*] Skipping lazy scrolling, collecting only static DOM images.")
 
-    # get all <img> tagged elements
-    images = page.query_selector_all("img")
+    # get all <img> tagged elements, attributes and sizes in one go
+    with span("extract"):
+        images = extract_images(page)
+    count("img_tags", len(images))
     print_flush(f"[*] Found {len(images)} <img> tags. Checking sources...")
+    request_stats.summary()
+    with span("filter"):
+        return post_filter(filter_images(images, url), url)
 
-    # try to match chapter number in URL for filtering. Usually helps if they're organized like asura or something
-    match = re.search(r'chapter[-_]?(\d+)', url, re.IGNORECASE)
-    chapter_str = match.group(1) if match else None
+# same thing as scrape() but on the async api, used by the concurrent engine
+async def scrape_async(page, url, use_lazy=True):
+    print_flush("[*] Using fallback scraper (generic, async)")
 
-    # yep store em here.
-    image_urls = []
-    
-    # loop through all the images we got, not what we want to display yet
-    for img in images:
-        src = ( # yeah grab all the valid ones with proper tags
-            img.get_attribute("src") or
-            img.get_attribute("data-src") or
-            img.get_attribute("data-lazy-src") or
-            img.get_attribute("data-original")
-        )
-        print_flush(f"    -> Found image src: {src!r}")
-        
-        if not src: continue 
-        
-        # trim the whitespace in front, god it actually prevents some image urls from working properly
-        src = src.strip() 
-        print_flush(f"    Cleaned image src: {src}")
-        
-        if not src.startswith("http"): continue
-
-        # filter only by file extension
-        if not any(src.lower().endswith(ext) for ext in ALLOWED_EXTENSIONS):
-            continue
-
-        # CAN POTENTIALLY REMOVE THIS, JUST TESTING AND KINDA USELESS FOR NOW BUT COULD BE USEFUL
-        # prefer images that include the chapter number, this might actually shoot me in the butt but we'll keep it.
-        if chapter_str:
-            if chapter_str in src or re.search(rf"(chapter[-_]?0*{chapter_str})", src, re.IGNORECASE):
-                image_urls.append(src)
+    # already on from scrape_page_async, installed before the navigation
+    request_stats = await install_request_filter_async(page, url)
+
+    with span("simulate"):
+        await simulate_human_behavior_async(page)
+
+    if use_lazy:
+        print_flush("[*] Looking for images (with lazy scroll)...")
+        with span("scroll"):
+            if SCROLL_MODE == "slow":
+                await slow_scroll_to_bottom_with_images_async(page)
             else:
-                # If not matched, still include for now. kinda testing it.
-                image_urls.append(src)
-        else:
-            image_urls.append(src)
+                await adaptive_scroll_to_bottom_async(page)
+    else:
+        print_flush("[*] Skipping lazy scrolling, collecting only static DOM images.")
 
-    print_flush(f"[*] Found {len(image_urls)} valid images.")
-    return image_urls
+    with span("extract"):
+        images = await extract_images_async(page)
+    count("img_tags", len(images))
+    print_flush(f"[*] Found {len(images)} <img> tags. Checking sources...")
+    request_stats.summary()
+    with span("filter"):
+        return await asyncio.to_thread(post_filter, filter_images(images, url), url)
@@ -0,0 +1,76 @@
+# scraper/events.py
+
+import os
+import sys
+import json
+import time
+import contextvars
+from contextlib import contextmanager
+
+# all scraper output goes through here. OUTPUT_FORMAT=text (default) is the same old log lines the
+# admin pages parse, OUTPUT_FORMAT=ndjson turns everything into one typed json event per line:
+#   progress  - log message with a level
+#   image     - one chapter image (index, url)
+#   link      - one chapter link from the series page
+#   chapter   - one finished chapter of a multi chapter run
+#   result    - the single final payload, read this instead of parsing logs
+#   error     - something failed
+#   timing    - how long things took
+#   metrics   - per scrape phase timings and counters (see metrics.py)
+
+LEVELS = {"debug": 10, "info": 20, "warn": 30, "error": 40, "quiet": 100}
+
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "text").lower()
+LOG_LEVEL = LEVELS.get(os.getenv("LOG_LEVEL", "info").lower(), LEVELS["info"])
+
+# text put in front of every log line of the current task / thread, e.g. "[Chapter 3]" so the admin
+# page can tell apart the chapters the async engine scrapes at the same time
+_prefix = contextvars.ContextVar("log_prefix", default=None)
+
+@contextmanager
+def log_prefix(prefix):
+    token = _prefix.set(prefix)
+    try:
+        yield
+    finally:
+        _prefix.reset(token)
+
+def with_prefix(message):
+    prefix = _prefix.get()
+    if not prefix:
+        return message
+    return "\n".join(
+        f"{prefix} {line}" if line.strip() and not line.startswith(prefix) else line
+        for line in message.split("\n")
+    )
+
+def is_ndjson():
+    return OUTPUT_FORMAT == "ndjson"
+
+def enabled(level):
+    return LEVELS.get(level, LEVELS["info"]) >= LOG_LEVEL
+
+# write one event line, result/error always go out no matter the log level
+def emit(event_type, level="info", **fields):
+    if event_type not in ("result", "error") and not enabled(level):
+        return
+    event = {"type": event_type, "ts": round(time.time(), 3)}
+    if event_type == "progress":
+        event["level"] = level
+    event.update(fields)
+    sys.stdout.write(json.dumps(event) + "\n")
+    sys.stdout.flush()
+
+# flush output to terminal so can see logs in real time.
+# level lets the noisy per-element lines (debug) get dropped unless someone asks for them
+def print_flush(*args, level="info", **kwargs):
+    if not enabled(level):
+        return
+    if is_ndjson():
+        message = kwargs.get("sep", " ").join(str(a) for a in args).strip("\n")
+        emit("progress", level=level, message=with_prefix(message))
+        return
+    if _prefix.get():
+        args = (with_prefix(kwargs.pop("sep", " ").join(str(a) for a in args)),)
+    print(*args, **kwargs) #args for positional arguments passed, kwargs is cor keyword agruments
+    sys.stdout.flush() # immediately write output to website terminal
@@ -0,0 +1,135 @@
+# scraper/har_replay.py
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import contextvars
+from contextlib import contextmanager
+
+from scraper.events import print_flush
+from scraper.scrape_cache import normalize_url, get_domain
+
+# record a scrape's network traffic to a zipped HAR and replay it later without touching the network.
+#   HAR_MODE=record  - scrape live, everything the page loaded ends up in HAR_DIR
+#   HAR_MODE=replay  - same scrape served straight from the archive, requests it doesn't have get
+#                      aborted, human-behavior sleeps are skipped and nothing goes into the latency
+#                      history or the host scheduler
+# one archive per url and kind (images / chapter_links), plus a small .json next to it with the user
+# agent and viewport it was recorded with, replays use the same ones so layout based filters match.
+#
+#   HAR_MODE=record TARGET_URL=... python scraper/playwright_scraper.py
+#   python -m scraper.har_replay list
+#   python -m scraper.har_replay rescrape [domain]     # every recorded chapter again, offline
+
+HAR_DIR = os.getenv("HAR_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "wormscans", "har")
+
+_replaying = contextvars.ContextVar("har_replaying", default=False)
+
+def har_mode():
+    mode = os.getenv("HAR_MODE", "").lower()
+    return mode if mode in ("record", "replay") else None
+
+# true while a scrape is being served from an archive
+def replaying():
+    return _replaying.get()
+
+def har_path(url, kind="images"):
+    key = hashlib.sha1(normalize_url(url).encode()).hexdigest()[:16]
+    return os.path.join(HAR_DIR, get_domain(url) or "unknown", f"{kind}-{key}.har.zip")
+
+def load_meta(path):
+    try:
+        with open(path + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# a browser context that records to / replays from the url's archive. the archive only gets
+# written when the context closes, so it's closed here and not by the caller.
+# options (use_lazy...) get saved with the recording so a rescrape can run it the same way
+@contextmanager
+def har_context(browser, url, user_agents, viewports, kind="images", **options):
+    mode = har_mode()
+    path = har_path(url, kind)
+
+    if mode == "replay":
+        meta = load_meta(path)
+        if meta is None or not os.path.exists(path):
+            raise FileNotFoundError(f"No recorded session for {url} ({path}), record it with HAR_MODE=record first")
+        print_flush(f"[*] Replaying {kind} session recorded {time.strftime('%Y-%m-%d %H:%M', time.localtime(meta['recorded_at']))}")
+        context = browser.new_context(
+            user_agent=meta["user_agent"],
+            viewport={"width": meta["viewport"][0], "height": meta["viewport"][1]},
+            service_workers="block",
+        )
+        context.route_from_har(path, not_found="abort")
+        token = _replaying.set(True)
+        try:
+            yield context
+        finally:
+            _replaying.reset(token)
+            context.close()
+        return
+
+    user_agent = random.choice(user_agents)
+    viewport = list(random.choice(viewports))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    print_flush(f"[*] Recording {kind} session to {path}")
+    context = browser.new_context(
+        user_agent=user_agent,
+        viewport={"width": viewport[0], "height": viewport[1]},
+        record_har_path=path,
+        record_har_mode="full",
+    )
+    try:
+        yield context
+    finally:
+        context.close()
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(dict(options, url=url, kind=kind, user_agent=user_agent, viewport=viewport, recorded_at=time.time()), f)
+        print_flush(f"[*] Saved session archive ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+# every recorded session, optionally for one domain
+def recorded_sessions(domain=None, kind=None):
+    sessions = []
+    if not os.path.isdir(HAR_DIR):
+        return sessions
+    for folder in sorted(os.listdir(HAR_DIR)):
+        if domain and folder != domain:
+            continue
+        for name in sorted(os.listdir(os.path.join(HAR_DIR, folder))):
+            if not name.endswith(".har.zip"):
+                continue
+            path = os.path.join(HAR_DIR, folder, name)
+            meta = load_meta(path)
+            if meta and (kind is None or meta["kind"] == kind):
+                sessions.append(dict(meta, path=path, bytes=os.path.getsize(path)))
+    return sessions
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    domain = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if command == "rescrape":
+        # imported here, listing archives shouldn't need playwright
+        os.environ["HAR_MODE"] = "replay"
+        from scraper.playwright_scraper import scrape_images
+
+        started = time.perf_counter()
+        sessions = recorded_sessions(domain, kind="images")
+        for session in sessions:
+            chapter_started = time.perf_counter()
+            try:
+                images = scrape_images(session["url"], use_lazy=session.get("use_lazy", False))
+                result = {"url": session["url"], "ok": True, "images": len(images)}
+            except Exception as e:
+                result = {"url": session["url"], "ok": False, "error": str(e)}
+            result["seconds"] = round(time.perf_counter() - chapter_started, 2)
+            print(json.dumps(result), flush=True)
+        print_flush(f"[*] Replayed {len(sessions)} chapters in {time.perf_counter() - started:.1f}s")
+    else:
+        for session in recorded_sessions(domain):
+            print(f"    {session['kind']:<14} {session['bytes'] / 1e6:6.1f} MB  {session['url']}")
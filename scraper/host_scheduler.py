@@ -0,0 +1,190 @@
+# scraper/host_scheduler.py
+
+import time
+import random
+import asyncio
+import weakref
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlparse
+
+from scraper.events import print_flush
+from scraper.domains import get_site
+from scraper.har_replay import replaying
+
+# one place that decides when a request to a host may go out. every host gets a cap on requests in
+# flight plus a token bucket for requests per second, different hosts never wait on each other.
+# a 429/503 puts the whole host on hold (Retry-After if the server sent one) and halves its rate,
+# successful responses slowly bring the rate back up.
+# limits come from the site registry ("host_limits" in domains/__init__.py), anything else gets
+# DEFAULT_HOST_LIMITS. the thread pools (mirror, probe, static tier) and the async engine share the
+# same token buckets and 429 holds within a process. the in-flight cap is per mode though: threads
+# share one semaphore, async code gets its own per event loop, so a process mixing both can have up
+# to twice `concurrency` requests out to a host (the rate limit still applies to all of them)
+
+DEFAULT_HOST_LIMITS = {"concurrency": 4, "rate": 8.0, "burst": 8}
+
+THROTTLE_STATUSES = (429, 503)
+MIN_RATE = 0.2 # never slower than one request every 5 seconds
+MAX_BACKOFF = 120.0
+
+def get_host(url):
+    return (urlparse(url).hostname or "").lower()
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None # http-date form, just use our own backoff
+
+# limits the registry has for this host, None if it has none. most specific entry wins:
+# gg.asuracomic.net before asuracomic.net
+def configured_limits(host):
+    host_limits = get_site(f"https://{host}/").get("host_limits") or {}
+    labels = host.split(".")
+    for i in range(len(labels)):
+        limits = host_limits.get(".".join(labels[i:]))
+        if limits:
+            return dict(DEFAULT_HOST_LIMITS, **limits)
+    return None
+
+class HostState:
+    def __init__(self, host, limits):
+        self.host = host
+        self.concurrency = limits["concurrency"]
+        self.max_rate = float(limits["rate"])
+        self.rate = self.max_rate
+        self.burst = float(limits.get("burst") or max(1.0, self.max_rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.lock = threading.Lock()
+        self.semaphore = threading.Semaphore(self.concurrency)
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    # asyncio semaphores belong to a loop, one per running loop so a shared scheduler survives
+    # several asyncio.run() calls
+    def async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if loop not in self._async_semaphores:
+                self._async_semaphores[loop] = asyncio.Semaphore(self.concurrency)
+            return self._async_semaphores[loop]
+
+    # take a token and say how long to wait before sending. tokens can go negative, that's the
+    # queue of callers already promised a slot, so waiters go out in order at the current rate
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    # take a token only if one is free right now, for work that can just as well happen later (prefetch)
+    def try_reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1 or now < self.blocked_until:
+                return False
+            self.tokens -= 1
+            return True
+
+    def penalize(self, status, retry_after=None):
+        with self.lock:
+            self.strikes += 1
+            delay = retry_after if retry_after is not None else min(MAX_BACKOFF, 2.0 ** self.strikes) * random.uniform(0.8, 1.2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            rate = self.rate
+        print_flush(f"[!] {self.host} answered {status}, holding requests for {delay:.1f}s (rate now {rate:.2f}/s)", level="warn")
+
+    def reward(self):
+        with self.lock:
+            self.strikes = 0
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * 1.1 + 0.05)
+
+# default_limits changes what unconfigured hosts get (image_mirror --per-host uses it)
+class HostScheduler:
+    def __init__(self, default_limits=None):
+        self.default_limits = dict(DEFAULT_HOST_LIMITS, **(default_limits or {}))
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def state_for(self, url):
+        host = get_host(url)
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostState(host, configured_limits(host) or self.default_limits)
+            return self.hosts[host]
+
+    # hold one of the host's slots while the request runs. replayed sessions never reach the host
+    @contextmanager
+    def slot(self, url):
+        state = self.state_for(url)
+        if replaying():
+            yield state
+            return
+        with state.semaphore:
+            wait = state.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            yield state
+
+    # a slot only if one is free right now (in flight and a token), for work that can just as well
+    # happen later (prefetch). returns the function that gives the slot back, None if the host is busy
+    def try_slot(self, url):
+        state = self.state_for(url)
+        if replaying():
+            return lambda: None
+        if not state.semaphore.acquire(blocking=False):
+            return None
+        if not state.try_reserve():
+            state.semaphore.release()
+            return None
+
+        released = []
+        def release():
+            with state.lock:
+                if released:
+                    return
+                released.append(True)
+            state.semaphore.release()
+        return release
+
+    @asynccontextmanager
+    async def slot_async(self, url):
+        state = self.state_for(url)
+        if replaying():
+            yield state
+            return
+        async with state.async_semaphore():
+            wait = state.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield state
+
+    # tell the scheduler how the request went
+    def report(self, url, status, retry_after=None):
+        state = self.state_for(url)
+        if status in THROTTLE_STATUSES:
+            state.penalize(status, parse_retry_after(retry_after))
+        elif status and status < 400:
+            state.reward()
+
+_shared = None
+_shared_lock = threading.Lock()
+
+# the process-wide scheduler everything uses unless it brings its own
+def get_scheduler():
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HostScheduler()
+        return _shared
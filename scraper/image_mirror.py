@@ -0,0 +1,196 @@
+# scraper/image_mirror.py
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scraper.events import print_flush
+from scraper.host_scheduler import HostScheduler, get_scheduler, THROTTLE_STATUSES
+
+# bulk downloader for scraped chapter image lists. keep-alive pooled connections, per-host caps and
+# rates from host_scheduler, files streamed straight to disk, retries with backoff and a manifest so a killed run picks up
+# where it left off instead of starting over
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36"
+
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 64 * 1024
+
+# statuses worth retrying, everything else 4xx is a real failure
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+def make_session(pool_size):
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def image_filename(url, index):
+    ext = os.path.splitext(urlparse(url).path)[1].lower() or ".jpg"
+    return f"img_{index:03}{ext}"
+
+# what's already done lives in folder/manifest.json, keyed by url
+class Manifest:
+    def __init__(self, folder):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("images", {})
+
+    def is_done(self, url, folder):
+        entry = self.entries.get(url)
+        return bool(entry and entry.get("status") == "done"
+                    and os.path.exists(os.path.join(folder, entry["file"])))
+
+    def update(self, url, **fields):
+        with self.lock:
+            self.entries.setdefault(url, {}).update(fields)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"images": self.entries}, f, indent=2)
+            os.replace(tmp_path, self.path) # never leave a half written manifest behind
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(60.0, float(retry_after))
+        except ValueError:
+            pass
+    return min(30.0, 0.5 * (2 ** attempt)) * random.uniform(0.75, 1.25)
+
+# download one file to folder/filename. a leftover .part gets resumed with a range request.
+# each attempt takes a slot from the host scheduler, backoff sleeps happen outside of it.
+# returns bytes written this run
+def download_one(session, url, path, referer=None, retries=3, timeout=30, scheduler=None):
+    part_path = path + ".part"
+    headers = {"Referer": referer} if referer else {}
+    scheduler = scheduler or get_scheduler()
+
+    for attempt in range(retries + 1):
+        have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request_headers = dict(headers)
+        if have:
+            request_headers["Range"] = f"bytes={have}-"
+
+        try:
+            with scheduler.slot(url), session.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+                scheduler.report(url, response.status_code, response.headers.get("Retry-After"))
+
+                # the .part was already complete last time, we just never renamed it
+                if response.status_code == 416 and have:
+                    os.replace(part_path, path)
+                    return 0
+
+                if response.status_code in RETRY_STATUSES and attempt < retries:
+                    # throttled hosts are already on hold in the scheduler, the next slot waits for it
+                    if response.status_code not in THROTTLE_STATUSES:
+                        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+                        print_flush(f"[!] {response.status_code} for {url}, retrying in {delay:.1f}s", level="warn")
+                        time.sleep(delay)
+                    continue
+                response.raise_for_status()
+
+                # server ignored the range, start the file over
+                mode = "ab" if have and response.status_code == 206 else "wb"
+                written = 0
+                with open(part_path, mode) as out_file:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        out_file.write(chunk)
+                        written += len(chunk)
+
+            os.replace(part_path, path)
+            return written
+
+        except requests.RequestException as e:
+            # a 404/403 isn't going to fix itself
+            status = e.response.status_code if getattr(e, "response", None) is not None else None
+            if attempt >= retries or (status and status not in RETRY_STATUSES):
+                raise
+            delay = backoff_delay(attempt)
+            print_flush(f"[!] Download failed for {url} ({e}), retrying in {delay:.1f}s", level="warn")
+            time.sleep(delay)
+
+    raise requests.RequestException(f"gave up on {url}")
+
+# mirror one chapter's images into folder, in parallel. safe to re-run after an interruption.
+# per_host only changes the cap for hosts the site registry has no limits for
+def mirror_chapter(image_urls, folder, concurrency=8, per_host=None, retries=3, referer=None, session=None):
+    os.makedirs(folder, exist_ok=True)
+    manifest = Manifest(folder)
+    scheduler = HostScheduler({"concurrency": per_host}) if per_host else get_scheduler()
+    session = session or make_session(concurrency)
+
+    stats = {"files": 0, "skipped": 0, "failed": [], "bytes": 0}
+    stats_lock = threading.Lock()
+    started = time.perf_counter()
+
+    def job(index, url):
+        filename = image_filename(url, index)
+        if manifest.is_done(url, folder):
+            with stats_lock:
+                stats["skipped"] += 1
+            return
+
+        try:
+            written = download_one(session, url, os.path.join(folder, filename), referer, retries, scheduler=scheduler)
+        except Exception as e:
+            manifest.update(url, file=filename, index=index, status="failed", error=str(e))
+            with stats_lock:
+                stats["failed"].append(url)
+            print_flush(f"[!] Failed to download {url}: {e}", level="warn")
+            return
+
+        manifest.update(url, file=filename, index=index, status="done", bytes=written)
+        with stats_lock:
+            stats["files"] += 1
+            stats["bytes"] += written
+        print_flush(f"[+] Saved: {filename}", level="debug")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(job, i, url) for i, url in enumerate(image_urls)]
+        for future in as_completed(futures):
+            future.result()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["mb_per_second"] = round(stats["bytes"] / 1e6 / stats["seconds"], 2) if stats["seconds"] else 0.0
+    print_flush(
+        f"[*] Mirrored {stats['files']} images ({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']}s "
+        f"at {stats['mb_per_second']} MB/s, {stats['skipped']} already done, {len(stats['failed'])} failed"
+    )
+    return stats
+
+def read_urls(path):
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with source:
+        return [line.strip() for line in source if line.strip().startswith("http")]
+
+# python scraper/image_mirror.py output/images.txt --out mirror/chapter-12
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mirror a chapter's image list to disk")
+    parser.add_argument("urls_file", help="one image url per line, - for stdin")
+    parser.add_argument("--out", required=True, help="folder for this chapter")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("MIRROR_CONCURRENCY", "8")))
+    parser.add_argument("--per-host", type=int, default=int(os.getenv("MIRROR_PER_HOST", "0")) or None,
+                        help="parallel downloads per host for hosts without limits in the site registry")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--referer", default=None, help="some cdns only serve images with the reader page as referer")
+    args = parser.parse_args()
+
+    result = mirror_chapter(
+        read_urls(args.urls_file), args.out,
+        concurrency=args.concurrency, per_host=args.per_host, retries=args.retries, referer=args.referer,
+    )
+    sys.exit(1 if result["failed"] else 0)
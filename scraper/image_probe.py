@@ -0,0 +1,173 @@
+# scraper/image_probe.py
+
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scraper.events import print_flush
+from scraper.scrape_cache import open_cache
+from scraper.host_scheduler import get_scheduler
+
+# figure out an image's size without downloading or rendering it: ask for the first few KB with a
+# range request and read the dimensions straight out of the JPEG/PNG/WebP/GIF header
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36"
+
+PROBE_BYTES = 4096
+# jpegs with a big exif block push the SOF marker further in, second try reads this much
+PROBE_BYTES_JPEG_RETRY = 65536
+
+# chapter pages are big and usually tall. banners are wide, logos/thumbnails are small
+MIN_WIDTH = 300
+MIN_HEIGHT = 400
+MAX_ASPECT = 2.5 # width / height, anything wider than this is a banner
+
+def probe_enabled():
+    return os.getenv("PROBE_IMAGES", "false").lower() in ("true", "1", "yes")
+
+def make_session(pool_size=16):
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def parse_jpeg(data):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        # padding / standalone markers without a length
+        if marker == 0xFF or marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 1 if marker == 0xFF else 2
+            continue
+        # start of frame, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        segment_length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        i += 2 + segment_length
+    return None
+
+def parse_webp(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None
+
+# {"format", "width", "height"} from the first bytes of a file, None if we can't tell (yet)
+def parse_image_header(data):
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return {"format": "png", "width": width, "height": height}
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        width, height = struct.unpack("<HH", data[6:10])
+        return {"format": "gif", "width": width, "height": height}
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        size = parse_webp(data)
+        return {"format": "webp", "width": size[0], "height": size[1]} if size else None
+    if data[:2] == b"\xff\xd8":
+        size = parse_jpeg(data)
+        return {"format": "jpeg", "width": size[0], "height": size[1]} if size else None
+    return None
+
+# total file size from Content-Range (bytes 0-4095/123456), or Content-Length if the range got ignored.
+# None when neither is there or the server sent garbage, the size is only nice to have
+def total_size(response):
+    content_range = response.headers.get("Content-Range", "")
+    try:
+        if "/" in content_range and not content_range.endswith("/*"):
+            return int(content_range.rsplit("/", 1)[1])
+        if response.status_code == 200 and response.headers.get("Content-Length"):
+            return int(response.headers["Content-Length"])
+    except ValueError:
+        pass
+    return None
+
+def read_head(session, url, size, referer=None, timeout=10):
+    headers = {"Range": f"bytes=0-{size - 1}"}
+    if referer:
+        headers["Referer"] = referer
+    scheduler = get_scheduler()
+    with scheduler.slot(url), session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        scheduler.report(url, response.status_code, response.headers.get("Retry-After"))
+        response.raise_for_status()
+        data = b""
+        # servers that ignore Range send the whole thing, stop reading once we have enough
+        for chunk in response.iter_content(size):
+            data += chunk
+            if len(data) >= size:
+                break
+        return data[:size], total_size(response)
+
+# probe one url, None when the request failed or the header made no sense
+def probe(url, session=None, referer=None):
+    session = session or make_session(1)
+    try:
+        data, size = read_head(session, url, PROBE_BYTES, referer)
+        info = parse_image_header(data)
+        if info is None and data[:2] == b"\xff\xd8":
+            data, size = read_head(session, url, PROBE_BYTES_JPEG_RETRY, referer)
+            info = parse_image_header(data)
+    except requests.RequestException as e:
+        print_flush(f"[!] Probe failed for {url}: {e}", level="debug")
+        return None
+    except (ValueError, struct.error) as e:
+        # truncated / corrupt header, one odd image shouldn't take the whole pool.map down
+        print_flush(f"[!] Couldn't read the image header of {url}: {e}", level="debug")
+        return None
+
+    if info is not None:
+        info["bytes"] = size
+    return info
+
+# probe a whole list at once. results get cached by url (the image behind a url doesn't change)
+def probe_many(urls, concurrency=16, referer=None):
+    results = {}
+    cache = open_cache()
+    todo = []
+    for url in dict.fromkeys(urls):
+        cached = cache.get("probe", url) if cache is not None else None
+        if cached is not None:
+            results[url] = cached
+        else:
+            todo.append(url)
+
+    if todo:
+        session = make_session(concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for url, info in zip(todo, pool.map(lambda u: probe(u, session, referer), todo)):
+                results[url] = info
+                if info is not None and cache is not None:
+                    cache.put("probe", url, info)
+
+    if cache is not None:
+        cache.close()
+    print_flush(f"[*] Probed {len(results)} images ({len(results) - len(todo)} from cache)")
+    return results
+
+# does this look like an actual chapter page? unknown sizes are kept, better a stray ad than a missing page
+def looks_like_page(info, min_width=MIN_WIDTH, min_height=MIN_HEIGHT, max_aspect=MAX_ASPECT):
+    if not info or not info.get("width") or not info.get("height"):
+        return True
+    if info["width"] < min_width or info["height"] < min_height:
+        return False
+    return info["width"] / info["height"] <= max_aspect
+
+def filter_by_size(urls, referer=None, min_width=MIN_WIDTH, min_height=MIN_HEIGHT, max_aspect=MAX_ASPECT):
+    probes = probe_many(urls, referer=referer)
+    kept = [u for u in urls if looks_like_page(probes.get(u), min_width, min_height, max_aspect)]
+    print_flush(f"[*] Size probe kept {len(kept)}/{len(urls)} images")
+    return kept
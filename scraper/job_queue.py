@@ -0,0 +1,459 @@
+# scraper/job_queue.py
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+from scraper.events import print_flush
+from scraper.scrape_cache import open_cache, force_refresh
+from scraper.recurring_assets import drop_recurring
+
+# durable queue for big backfills. chapters go into a sqlite file with a state, attempt count and
+# result, worker processes (one warm browser each) claim them one at a time and write results back.
+# kill it, reboot, close the tab, whatever: running `work` again picks up where it stopped, and a job
+# whose worker died gets picked up again once its lease runs out
+#
+#   python -m scraper.job_queue add --batch solo-leveling urls.txt
+#   python -m scraper.job_queue work --processes 4
+#   python -m scraper.job_queue status
+#   python -m scraper.job_queue results --batch solo-leveling > results.ndjson
+
+QUEUE_PATH = os.getenv("JOB_QUEUE_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "wormscans", "job_queue.sqlite3"
+)
+
+STATES = ("queued", "running", "done", "failed")
+
+# a running job is only ours while the lease is fresh, workers renew it while they scrape
+LEASE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 4
+# one chapter never gets longer than this, a stuck browser gets its worker process restarted
+DEFAULT_JOB_TIMEOUT = 300
+POLL_SECONDS = 2.0
+# a worker process that dies this soon after starting counts as a crash loop (playwright missing,
+# browser won't launch...). it gets restarted with a growing delay, and not at all after a few tries
+HEALTHY_SECONDS = 60
+MAX_RESTARTS = 5
+
+def retry_delay(attempts):
+    # 30s, 1m, 2m, 4m ... capped at an hour, jittered so a batch of failures doesn't retry in lockstep
+    return min(3600.0, 30.0 * (2 ** max(0, attempts - 1))) * random.uniform(0.8, 1.2)
+
+class JobQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # autocommit, claims use an explicit BEGIN IMMEDIATE so two workers can't grab the same job
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch TEXT NOT NULL,
+                url TEXT NOT NULL,
+                options TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL,
+                lease_until REAL,
+                worker TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL,
+                UNIQUE (batch, url)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, available_at);
+        """)
+
+    def close(self):
+        self.db.close()
+
+    # queue urls under a batch name, urls already in that batch are skipped
+    def add(self, urls, batch="default", options=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        now = time.time()
+        payload = json.dumps(options or {})
+        self.db.execute("BEGIN")
+        before = self.db.total_changes
+        self.db.executemany(
+            "INSERT OR IGNORE INTO jobs (batch, url, options, max_attempts, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(batch, url, payload, max_attempts, now, now, now) for url in urls],
+        )
+        added = self.db.total_changes - before
+        self.db.execute("COMMIT")
+        return added
+
+    # hand the next job to this worker. a running job with an expired lease counts as crashed
+    def claim(self, worker, batch=None):
+        now = time.time()
+        batch_filter = " AND batch = ?" if batch else ""
+        params = (batch,) if batch else ()
+
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # crashed on its last attempt, no point trying again
+            self.db.execute(
+                "UPDATE jobs SET state = 'failed', error = 'worker died (lease expired)', finished_at = ?, updated_at = ? "
+                "WHERE state = 'running' AND lease_until < ? AND attempts >= max_attempts" + batch_filter,
+                (now, now, now) + params,
+            )
+            row = self.db.execute(
+                "SELECT * FROM jobs WHERE ((state = 'queued' AND available_at <= ?) OR (state = 'running' AND lease_until < ?))"
+                + batch_filter + " ORDER BY available_at, id LIMIT 1",
+                (now, now) + params,
+            ).fetchone()
+            if row is not None:
+                if row["state"] == "running":
+                    print_flush(f"[!] Job {row['id']} lost its worker ({row['worker']}), taking it over", level="warn")
+                self.db.execute(
+                    "UPDATE jobs SET state = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (worker, now + LEASE_SECONDS, now, row["id"]),
+                )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        job["options"] = json.loads(job["options"])
+        return job
+
+    # still working on it. False means someone else took the job over
+    def renew(self, job_id, worker):
+        now = time.time()
+        cursor = self.db.execute(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND state = 'running'",
+            (now + LEASE_SECONDS, now, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    # complete / fail only touch the job while it's still this worker's claim: same worker, same
+    # attempt, still running. a worker that lost its lease finds the job taken over and leaves it be
+    OWNED = "id = ? AND worker = ? AND attempts = ? AND state = 'running'"
+
+    # False if the job isn't ours anymore
+    def complete(self, job, worker, result):
+        now = time.time()
+        cursor = self.db.execute(
+            "UPDATE jobs SET state = 'done', result = ?, error = NULL, lease_until = NULL, finished_at = ?, updated_at = ? "
+            "WHERE " + self.OWNED,
+            (json.dumps(result), now, now, job["id"], worker, job["attempts"]),
+        )
+        return cursor.rowcount == 1
+
+    # back in the queue after a delay, or failed for good once it's out of attempts.
+    # None if the job isn't ours anymore
+    def fail(self, job, worker, error):
+        now = time.time()
+        owned = (job["id"], worker, job["attempts"])
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.db.execute("SELECT attempts, max_attempts FROM jobs WHERE " + self.OWNED, owned).fetchone()
+            if row is None:
+                state = None
+            elif row["attempts"] < row["max_attempts"]:
+                self.db.execute(
+                    "UPDATE jobs SET state = 'queued', error = ?, lease_until = NULL, available_at = ?, updated_at = ? "
+                    "WHERE " + self.OWNED,
+                    (error, now + retry_delay(row["attempts"]), now) + owned,
+                )
+                state = "queued"
+            else:
+                self.db.execute(
+                    "UPDATE jobs SET state = 'failed', error = ?, lease_until = NULL, finished_at = ?, updated_at = ? "
+                    "WHERE " + self.OWNED,
+                    (error, now, now) + owned,
+                )
+                state = "failed"
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return state
+
+    # queued jobs, or running ones that might still come back as a retry
+    def has_pending(self, batch=None):
+        query = "SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'running')"
+        params = ()
+        if batch:
+            query += " AND batch = ?"
+            params = (batch,)
+        return self.db.execute(query, params).fetchone()[0] > 0
+
+    def retry_failed(self, batch=None):
+        now = time.time()
+        query = "UPDATE jobs SET state = 'queued', attempts = 0, available_at = ?, updated_at = ? WHERE state = 'failed'"
+        params = (now, now)
+        if batch:
+            query += " AND batch = ?"
+            params += (batch,)
+        return self.db.execute(query, params).rowcount
+
+    def status(self, batch=None):
+        where = " WHERE batch = ?" if batch else ""
+        params = (batch,) if batch else ()
+        batches = {}
+        for row in self.db.execute(f"SELECT batch, state, COUNT(*) AS n FROM jobs{where} GROUP BY batch, state", params):
+            counts = batches.setdefault(row["batch"], {state: 0 for state in STATES})
+            counts[row["state"]] = row["n"]
+        for name, counts in batches.items():
+            total = sum(counts[state] for state in STATES)
+            counts["total"] = total
+            counts["progress"] = round((counts["done"] + counts["failed"]) / total * 100, 1) if total else 100.0
+
+        # how fast things are going, last 10 minutes
+        since = time.time() - 600
+        recent = self.db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = 'done' AND finished_at >= ?" + (" AND batch = ?" if batch else ""),
+            (since,) + params,
+        ).fetchone()[0]
+        errors = [dict(row) for row in self.db.execute(
+            "SELECT id, batch, url, state, attempts, error FROM jobs WHERE error IS NOT NULL"
+            + (" AND batch = ?" if batch else "") + " ORDER BY updated_at DESC LIMIT 10",
+            params,
+        )]
+        return {"batches": batches, "done_last_10_min": recent, "recent_errors": errors}
+
+    def results(self, batch=None):
+        where = " WHERE batch = ?" if batch else ""
+        params = (batch,) if batch else ()
+        for row in self.db.execute(f"SELECT id, batch, url, state, attempts, result, error FROM jobs{where} ORDER BY id", params):
+            item = dict(row)
+            item["result"] = json.loads(item["result"]) if item["result"] else None
+            yield item
+
+# ---- workers ----
+
+def cached_images(url, lazy):
+    if force_refresh():
+        return None
+    cache = open_cache()
+    if cache is None:
+        return None
+    images = cache.get("images", url, "lazy" if lazy else "static-dom")
+    cache.close()
+    # same as scrape_images' cache hits
+    return drop_recurring(url, images) if images is not None else None
+
+def store_images(url, lazy, images):
+    cache = open_cache()
+    if cache is not None:
+        cache.put("images", url, images, "lazy" if lazy else "static-dom")
+        cache.close()
+
+# one worker process: a warm browser (the daemon's pool with one thread) and a claim loop
+def worker_main(worker_id, path, batch, pages_per_context, job_timeout, stop_when_idle):
+    from scraper.scraper_daemon import BrowserPool
+
+    queue = JobQueue(path)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    pool = BrowserPool(workers=1, pages_per_context=pages_per_context)
+    print_flush(f"[*] Queue worker {worker_id} started ({name})")
+
+    try:
+        while True:
+            job = queue.claim(name, batch)
+            if job is None:
+                if stop_when_idle and not queue.has_pending(batch):
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+
+            options = job["options"]
+            lazy = bool(options.get("lazy"))
+            print_flush(f"[*] Worker {worker_id} job {job['id']} (attempt {job['attempts']}/{job['max_attempts']}): {job['url']}")
+
+            images = cached_images(job["url"], lazy)
+            if images is not None:
+                queue.complete(job, name, {"url": job["url"], "ok": True, "images": images, "tier": "cache"})
+                continue
+
+            done = threading.Event()
+            reply = {}
+
+            def on_result(result, done=done, reply=reply):
+                reply["result"] = result
+                done.set()
+
+            pool.submit({
+                "id": job["id"], "url": job["url"], "lazy": lazy,
+                "capture": bool(options.get("capture")), "static": bool(options.get("static")),
+            }, on_result)
+
+            # keep the lease fresh while the browser works, give up on chapters that hang
+            deadline = time.monotonic() + job_timeout
+            while not done.wait(LEASE_SECONDS / 3):
+                if time.monotonic() > deadline:
+                    queue.fail(job, name, f"timed out after {job_timeout}s")
+                    print_flush(f"[!] Worker {worker_id} stuck on job {job['id']}, restarting the worker", level="error")
+                    os._exit(3) # browser thread is wedged, the supervisor starts a fresh process
+                if not queue.renew(job["id"], name):
+                    print_flush(f"[!] Worker {worker_id} lost the lease on job {job['id']}", level="warn")
+
+            result = reply["result"]
+            # an empty list is almost always a scrape that went wrong, worth another try
+            if result.get("ok") and result.get("images"):
+                store_images(job["url"], lazy, result["images"])
+                if queue.complete(job, name, result):
+                    print_flush(f"[*] Worker {worker_id} job {job['id']} done, {len(result['images'])} images ({result.get('tier')})")
+                else:
+                    print_flush(f"[!] Worker {worker_id} job {job['id']} was taken over meanwhile, result dropped", level="warn")
+            else:
+                error = result.get("error") or "no images found"
+                state = queue.fail(job, name, error)
+                print_flush(f"[!] Worker {worker_id} job {job['id']} failed ({error}), {state or 'taken over meanwhile'}", level="warn")
+    finally:
+        pool.shutdown()
+        queue.close()
+
+# start the worker processes and keep them alive until the queue runs dry
+def run_workers(path, processes, batch=None, pages_per_context=20, job_timeout=DEFAULT_JOB_TIMEOUT, forever=False):
+    spawn = multiprocessing.get_context("spawn") # playwright doesn't survive a fork
+
+    def start(worker_id):
+        proc = spawn.Process(
+            target=worker_main, name=f"queue-worker-{worker_id}",
+            args=(worker_id, path, batch, pages_per_context, job_timeout, not forever),
+        )
+        proc.start()
+        return proc
+
+    workers = {i: start(i) for i in range(1, processes + 1)}
+    started = {i: time.monotonic() for i in workers}
+    crashes = {i: 0 for i in workers}
+    restart_at = {} # worker id -> when its replacement may start
+    queue = JobQueue(path)
+    try:
+        while workers or restart_at:
+            time.sleep(1)
+            now = time.monotonic()
+            for worker_id, when in list(restart_at.items()):
+                if now >= when:
+                    del restart_at[worker_id]
+                    workers[worker_id] = start(worker_id)
+                    started[worker_id] = now
+
+            for worker_id, proc in list(workers.items()):
+                if proc.is_alive():
+                    continue
+                del workers[worker_id]
+                if proc.exitcode == 0 or not queue.has_pending(batch):
+                    continue
+
+                # a worker that ran fine for a while just had a bad job, one that dies right away is broken
+                crashes[worker_id] = 0 if now - started[worker_id] >= HEALTHY_SECONDS else crashes[worker_id] + 1
+                if crashes[worker_id] > MAX_RESTARTS:
+                    print_flush(f"[!] Worker {worker_id} keeps dying on startup (exit {proc.exitcode}), giving up on it", level="error")
+                    continue
+                delay = min(60.0, 2.0 ** crashes[worker_id]) if crashes[worker_id] else 0.0
+                print_flush(f"[!] Worker {worker_id} exited with {proc.exitcode}, starting a new one in {delay:.0f}s", level="warn")
+                restart_at[worker_id] = now + delay
+    except KeyboardInterrupt:
+        print_flush("[*] Stopping workers, running jobs go back to the queue once their lease runs out")
+        for proc in workers.values():
+            proc.terminate()
+        for proc in workers.values():
+            proc.join()
+    finally:
+        queue.close()
+
+def read_urls(sources):
+    urls = []
+    for source in sources or ["-"]:
+        if source.startswith("http"):
+            urls.append(source)
+            continue
+        handle = sys.stdin if source == "-" else open(source, encoding="utf-8")
+        with handle:
+            urls.extend(line.strip() for line in handle if line.strip().startswith("http"))
+    return urls
+
+def print_status(status):
+    if not status["batches"]:
+        print("[*] Queue is empty.")
+    for name, counts in sorted(status["batches"].items()):
+        print(
+            f"{name:<30} {counts['progress']:>5}%  {counts['done']} done, {counts['running']} running, "
+            f"{counts['queued']} queued, {counts['failed']} failed (of {counts['total']})"
+        )
+    print(f"[*] {status['done_last_10_min']} chapters finished in the last 10 minutes")
+    for error in status["recent_errors"]:
+        print(f"[!] #{error['id']} {error['state']} after {error['attempts']} attempts: {error['url']} - {error['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable scrape job queue for large backfills")
+    parser.add_argument("--db", default=QUEUE_PATH, help="queue database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="queue chapter urls")
+    add.add_argument("sources", nargs="*", help="urls, files with one url per line, or - for stdin")
+    add.add_argument("--batch", default="default")
+    add.add_argument("--lazy", action="store_true", help="lazy scroll like USE_LAZY=true")
+    add.add_argument("--static", action="store_true", help="try the plain html tier first")
+    add.add_argument("--capture", action="store_true", help="grab image urls off the network")
+    add.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+
+    work = commands.add_parser("work", help="run worker processes until the queue is empty")
+    work.add_argument("--processes", type=int, default=int(os.getenv("QUEUE_PROCESSES", str(max(1, (os.cpu_count() or 2) // 2)))))
+    work.add_argument("--batch", default=None, help="only work on this batch")
+    work.add_argument("--pages-per-context", type=int, default=20)
+    work.add_argument("--job-timeout", type=int, default=DEFAULT_JOB_TIMEOUT)
+    work.add_argument("--forever", action="store_true", help="keep polling for new jobs instead of exiting")
+
+    status = commands.add_parser("status", help="progress per batch")
+    status.add_argument("--batch", default=None)
+    status.add_argument("--json", action="store_true")
+
+    results = commands.add_parser("results", help="dump job results as json lines")
+    results.add_argument("--batch", default=None)
+
+    retry = commands.add_parser("retry-failed", help="put failed jobs back in the queue")
+    retry.add_argument("--batch", default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "work":
+        run_workers(args.db, args.processes, args.batch, args.pages_per_context, args.job_timeout, args.forever)
+        print_flush("[*] Queue workers finished.")
+        return 0
+
+    queue = JobQueue(args.db)
+    try:
+        if args.command == "add":
+            urls = read_urls(args.sources)
+            options = {"lazy": args.lazy, "static": args.static, "capture": args.capture}
+            added = queue.add(urls, args.batch, options, args.max_attempts)
+            print(f"[*] Queued {added} new chapters in batch '{args.batch}' ({len(urls) - added} already there)")
+        elif args.command == "status":
+            report = queue.status(args.batch)
+            if args.json:
+                print(json.dumps(report, indent=2))
+            else:
+                print_status(report)
+        elif args.command == "results":
+            for item in queue.results(args.batch):
+                print(json.dumps(item))
+        elif args.command == "retry-failed":
+            print(f"[*] Re-queued {queue.retry_failed(args.batch)} failed jobs")
+    finally:
+        queue.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# scraper/metrics.py
+
+import os
+import re
+import sys
+import csv
+import time
+import weakref
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from scraper.events import print_flush, emit, is_ndjson
+
+# resource and fcntl don't exist on windows, metrics still work there just without cpu/rss and file locking
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# where one scrape's time went. every scrape gets a ScrapeMetrics, phases add timed spans
+# (goto, simulate, scroll...) and counters (requests, blocked, scroll steps, images...) to whichever
+# one is current, and the summary goes out as a log line / ndjson "metrics" event when it's done.
+# METRICS_FILE=/path/scrapes.csv appends one row per scrape, a .prom file keeps running per-domain
+# totals in prometheus textfile format for node_exporter to pick up
+
+METRICS_FILE = os.getenv("METRICS_FILE")
+PROM_PREFIX = "wormscans_scrape"
+
+# fixed csv columns so rows from different versions still line up
+CSV_PHASES = ("cache", "static", "launch", "goto", "simulate", "wait_selector", "scroll", "extract", "filter", "close")
+CSV_COUNTERS = (
+    "requests", "requests_blocked", "bytes_received", "scroll_steps", "human_sleep_seconds",
+    "img_tags", "images_found", "links_found", "nav_retries",
+)
+
+_current = contextvars.ContextVar("scrape_metrics", default=None)
+
+# page -> the metrics its responses count towards
+_watched = weakref.WeakKeyDictionary()
+
+def get_domain(url):
+    return (urlparse(url).hostname or "").lower().replace("www.", "")
+
+def cpu_seconds():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # KB on linux, bytes on mac
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+class ScrapeMetrics:
+    def __init__(self, url, kind="images"):
+        self.url = url
+        self.kind = kind
+        self.domain = get_domain(url)
+        self.tier = None
+        self.ok = None
+        self.error = None
+        self.spans = {} # phase -> seconds, a phase that runs twice (goto retry) adds up
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.cpu_started = cpu_seconds()
+        self.seconds = None
+        self.cpu = None
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    # count every response the page gets. bytes come from content-length so it costs no extra
+    # round trip, chunked responses without one don't count towards bytes.
+    # a page only gets one listener, watching it again (a prefetched tab handed over to its own
+    # scrape) just moves where its counts go from then on
+    def watch_page(self, page):
+        watched = page in _watched
+        _watched[page] = self
+        if watched:
+            return
+
+        def on_response(response):
+            metrics = _watched.get(page)
+            if metrics is None:
+                return
+            metrics.count("requests")
+            length = response.headers.get("content-length")
+            if length and length.isdigit():
+                metrics.count("bytes_received", int(length))
+
+        page.on("response", on_response)
+
+    # add another scrape's counters to this one
+    def absorb(self, other):
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        if self.cpu_started is not None:
+            # whole process, so with several chapters in flight this is shared between them
+            self.cpu = cpu_seconds() - self.cpu_started
+
+    def summary(self):
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        summary = {
+            "kind": self.kind,
+            "url": self.url,
+            "domain": self.domain,
+            "tier": self.tier,
+            "ok": self.ok,
+            "seconds": round(seconds, 3),
+            "spans": {name: round(value, 3) for name, value in self.spans.items()},
+            "counters": {name: round(value, 3) if isinstance(value, float) else value for name, value in self.counters.items()},
+        }
+        if self.cpu is not None:
+            summary["cpu_seconds"] = round(self.cpu, 3)
+        if resource is not None:
+            summary["peak_rss_mb"] = peak_rss_mb()
+        if self.error:
+            summary["error"] = self.error
+        return summary
+
+def current_metrics():
+    return _current.get()
+
+# time a phase of whatever scrape is running, does nothing outside of track_scrape
+@contextmanager
+def span(name):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.span(name):
+        yield
+
+def count(name, amount=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, amount)
+
+# wrap one scrape. works in async code too, every asyncio task gets its own copy of the current metrics
+@contextmanager
+def track_scrape(url, kind="images"):
+    metrics = ScrapeMetrics(url, kind)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+        if metrics.ok is None:
+            metrics.ok = True
+    except GeneratorExit:
+        # a streaming caller (iter_chapter_images) stopped early, that's not a failed scrape
+        metrics.ok = True
+        raise
+    except BaseException as e:
+        metrics.ok = False
+        metrics.error = str(e)
+        raise
+    finally:
+        # streaming generators can get closed from another asyncio task, that context never saw the set
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass
+        metrics.finish()
+        report(metrics)
+
+def report(metrics):
+    summary = metrics.summary()
+    if is_ndjson():
+        emit("metrics", **summary)
+    else:
+        phases = ", ".join(f"{name} {value:.2f}s" for name, value in summary["spans"].items())
+        counters = ", ".join(f"{name} {value}" for name, value in summary["counters"].items())
+        print_flush(f"[*] Timing for {summary['domain']} ({summary['seconds']:.2f}s total): {phases or 'no phases'}")
+        if counters:
+            print_flush(f"[*] Counters: {counters}")
+
+    if METRICS_FILE:
+        try:
+            write_metrics_file(METRICS_FILE, summary)
+        except OSError as e:
+            print_flush(f"[!] Couldn't write metrics to {METRICS_FILE}: {e}", level="warn")
+
+# several scrapes can finish at once (async engine, daemon workers, parallel api calls)
+@contextmanager
+def locked(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_metrics_file(path, summary):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with locked(path):
+        if path.endswith(".prom"):
+            write_prometheus(path, summary)
+        else:
+            append_csv(path, summary)
+
+def append_csv(path, summary):
+    header = ["ts", "kind", "domain", "url", "tier", "ok", "seconds", "cpu_seconds", "peak_rss_mb"]
+    header += [f"{phase}_seconds" for phase in CSV_PHASES] + list(CSV_COUNTERS)
+    row = [
+        round(time.time(), 3), summary["kind"], summary["domain"], summary["url"], summary["tier"],
+        int(bool(summary["ok"])), summary["seconds"], summary.get("cpu_seconds", ""), summary.get("peak_rss_mb", ""),
+    ]
+    row += [summary["spans"].get(phase, "") for phase in CSV_PHASES]
+    row += [summary["counters"].get(name, "") for name in CSV_COUNTERS]
+
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if is_new:
+            writer.writerow(header)
+        writer.writerow(row)
+
+PROM_LINE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$")
+
+def prom_labels(**labels):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+# textfile collector wants the whole file every time, so read our running totals back,
+# add this scrape on top and swap the file in atomically
+def write_prometheus(path, summary):
+    values = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                match = PROM_LINE_RE.match(line.strip())
+                if match and not line.startswith("#"):
+                    values[(match.group(1), match.group(2) or "")] = float(match.group(3))
+
+    def add(name, labels, amount):
+        key = (f"{PROM_PREFIX}_{name}", labels)
+        values[key] = values.get(key, 0.0) + amount
+
+    domain, kind = summary["domain"], summary["kind"]
+    add("total", prom_labels(domain=domain, kind=kind, tier=summary["tier"] or "none", ok=str(bool(summary["ok"])).lower()), 1)
+    add("seconds_total", prom_labels(domain=domain, kind=kind), summary["seconds"])
+    for phase, seconds in summary["spans"].items():
+        add("phase_seconds_total", prom_labels(domain=domain, kind=kind, phase=phase), seconds)
+    for name, amount in summary["counters"].items():
+        add(f"{name}_total", prom_labels(domain=domain, kind=kind), amount)
+    values[(f"{PROM_PREFIX}_last_seconds", prom_labels(domain=domain, kind=kind))] = summary["seconds"]
+    values[(f"{PROM_PREFIX}_last_timestamp_seconds", prom_labels(domain=domain, kind=kind))] = round(time.time(), 3)
+
+    lines = []
+    typed = set()
+    for (name, labels), value in sorted(values.items()):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {'gauge' if '_last_' in name else 'counter'}")
+        lines.append(f"{name}{labels} {int(value) if value.is_integer() else round(value, 6)}")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
@@ -1,31 +1,5 @@
-import os
-import time
-import urllib.request
-from urllib.parse import urlparse
 from playwright.sync_api import sync_playwright
-
-def download_image(url, folder, index):
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36'
-        }
-        req = urllib.request.Request(url, headers=headers)
-        parsed = urlparse(url)
-        ext = os.path.splitext(parsed.path)[1] or ".jpg"
-        filename = f"img_{index:03}{ext}"
-        filepath = os.path.join(folder, filename)
-
-        with urllib.request.urlopen(req) as response, open(filepath, 'wb') as out_file:
-            data = response.read()
-            out_file.write(data)
-
-        print(f"[+] Saved: {filename}")
-
-        if "imgur.com" in url:
-            time.sleep(1)  # Delay only for imgur URLs
-
-    except Exception as e:
-        print(f"[!] Failed to download {url}: {e}")
+from scraper.image_mirror import mirror_chapter
 
 def continuous_scroll_and_download(url):
     with sync_playwright() as p:
@@ -77,13 +51,8 @@ def continuous_scroll_and_download(url):
 
         print(f"[*] Found {len(img_urls)} image URLs. Downloading...")
 
-        # Make sure folder exists
-        folder = "debugimages"
-        os.makedirs(folder, exist_ok=True)
-
-        # Download images with delay for imgur
-        for i, img_url in enumerate(img_urls):
-            download_image(img_url, folder, i)
+        # pooled parallel download, per-host cap replaces the old imgur sleep
+        mirror_chapter(img_urls, "debugimages", referer=url)
 
         print("[*] Done.")
         browser.close()
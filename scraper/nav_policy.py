@@ -0,0 +1,311 @@
+# scraper/nav_policy.py
+
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from scraper.events import print_flush
+from scraper.metrics import locked, count
+from scraper.domains import get_domain
+from scraper.har_replay import replaying
+
+# how long to wait on a site, and how often to try again, based on how that site actually behaved.
+# every goto / wait_for_selector made through here records its latency per domain (an EWMA plus the
+# last SAMPLES_KEPT samples, persisted to NAV_HISTORY_PATH) and the next one gets a timeout derived
+# from that: fast sites that hang fail in seconds instead of 15, slow sites get the time they need.
+# retries follow the recent failure rate with jittered backoff, and the whole scrape runs against
+# one deadline (SCRAPE_DEADLINE seconds) so retries can't stack up into minutes.
+# timeouts count as samples of the time waited, so a site that keeps timing out gets more room
+
+NAV_HISTORY_PATH = os.getenv("NAV_HISTORY_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "wormscans", "nav_history.json"
+)
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "90"))
+
+# what a site gets before there's any history, same as the old hardcoded values (ms)
+DEFAULT_TIMEOUTS = {"goto": 15000, "index_page": 15000, "wait_selector": 30000, "wait_links": 10000}
+MIN_TIMEOUT = 3000
+MAX_TIMEOUT = 60000
+# timeout = max(p95 * P95_FACTOR, ewma * EWMA_FACTOR), clamped to the range above
+P95_FACTOR = 3.0
+EWMA_FACTOR = 4.0
+
+EWMA_ALPHA = 0.3
+SAMPLES_KEPT = 50
+OUTCOMES_KEPT = 20
+# the history file gets rewritten after this many new observations or this long, whichever is first
+FLUSH_EVERY = 20
+FLUSH_SECONDS = 30.0
+MAX_PENDING = 500
+MIN_SAMPLES = 5 # fewer than this and the defaults still apply
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+class DeadlineExceeded(Exception):
+    pass
+
+# the scrape's deadline, every task / thread that opens one gets its own
+_deadline = contextvars.ContextVar("scrape_deadline", default=None)
+
+# loaded once per process, refreshed from the file on every flush
+_history = None
+_history_lock = threading.RLock()
+# observations not written to NAV_HISTORY_PATH yet
+_pending = []
+_last_flush = time.monotonic()
+
+def load_history():
+    global _history
+    if _history is None:
+        _history = read_history()
+    return _history
+
+def read_history():
+    try:
+        with open(NAV_HISTORY_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def stats_for(domain, kind):
+    return load_history().get(domain, {}).get(kind)
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def apply(history, domain, kind, seconds, ok, when):
+    stats = history.setdefault(domain, {}).setdefault(kind, {"ewma": None, "samples": [], "outcomes": []})
+    if seconds is not None:
+        stats["ewma"] = seconds if stats["ewma"] is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * stats["ewma"]
+        stats["ewma"] = round(stats["ewma"], 3)
+        stats["samples"] = (stats["samples"] + [round(seconds, 3)])[-SAMPLES_KEPT:]
+    stats["outcomes"] = (stats["outcomes"] + [1 if ok else 0])[-OUTCOMES_KEPT:]
+    stats["updated"] = when
+
+# add one observation. it counts right away in this process, the file only gets rewritten every
+# FLUSH_EVERY observations / FLUSH_SECONDS (and at exit) so navigation doesn't wait on the disk.
+# replayed sessions load from disk, their timings say nothing about the site
+def record(domain, kind, seconds=None, ok=True):
+    if replaying():
+        return
+    now = time.time()
+    with _history_lock:
+        apply(load_history(), domain, kind, seconds, ok, now)
+        _pending.append((domain, kind, seconds, ok, now))
+        due = len(_pending) >= FLUSH_EVERY or time.monotonic() - _last_flush >= FLUSH_SECONDS
+    if due:
+        flush()
+
+# merge what this process saw into the shared file. read-modify-write under a lock, the daemon /
+# queue workers share it. a history that can't be saved is only logged, it never fails a scrape
+def flush():
+    global _history, _last_flush
+    with _history_lock:
+        pending = _pending[:]
+        del _pending[:]
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        folder = os.path.dirname(NAV_HISTORY_PATH)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with locked(NAV_HISTORY_PATH):
+            history = read_history()
+            for observation in pending:
+                apply(history, *observation)
+
+            tmp_path = NAV_HISTORY_PATH + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(history, f)
+            os.replace(tmp_path, NAV_HISTORY_PATH)
+        with _history_lock:
+            # other processes' observations come in with the file, ours that arrived meanwhile stay on top
+            for observation in _pending:
+                apply(history, *observation)
+            _history = history
+    except OSError as e:
+        print_flush(f"[!] Couldn't save navigation history: {e}", level="debug")
+        # try again with the next flush, but don't pile up forever when the disk never works
+        with _history_lock:
+            _pending[:0] = pending[-MAX_PENDING:]
+            del _pending[:-MAX_PENDING]
+
+atexit.register(flush)
+
+# timeout in ms for the next wait of this kind on this domain, already cut down to the deadline
+def timeout_ms(domain, kind="goto"):
+    stats = stats_for(domain, kind)
+    if stats and len(stats["samples"]) >= MIN_SAMPLES:
+        seconds = max(percentile(stats["samples"], 0.95) * P95_FACTOR, stats["ewma"] * EWMA_FACTOR)
+        timeout = min(MAX_TIMEOUT, max(MIN_TIMEOUT, seconds * 1000))
+    else:
+        timeout = DEFAULT_TIMEOUTS.get(kind, DEFAULT_TIMEOUTS["goto"])
+
+    remaining = remaining_ms()
+    if remaining is not None:
+        if remaining < 500:
+            raise DeadlineExceeded(f"scrape deadline reached before {kind} on {domain}")
+        timeout = min(timeout, remaining)
+    return int(timeout)
+
+def failure_rate(domain, kind="goto"):
+    stats = stats_for(domain, kind)
+    if not stats or not stats["outcomes"]:
+        return 0.0
+    return 1 - sum(stats["outcomes"]) / len(stats["outcomes"])
+
+# retries after the first try. reliable sites get one, flaky ones two, a site that's failing
+# nearly everything is probably down and gets none
+def retry_count(domain, kind="goto"):
+    stats = stats_for(domain, kind)
+    rate = failure_rate(domain, kind)
+    if stats and len(stats["outcomes"]) >= MIN_SAMPLES and rate > 0.8:
+        return 0
+    if rate > 0.1:
+        return 2
+    return 1
+
+# full jitter, scaled by how slow the site usually is
+def backoff_seconds(domain, attempt, kind="goto"):
+    stats = stats_for(domain, kind)
+    base = max(BACKOFF_BASE, (stats or {}).get("ewma") or 0)
+    delay = random.uniform(0, min(BACKOFF_CAP, base * 2 ** attempt))
+    remaining = remaining_ms()
+    if remaining is not None:
+        delay = min(delay, max(0.0, remaining / 1000 - MIN_TIMEOUT / 1000))
+    return delay
+
+def remaining_ms():
+    ends = _deadline.get()
+    return None if ends is None else (ends - time.monotonic()) * 1000
+
+# one deadline for everything a scrape does. nested calls reuse the outer deadline, so
+# scrape_page inside scrape_images doesn't start the clock over
+@contextmanager
+def scrape_deadline(seconds=None):
+    if _deadline.get() is not None:
+        yield
+        return
+    token = _deadline.set(time.monotonic() + (seconds or SCRAPE_DEADLINE))
+    try:
+        yield
+    finally:
+        reset_var(_deadline, token)
+
+# an abandoned async generator gets closed later from another task, whose context never had our
+# value set. nothing to undo then
+def reset_var(var, token):
+    try:
+        var.reset(token)
+    except ValueError:
+        pass
+
+# playwright's sync and async TimeoutError are different classes with the same name
+def is_timeout(error):
+    return type(error).__name__ == "TimeoutError"
+
+def record_failure(domain, kind, error, timeout):
+    # a timeout says the site needed at least that long, anything else (dns, reset) says nothing about speed
+    record(domain, kind, timeout / 1000 if is_timeout(error) else None, ok=False)
+
+# a flush (the locked file read-modify-write) would stall every other page on the event loop, run it in a thread
+async def record_async(domain, kind, seconds=None, ok=True):
+    await asyncio.to_thread(record, domain, kind, seconds, ok)
+
+async def record_failure_async(domain, kind, error, timeout):
+    await asyncio.to_thread(record_failure, domain, kind, error, timeout)
+
+def goto(page, url, wait_until="domcontentloaded", kind="goto"):
+    domain = get_domain(url)
+    retries = retry_count(domain, kind)
+    for attempt in range(retries + 1):
+        timeout = timeout_ms(domain, kind)
+        started = time.monotonic()
+        try:
+            response = page.goto(url, wait_until=wait_until, timeout=timeout)
+        except Exception as e:
+            record_failure(domain, kind, e, timeout)
+            if attempt >= retries:
+                raise
+            delay = backoff_seconds(domain, attempt, kind)
+            print_flush(f"[!] Load failed ({e}), retry {attempt + 1}/{retries} in {delay:.1f}s", level="warn")
+            count("nav_retries")
+            time.sleep(delay)
+            continue
+        record(domain, kind, time.monotonic() - started)
+        return response
+
+async def goto_async(page, url, wait_until="domcontentloaded", kind="goto"):
+    domain = get_domain(url)
+    retries = retry_count(domain, kind)
+    for attempt in range(retries + 1):
+        timeout = timeout_ms(domain, kind)
+        started = time.monotonic()
+        try:
+            response = await page.goto(url, wait_until=wait_until, timeout=timeout)
+        except Exception as e:
+            await record_failure_async(domain, kind, e, timeout)
+            if attempt >= retries:
+                raise
+            delay = backoff_seconds(domain, attempt, kind)
+            print_flush(f"[!] Load failed ({e}), retry {attempt + 1}/{retries} in {delay:.1f}s", level="warn")
+            count("nav_retries")
+            await asyncio.sleep(delay)
+            continue
+        await record_async(domain, kind, time.monotonic() - started)
+        return response
+
+# waits don't retry, the page is already there and waiting again rarely helps
+def wait_for_selector(page, url, selector, kind="wait_selector"):
+    domain = get_domain(url)
+    timeout = timeout_ms(domain, kind)
+    started = time.monotonic()
+    try:
+        handle = page.wait_for_selector(selector, timeout=timeout)
+    except Exception as e:
+        record_failure(domain, kind, e, timeout)
+        raise
+    record(domain, kind, time.monotonic() - started)
+    return handle
+
+async def wait_for_selector_async(page, url, selector, kind="wait_selector"):
+    domain = get_domain(url)
+    timeout = timeout_ms(domain, kind)
+    started = time.monotonic()
+    try:
+        handle = await page.wait_for_selector(selector, timeout=timeout)
+    except Exception as e:
+        await record_failure_async(domain, kind, e, timeout)
+        raise
+    await record_async(domain, kind, time.monotonic() - started)
+    return handle
+
+# python -m scraper.nav_policy [domain]
+# what the history looks like and the timeouts / retries it hands out right now
+if __name__ == "__main__":
+    only = sys.argv[1] if len(sys.argv) > 1 else None
+    history = load_history()
+    if not history:
+        print(f"[*] No navigation history yet ({NAV_HISTORY_PATH})")
+    for domain, kinds in sorted(history.items()):
+        if only and domain != only:
+            continue
+        for kind, stats in sorted(kinds.items()):
+            samples = stats["samples"]
+            p50 = f"{percentile(samples, 0.5):.2f}s" if samples else "-"
+            p95 = f"{percentile(samples, 0.95):.2f}s" if samples else "-"
+            ewma = f"{stats['ewma']:.2f}s" if stats["ewma"] is not None else "-"
+            print(
+                f"    {domain:<28} {kind:<14} ewma={ewma:<7} p50={p50:<7} p95={p95:<7} "
+                f"fail={failure_rate(domain, kind):.0%} timeout={timeout_ms(domain, kind)}ms retries={retry_count(domain, kind)}"
+            )
@@ -0,0 +1,86 @@
+# scraper/network_capture.py
+
+import os
+import re
+from urllib.parse import urlparse
+from scraper.playwright_utils import print_flush
+
+# extensions that count as an image request even if the resource type says otherwise
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif")
+
+# only image urls get routed through python, everything else never leaves the browser (the request
+# filter's narrow routes stay narrow). images served without an extension just load normally
+IMAGE_URL_PATTERN = re.compile(r"\.(jpe?g|png|webp|gif|avif)(?:[?#]|$)", re.I)
+
+# tiny stand-in for every chapter image. it still has a page-ish size so the layout keeps its height,
+# lazy loaders keep firing as we scroll and size filters still see something that looks like a page
+PLACEHOLDER_BODY = b'<svg xmlns="http://www.w3.org/2000/svg" width="800" height="1200"></svg>'
+PLACEHOLDER_TYPE = "image/svg+xml"
+
+def is_image_request(request):
+    if request.resource_type == "image":
+        return True
+    path = urlparse(request.url).path.lower()
+    return path.endswith(IMAGE_EXTENSIONS)
+
+# records image requests off the network instead of letting chrome download them.
+# install it before navigating, any other route handler has to use route.fallback() so we still see images
+class ImageCapture:
+    def __init__(self):
+        self.requests = [] # in the order the browser asked for them
+        self.seen = set()
+        self.placeholder_bytes = 0
+
+    def record(self, request):
+        if request.url not in self.seen:
+            self.seen.add(request.url)
+            self.requests.append({
+                "order": len(self.requests),
+                "url": request.url,
+                "headers": request.headers,
+            })
+        self.placeholder_bytes += len(PLACEHOLDER_BODY)
+
+    def handle(self, route, request):
+        if not is_image_request(request):
+            route.fallback()
+            return
+        self.record(request)
+        route.fulfill(status=200, content_type=PLACEHOLDER_TYPE, body=PLACEHOLDER_BODY)
+
+    async def handle_async(self, route, request):
+        if not is_image_request(request):
+            await route.fallback()
+            return
+        self.record(request)
+        await route.fulfill(status=200, content_type=PLACEHOLDER_TYPE, body=PLACEHOLDER_BODY)
+
+    def install(self, page):
+        page.route(IMAGE_URL_PATTERN, self.handle)
+
+    async def install_async(self, page):
+        await page.route(IMAGE_URL_PATTERN, self.handle_async)
+
+    def urls(self):
+        return [r["url"] for r in self.requests]
+
+    # the chapter list in the order the browser asked for it, when the wire saw exactly the images
+    # the DOM path picked. anything else (an image missed on the wire, loaded without an extension)
+    # and the DOM list is what goes out, capture mode never changes which urls come back
+    def report(self, image_urls):
+        captured = set(self.seen)
+        matched = sum(1 for src in image_urls if src in captured)
+        print_flush(
+            f"[*] Captured {len(self.requests)} image requests "
+            f"({matched}/{len(image_urls)} chapter images seen on the wire), "
+            f"served {self.placeholder_bytes} bytes of placeholders instead of the real files"
+        )
+        chapter = set(image_urls)
+        if matched != len(chapter):
+            print_flush("[!] Network capture missed some chapter images, keeping the DOM order", level="warn")
+            return image_urls
+        return [url for url in self.urls() if url in chapter]
+
+# env toggle used by the cli entry points
+def capture_enabled():
+    return os.getenv("CAPTURE_IMAGES", "false").lower() in ("true", "1", "yes")
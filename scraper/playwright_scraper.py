@@ -1,14 +1,27 @@
 # scraper/playwright_scraper.py
 
+import time
 import random
-from urllib.parse import urlparse
-from playwright.sync_api import sync_playwright
 import os
 import sys
-sys.dont_write_bytecode = True
 
-# import the scaper modules. Prob more in the future
-from scraper.domains import fallback, asurascans
+# print_flush lives in playwright_utils so the domain modules don't have to import back from here
+from scraper.playwright_utils import print_flush, simulate_human_behavior, iter_adaptive_scroll, extract_images
+from scraper.events import emit, is_ndjson
+
+# site registry, domain modules only get imported when a url needs them
+from scraper.domains import get_scraper, get_domain, get_site, load_scraper, site_for_module, scrape_kwargs, FALLBACK_SITE
+from scraper.request_filter import install_request_filter
+from scraper.network_capture import ImageCapture, capture_enabled
+from scraper.static_fetch import scrape_static, static_first_enabled
+from scraper.scrape_cache import open_cache, force_refresh
+from scraper.metrics import track_scrape, span, current_metrics
+from scraper.browser_profile import profiles_enabled, open_profile_context, first_page
+from scraper.host_scheduler import get_scheduler
+from scraper import nav_policy
+from scraper.har_replay import har_mode, har_context
+from scraper.prefetch import is_preloaded
+from scraper.recurring_assets import drop_recurring, recurring_for, record_chapter, normalize_asset
 
 # list of fake user agents to rotate for stealth purposes
 USER_AGENTS = [
@@ -36,73 +49,280 @@ VIEWPORTS = [
     (1536, 864),    # mid-range laptop
 ]
 
-# domain checker, yeah will be more later
-SITE_MAP = {
-    "asuracomic.net": asurascans,
-    "asurascans.com": asurascans,
-}
-
-# flush output to terminal so can see logs in real time.
-def print_flush(*args, **kwargs):
-    print(*args, **kwargs) #args for positional arguments passed, kwargs is cor keyword agruments
-    sys.stdout.flush() # immediately write output to website terminal
-
-def scrape_images(url, use_lazy=False):
+# new browser context with a randomized fingerprint
+def new_context(browser):
 
-    # break down url into components, get domain, then pick specific scraper
-    parsed = urlparse(url)
-    domain = parsed.netloc.replace("www.", "")
-    scraper = SITE_MAP.get(domain, fallback)
+    # randomize fingerprint
+    user_agent = random.choice(USER_AGENTS)
+    viewport_width, viewport_height = random.choice(VIEWPORTS)
 
-    # launch playwright
-    with sync_playwright() as p:
+    # setup the context for browser
+    context = browser.new_context(
+        user_agent=user_agent,
+        viewport={"width": viewport_width, "height": viewport_height}
+    )
+    print_flush(f"[*] Using user agent: {user_agent}")
+    print_flush(f"[*] Using viewport size: {viewport_width}x{viewport_height}")
+    return context
 
-        # headless mode
-        browser = p.chromium.launch(headless=True)
+# scrape a chapter on an already open tab, so warm browsers (daemon) can reuse this.
+# pass an ImageCapture to grab image urls off the network and skip downloading the actual files.
+# scraper forces a domain module instead of going by the url (benchmarks on localhost use this)
+def scrape_page(page, url, use_lazy=False, capture=None, scraper=None):
 
-        # randomize fingerprint
-        user_agent = random.choice(USER_AGENTS)
-        viewport_width, viewport_height = random.choice(VIEWPORTS)
+    domain = get_domain(url)
+    site = get_site(url) if scraper is None else site_for_module(scraper)
+    scraper = scraper or load_scraper(site)
 
-        # setup the context for browser
-        context = browser.new_context(
-            user_agent=user_agent,
-            viewport={"width": viewport_width, "height": viewport_height}
-        )
-        print_flush(f"[*] Using user agent: {user_agent}")
-        print_flush(f"[*] Using viewport size: {viewport_width}x{viewport_height}")
+    if capture is not None:
+        capture.install(page)
 
-        # create a new tab
-        page = context.new_page()
+    # requests / bytes for this scrape's timing summary
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.watch_page(page)
 
+    # daemon / queue workers scraping the same site share its slots. only the navigation holds one:
+    # the scrape itself probes images through the scheduler too, often on this very host, and a
+    # scrape sitting on a slot while waiting for its own probes is how every slot ends up stuck.
+    # timeouts and retries come from the site's latency history, all of it within one deadline
+    scheduler = get_scheduler()
+    with nav_policy.scrape_deadline():
         print_flush(f"\n[*] Navigating to URL: {url}")
 
-        # load page, wait for DOM to finish
-        page.goto(url, wait_until="domcontentloaded", timeout=15000)
+        # load page, wait for DOM to finish. a prefetched tab (prefetch.py) is already there.
+        # the generic scraper's request filter has to be on before the first request goes out
+        response = None
+        if not is_preloaded(page, url):
+            if site is FALLBACK_SITE:
+                install_request_filter(page, url)
+            with scheduler.slot(url), span("goto"):
+                response = nav_policy.goto(page, url)
+        if response is not None:
+            scheduler.report(url, response.status, response.headers.get("retry-after"))
 
         # page.screenshot(path="manhuaus_debug.png", full_page=True)  # this provides a picture for debugging
 
         print_flush(f"[*] Scraping domain: {domain}")
 
         # call specific logic for scraping
-        if scraper is fallback:
-            image_urls = scraper.scrape(page, url, use_lazy=use_lazy)
+        image_urls = scraper.scrape(page, url, **scrape_kwargs(site, use_lazy))
+
+    # banners / credit pages this site has shown in other chapters (EXCLUDE_RECURRING)
+    image_urls = drop_recurring(url, image_urls)
+
+    if capture is not None:
+        image_urls = capture.report(image_urls)
+    return image_urls
+
+# same steps as scrape_page, but every chapter image comes out as (page_index, url) as soon as the
+# scroll finds it instead of in one list at the end, so probing / downloading can start while the
+# page is still scrolling. pages are numbered in the order they turn up, top to bottom.
+# site modules decide per image with keep_image(), no size probing here
+def iter_page_images(page, url, use_lazy=True):
+    site = get_site(url)
+    scraper = load_scraper(site)
+    scroll = use_lazy if site["lazy_scroll"] is None else site["lazy_scroll"]
+
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.watch_page(page)
+    request_stats = install_request_filter(page, url)
+
+    # slot only for the navigation, same as scrape_page
+    scheduler = get_scheduler()
+    with nav_policy.scrape_deadline():
+        print_flush(f"\n[*] Navigating to URL: {url}")
+        with scheduler.slot(url), span("goto"):
+            response = nav_policy.goto(page, url)
+        if response is not None:
+            scheduler.report(url, response.status, response.headers.get("retry-after"))
+
+        with span("simulate"):
+            simulate_human_behavior(page)
+
+        if scroll:
+            records = iter_adaptive_scroll(page)
+        else:
+            # non-scrolling sites have all their pages in the DOM once the first one shows up
+            if site is not FALLBACK_SITE:
+                with span("wait_selector"):
+                    nav_policy.wait_for_selector(page, url, site["image_selector"])
+            with span("extract"):
+                records = extract_images(page, site["image_selector"])
+
+        # recurring banners get skipped on the fly, the full list goes into the index at the end
+        recurring = recurring_for(url)
+        seen = set()
+        found = []
+        for record in records:
+            src = scraper.keep_image(record, url)
+            if not src or src in seen:
+                continue
+            seen.add(src)
+            if normalize_asset(src) in recurring:
+                continue
+            found.append(src)
+            yield len(found) - 1, src
+
+    record_chapter(url, list(seen))
+    request_stats.summary()
+
+# iter_page_images with its own browser, for callers that just have a url.
+#   for index, src in iter_chapter_images(url): ...
+# breaking out of the loop early closes the browser
+def iter_chapter_images(url, use_lazy=True):
+    from playwright.sync_api import sync_playwright
+
+    with track_scrape(url) as metrics, sync_playwright() as p:
+        if profiles_enabled():
+            with open_profile_context(p, url, USER_AGENTS, VIEWPORTS) as context:
+                for item in iter_page_images(first_page(context), url, use_lazy):
+                    metrics.count("images_found")
+                    yield item
+            return
+
+        with span("launch"):
+            browser = p.chromium.launch(headless=True)
+            page = new_context(browser).new_page()
+        try:
+            for item in iter_page_images(page, url, use_lazy):
+                metrics.count("images_found")
+                yield item
+        finally:
+            with span("close"):
+                browser.close()
+
+# STREAM_IMAGES=true on the cli, same output as scrape_images but each image is printed / emitted
+# the moment it's found
+def stream_images(url, use_lazy=True):
+    image_urls = []
+    for index, src in iter_chapter_images(url, use_lazy):
+        image_urls.append(src)
+        if is_ndjson():
+            emit("image", index=index + 1, url=src)
         else:
-            image_urls = scraper.scrape(page, url)
+            print_flush(f"Grabbed {index + 1} pictures: {src}")
 
-        # log each image
-        for i, src in enumerate(image_urls, 1):
-            if i == 1:
-                print_flush(f"Grabbed {i} picture: {src}")
-            else:
-                print_flush(f"Grabbed {i} pictures: {src}")
+    if is_ndjson():
+        emit("result", url=url, ok=True, tier="stream", images=image_urls)
+    print_flush("Worm has wormed goodbye.")
+    return image_urls
+
+def scrape_images(url, use_lazy=False):
 
-        print_flush("Worm has wormed goodbye.")
-        browser.close()
+    started = time.perf_counter()
+    image_urls = None
+    tier = "playwright"
+    variant = "lazy" if use_lazy else "static-dom"
+    # recording / replaying a session (HAR_MODE) always runs the real browser scrape
+    har = har_mode()
+
+    # every phase below gets timed, summary prints when the with block is done (see metrics.py)
+    with track_scrape(url) as metrics:
+
+        # already scraped this chapter? then no browser at all
+        cache = open_cache() if har is None else None
+        if cache is not None and not force_refresh():
+            with span("cache"):
+                image_urls = cache.get("images", url, variant)
+            if image_urls is not None:
+                tier = "cache"
+                print_flush(f"[*] Cache hit for {url}")
+                # the cached list may be from before EXCLUDE_RECURRING was on or before the banner
+                # had shown up in enough chapters, check it against the index as it is now
+                image_urls = drop_recurring(url, image_urls)
+
+        # cheap tier first if asked, only launch a browser when the plain html isn't good enough
+        if image_urls is None and har is None and static_first_enabled():
+            _, scraper = get_scraper(url)
+            with span("static"):
+                image_urls = scrape_static(url, scraper)
+            if image_urls is not None:
+                tier = "static"
+
+        if image_urls is None:
+
+            # only pulled in when we really need a browser, cache and static hits start faster without it
+            from playwright.sync_api import sync_playwright
+
+            # launch playwright
+            with sync_playwright() as p:
+
+                # record to / replay from the chapter's archive (har_replay.py)
+                if har is not None:
+                    tier = f"har-{har}"
+                    with span("launch"):
+                        browser = p.chromium.launch(headless=True)
+                    with har_context(browser, url, USER_AGENTS, VIEWPORTS, use_lazy=use_lazy) as context:
+                        image_urls = scrape_page(context.new_page(), url, use_lazy=use_lazy)
+                    with span("close"):
+                        browser.close()
+
+                # persistent per-site profile, reuses the http cache from earlier chapters of the same site
+                elif profiles_enabled():
+                    if capture_enabled():
+                        print_flush("[!] Network capture needs routes, which turn off the profile's cache. Skipping capture.", level="warn")
+                    with open_profile_context(p, url, USER_AGENTS, VIEWPORTS) as context:
+                        image_urls = scrape_page(first_page(context), url, use_lazy=use_lazy)
+
+                else:
+                    # headless mode
+                    with span("launch"):
+                        browser = p.chromium.launch(headless=True)
+                        context = new_context(browser)
+
+                        # create a new tab
+                        page = context.new_page()
+
+                    capture = ImageCapture() if capture_enabled() else None
+                    image_urls = scrape_page(page, url, use_lazy=use_lazy, capture=capture)
+                    with span("close"):
+                        browser.close()
+
+        # only keep results worth keeping, an empty list is usually a failed scrape
+        if cache is not None:
+            if tier != "cache" and image_urls:
+                cache.put("images", url, image_urls, variant)
+            stats = cache.stats().get("images", {})
+            print_flush(f"[*] Scrape cache: {stats.get('hits', 0)} hits / {stats.get('misses', 0)} misses")
+            cache.close()
+
+        metrics.tier = tier
+        metrics.count("images_found", len(image_urls))
+
+    print_flush(f"[*] Served by tier: {tier}")
+
+    # log each image, ndjson consumers get typed events and one result payload instead
+    for i, src in enumerate(image_urls, 1):
+        if is_ndjson():
+            emit("image", index=i, url=src)
+        elif i == 1:
+            print_flush(f"Grabbed {i} picture: {src}")
+        else:
+            print_flush(f"Grabbed {i} pictures: {src}")
+
+    if is_ndjson():
+        emit("timing", phase="total", seconds=round(time.perf_counter() - started, 3))
+        emit("result", url=url, ok=True, tier=tier, images=image_urls)
+
+    print_flush("Worm has wormed goodbye.")
+    return image_urls
 
 # cli entry point if script is directly run
 if __name__ == "__main__":
     target_url = os.getenv("TARGET_URL") or input("Paste chapter URL: ").strip()
     use_lazy = os.getenv("USE_LAZY", "false").lower() == "true" 
-    
-    scrape_images(target_url, use_lazy)
\ No newline at end of file
+    stream = os.getenv("STREAM_IMAGES", "false").lower() == "true"
+
+    try:
+        if stream:
+            stream_images(target_url, use_lazy)
+        else:
+            scrape_images(target_url, use_lazy)
+    except Exception as e:
+        if not is_ndjson():
+            raise
+        emit("error", url=target_url, message=str(e))
+        emit("result", url=target_url, ok=False, images=[], error=str(e))
+        sys.exit(1)
\ No newline at end of file
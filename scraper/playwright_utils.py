@@ -2,11 +2,77 @@
 
 import time
 import random
-from playwright.sync_api import Page
+import asyncio
+from typing import TYPE_CHECKING
+
+# print_flush lives in events now (text or ndjson output), re-exported here for the domain modules
+from scraper.events import print_flush
+from scraper.metrics import count
+from scraper.har_replay import replaying
+
+# only for the type hints, importing playwright costs startup time every process pays
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
+
+# turns one <img> into a plain record. shared by the one-shot extraction and the adaptive scroll
+DESCRIBE_IMAGE_JS = """
+(img, index) => {
+    const rect = img.getBoundingClientRect();
+    return {
+        "index": index,
+        "src": img.getAttribute("src"),
+        "data-src": img.getAttribute("data-src"),
+        "data-lazy-src": img.getAttribute("data-lazy-src"),
+        "data-original": img.getAttribute("data-original"),
+        "srcset": img.getAttribute("srcset"),
+        "natural_width": img.naturalWidth || 0,
+        "natural_height": img.naturalHeight || 0,
+        "width": rect.width,
+        "height": rect.height,
+    };
+}
+"""
+
+# pull everything we need off every matching <img> in one evaluate instead of a bunch of
+# get_attribute/bounding_box round trips per element. index is the DOM order
+EXTRACT_IMAGES_JS = """
+(selector) => {
+    const describe = """ + DESCRIBE_IMAGE_JS + """;
+    return Array.from(document.querySelectorAll(selector)).map(describe);
+}
+"""
+
+def extract_images(page, selector="img"):
+    return page.evaluate(EXTRACT_IMAGES_JS, selector)
+
+async def extract_images_async(page, selector="img"):
+    return await page.evaluate(EXTRACT_IMAGES_JS, selector)
+
+# the usual attribute priority for picking a record's real image url
+def pick_src(record):
+    return (
+        record.get("src") or
+        record.get("data-src") or
+        record.get("data-lazy-src") or
+        record.get("data-original")
+    )
+
+# the "human" pauses. a replayed session (har_replay.py) has nobody to fool, those skip them
+def human_pause(seconds):
+    if replaying():
+        return
+    count("human_sleep_seconds", seconds)
+    time.sleep(seconds)
+
+async def human_pause_async(seconds):
+    if replaying():
+        return
+    count("human_sleep_seconds", seconds)
+    await asyncio.sleep(seconds)
 
 # mouse and scroll behavior to mimic human interaction
 def simulate_human_behavior(page):
-    print("[*] Simulating human-like behavior...")
+    print_flush("[*] Simulating human-like behavior...")
 
     # random mouse movement and hover
     elements = page.query_selector_all("a, button, div, span") # common interactive tags
@@ -23,22 +89,22 @@ def simulate_human_behavior(page):
                 x = box["x"] + box["width"] / 2
                 y = box["y"] + box["height"] / 2
                 page.mouse.move(x, y) # move mouse to spot
-                print(f"[*] Hovered over element at ({x:.0f}, {y:.0f})")
-                time.sleep(random.uniform(0.3, 1.0)) # quick pause
+                print_flush(f"[*] Hovered over element at ({x:.0f}, {y:.0f})", level="debug")
+                human_pause(random.uniform(0.3, 1.0)) # quick pause
 
     # smarter scrolling
     scroll_times = random.randint(1, 3) # randomly scroll 1-3 times
     for _ in range(scroll_times):
         scroll_px = random.randint(10, 20) # scroll by variable amount
         page.evaluate(f"window.scrollBy(0, {scroll_px})") # actual scroll action
-        print(f"[*] Scrolled {scroll_px}px")
-        time.sleep(random.uniform(0.5, 1.5)) # quick pause
+        print_flush(f"[*] Scrolled {scroll_px}px", level="debug")
+        human_pause(random.uniform(0.5, 1.5)) # quick pause
 
     # close any popups
     page.on("popup", lambda popup: popup.close())
 
-def slow_scroll_to_bottom_with_images(page: Page, scroll_amount=800, wait_ms=500, max_stable_checks=5):
-    print("[*] Slowly scrolling to bottom with live image capture...")
+def slow_scroll_to_bottom_with_images(page: "Page", scroll_amount=800, wait_ms=500, max_stable_checks=5):
+    print_flush("[*] Slowly scrolling to bottom with live image capture...")
 
     previous_scroll_y = -1
     previous_height = -1
@@ -60,7 +126,7 @@ def slow_scroll_to_bottom_with_images(page: Page, scroll_amount=800, wait_ms=500
             stable_count = 0
 
         if stable_count >= max_stable_checks:
-            print("[*] Detected bottom of the page.")
+            print_flush("[*] Detected bottom of the page.")
             break
 
         # scroll using mouse wheel for lazy-load triggers because mousewheel is detected for some reason
@@ -85,9 +151,306 @@ def slow_scroll_to_bottom_with_images(page: Page, scroll_amount=800, wait_ms=500
         # print any new images in real-time
         new_images = current_images - seen_images
         for img in new_images:
-            print(f"[*] New image detected: {img}")
+            print_flush(f"[*] New image detected: {img}", level="debug")
 
         seen_images.update(new_images)
 
-    print(f"[*] Scroll complete after {step_count} steps. Total images collected: {len(seen_images)}")
-    return list(seen_images)
\ No newline at end of file
+    count("scroll_steps", step_count)
+    print_flush(f"[*] Scroll complete after {step_count} steps. Total images collected: {len(seen_images)}")
+    return list(seen_images)
+
+# in-page watcher for the adaptive scroll. a MutationObserver notes every <img> that gets added or
+# has its src swapped, and load/error listeners keep a count of images that are still downloading
+ADAPTIVE_SCROLL_SETUP_JS = """
+() => {
+    if (window.__wormScroll) return;
+
+    const state = { seen: new Set(), fresh: new Set(), pending: 0, lastChange: performance.now() };
+    const loading = new WeakSet();
+
+    const track = (img) => {
+        state.fresh.add(img);
+        if (img.complete || loading.has(img)) return;
+
+        loading.add(img);
+        state.pending++;
+        const done = () => {
+            img.removeEventListener("load", done);
+            img.removeEventListener("error", done);
+            loading.delete(img);
+            state.pending = Math.max(0, state.pending - 1);
+            state.lastChange = performance.now();
+        };
+        img.addEventListener("load", done);
+        img.addEventListener("error", done);
+    };
+
+    new MutationObserver((mutations) => {
+        state.lastChange = performance.now();
+        for (const m of mutations) {
+            if (m.type === "attributes") {
+                if (m.target.tagName === "IMG") track(m.target);
+                continue;
+            }
+            for (const node of m.addedNodes) {
+                if (node.nodeType !== 1) continue;
+                if (node.tagName === "IMG") track(node);
+                else node.querySelectorAll("img").forEach(track);
+            }
+        }
+    }).observe(document.documentElement, {
+        childList: true,
+        subtree: true,
+        attributes: true,
+        attributeFilter: ["src", "srcset", "data-src", "data-lazy-src", "data-original"],
+    });
+
+    Array.from(document.images).forEach(track);
+    window.__wormScroll = state;
+}
+"""
+
+# one scroll step worth of waiting, done inside the page: wait until nothing is loading and the DOM
+# has been quiet for a bit (or we run out of wait), then hand back only the images we haven't sent yet
+ADAPTIVE_SCROLL_STEP_JS = """
+async ({ minWaitMs, quietMs, maxWaitMs }) => {
+    const describe = """ + DESCRIBE_IMAGE_JS + """;
+    const state = window.__wormScroll;
+    const started = performance.now();
+
+    await new Promise(r => setTimeout(r, minWaitMs));
+    while (performance.now() - started < maxWaitMs) {
+        if (state.pending === 0 && performance.now() - state.lastChange >= quietMs) break;
+        await new Promise(r => setTimeout(r, 50));
+    }
+
+    const images = [];
+    for (const img of state.fresh) {
+        const url = img.getAttribute("src") || img.getAttribute("data-src") ||
+                    img.getAttribute("data-lazy-src") || img.getAttribute("data-original");
+        if (!url || state.seen.has(url)) continue;
+        state.seen.add(url);
+        images.push(describe(img, Array.prototype.indexOf.call(document.images, img)));
+    }
+    state.fresh.clear();
+
+    const scroller = document.scrollingElement || document.documentElement;
+    return {
+        scrollY: window.scrollY,
+        scrollHeight: scroller.scrollHeight,
+        viewportHeight: window.innerHeight,
+        pending: state.pending,
+        waited: performance.now() - started,
+        images: images,
+    };
+}
+"""
+
+# decides how far to scroll next, how long to wait and when to stop, based on what the last step saw.
+# kept free of playwright so the sync and async loops share it
+class ScrollPlanner:
+    def __init__(self, viewport_height=800, max_seconds=60, max_steps=300, settle_checks=2, stuck_seconds=2.5):
+        self.min_step = max(200, viewport_height // 2)
+        self.max_step = viewport_height * 4
+        self.step_px = viewport_height
+        self.wait_ms = 500
+        self.avg_wait = 250.0
+        self.max_steps = max_steps
+        self.settle_checks = settle_checks
+        self.deadline = time.monotonic() + max_seconds
+        self.steps = 0
+        self.stable = 0
+        self.last_height = -1
+        # pages that scroll an inner container never move the window, so they never reach the
+        # bottom either. same give-up as the old slow scroll: nothing moved for stuck_seconds
+        self.stuck_seconds = stuck_seconds
+        self.stuck = 0
+        self.stuck_since = None
+        self.last_scroll_y = None
+        self.stop_reason = None
+
+    def step_args(self):
+        return {"minWaitMs": 100, "quietMs": 150, "maxWaitMs": int(self.wait_ms)}
+
+    # returns False once we should stop scrolling
+    def update(self, state):
+        self.steps += 1
+        grew = state["scrollHeight"] > self.last_height
+        self.last_height = state["scrollHeight"]
+        at_bottom = state["scrollY"] + state["viewportHeight"] >= state["scrollHeight"] - 2
+
+        self.avg_wait = 0.7 * self.avg_wait + 0.3 * state["waited"]
+        if state["pending"]:
+            # images still coming in after the whole wait, slow down and give them longer
+            self.step_px = max(self.min_step, self.step_px // 2)
+            self.wait_ms = min(3000, self.wait_ms * 1.5)
+        else:
+            self.wait_ms = min(3000, max(200, self.avg_wait * 2))
+            if not state["images"] and not grew:
+                # nothing happened, cover more ground next time
+                self.step_px = min(self.max_step, int(self.step_px * 1.5))
+
+        quiet = not grew and not state["pending"] and not state["images"]
+        if at_bottom and quiet:
+            self.stable += 1
+        else:
+            self.stable = 0
+
+        if quiet and state["scrollY"] == self.last_scroll_y:
+            self.stuck += 1
+            self.stuck_since = self.stuck_since or time.monotonic()
+        else:
+            self.stuck = 0
+            self.stuck_since = None
+        self.last_scroll_y = state["scrollY"]
+
+        if self.stable >= self.settle_checks:
+            self.stop_reason = "bottom"
+        elif self.stuck >= self.settle_checks and time.monotonic() - self.stuck_since >= self.stuck_seconds:
+            self.stop_reason = "not scrolling"
+        elif self.steps >= self.max_steps:
+            self.stop_reason = "step budget"
+        elif time.monotonic() >= self.deadline:
+            self.stop_reason = "time budget"
+        return self.stop_reason is None
+
+# the adaptive scroll as a generator, every image record comes out right after the step that found it
+# so the caller can start on it while the page keeps scrolling. stopping early stops the scroll
+def iter_adaptive_scroll(page: "Page", max_seconds=60, max_steps=300, settle_checks=2):
+    print_flush("[*] Adaptive scrolling to bottom (watching image loads)...")
+
+    page.evaluate("document.body.style.zoom = '0.25'")
+    page.evaluate(ADAPTIVE_SCROLL_SETUP_JS)
+
+    viewport = page.viewport_size or {"height": 800}
+    planner = ScrollPlanner(viewport["height"], max_seconds, max_steps, settle_checks)
+    found = 0
+
+    try:
+        while True:
+            page.mouse.wheel(0, planner.step_px)
+            state = page.evaluate(ADAPTIVE_SCROLL_STEP_JS, planner.step_args())
+
+            for record in state["images"]:
+                print_flush(f"[*] New image detected: {pick_src(record)}", level="debug")
+                found += 1
+                yield record
+
+            if not planner.update(state):
+                break
+    finally:
+        count("scroll_steps", planner.steps)
+        print_flush(f"[*] Scroll stopped ({planner.stop_reason or 'caller'}) after {planner.steps} steps. Total images collected: {found}")
+
+def adaptive_scroll_to_bottom(page: "Page", max_seconds=60, max_steps=300, settle_checks=2):
+    return list(iter_adaptive_scroll(page, max_seconds, max_steps, settle_checks))
+
+# async versions of the helpers above, same behavior just for playwright.async_api pages
+
+async def simulate_human_behavior_async(page):
+    print_flush("[*] Simulating human-like behavior...")
+
+    elements = await page.query_selector_all("a, button, div, span")
+    safe_elements = []
+    for el in elements:
+        if await el.is_visible() and await el.bounding_box():
+            safe_elements.append(el)
+
+    if safe_elements:
+        hover_count = random.randint(1, min(3, len(safe_elements)))
+        for _ in range(hover_count):
+            el = random.choice(safe_elements)
+            box = await el.bounding_box()
+            if box:
+                x = box["x"] + box["width"] / 2
+                y = box["y"] + box["height"] / 2
+                await page.mouse.move(x, y)
+                print_flush(f"[*] Hovered over element at ({x:.0f}, {y:.0f})", level="debug")
+                await human_pause_async(random.uniform(0.3, 1.0)) # don't block the other pages while we wait
+
+    scroll_times = random.randint(1, 3)
+    for _ in range(scroll_times):
+        scroll_px = random.randint(10, 20)
+        await page.evaluate(f"window.scrollBy(0, {scroll_px})")
+        print_flush(f"[*] Scrolled {scroll_px}px", level="debug")
+        await human_pause_async(random.uniform(0.5, 1.5))
+
+    page.on("popup", lambda popup: asyncio.ensure_future(popup.close()))
+
+async def slow_scroll_to_bottom_with_images_async(page, scroll_amount=800, wait_ms=500, max_stable_checks=5):
+    print_flush("[*] Slowly scrolling to bottom with live image capture...")
+
+    previous_scroll_y = -1
+    previous_height = -1
+    stable_count = 0
+    step_count = 0
+    seen_images = set()
+
+    await page.evaluate("document.body.style.zoom = '0.25'")
+
+    while True:
+        scroll_y = await page.evaluate("() => window.scrollY")
+        scroll_height = await page.evaluate("() => document.body.scrollHeight")
+
+        if scroll_y == previous_scroll_y and scroll_height == previous_height:
+            stable_count += 1
+        else:
+            stable_count = 0
+
+        if stable_count >= max_stable_checks:
+            print_flush("[*] Detected bottom of the page.")
+            break
+
+        await page.mouse.wheel(0, scroll_amount)
+        await page.wait_for_timeout(wait_ms)
+
+        previous_scroll_y = scroll_y
+        previous_height = scroll_height
+        step_count += 1
+
+        current_images = set(
+            await page.evaluate("""
+                () => Array.from(document.images)
+                          .map(img => img.src)
+                          .filter(src => src && src.startsWith('http'))
+            """)
+        )
+
+        new_images = current_images - seen_images
+        for img in new_images:
+            print_flush(f"[*] New image detected: {img}", level="debug")
+
+        seen_images.update(new_images)
+
+    count("scroll_steps", step_count)
+    print_flush(f"[*] Scroll complete after {step_count} steps. Total images collected: {len(seen_images)}")
+    return list(seen_images)
+
+async def iter_adaptive_scroll_async(page, max_seconds=60, max_steps=300, settle_checks=2):
+    print_flush("[*] Adaptive scrolling to bottom (watching image loads)...")
+
+    await page.evaluate("document.body.style.zoom = '0.25'")
+    await page.evaluate(ADAPTIVE_SCROLL_SETUP_JS)
+
+    viewport = page.viewport_size or {"height": 800}
+    planner = ScrollPlanner(viewport["height"], max_seconds, max_steps, settle_checks)
+    found = 0
+
+    try:
+        while True:
+            await page.mouse.wheel(0, planner.step_px)
+            state = await page.evaluate(ADAPTIVE_SCROLL_STEP_JS, planner.step_args())
+
+            for record in state["images"]:
+                print_flush(f"[*] New image detected: {pick_src(record)}", level="debug")
+                found += 1
+                yield record
+
+            if not planner.update(state):
+                break
+    finally:
+        count("scroll_steps", planner.steps)
+        print_flush(f"[*] Scroll stopped ({planner.stop_reason or 'caller'}) after {planner.steps} steps. Total images collected: {found}")
+
+async def adaptive_scroll_to_bottom_async(page, max_seconds=60, max_steps=300, settle_checks=2):
+    return [record async for record in iter_adaptive_scroll_async(page, max_seconds, max_steps, settle_checks)]
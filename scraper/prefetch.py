@@ -0,0 +1,129 @@
+# scraper/prefetch.py
+
+import time
+import weakref
+
+from scraper.events import print_flush
+from scraper.metrics import ScrapeMetrics, count, current_metrics
+from scraper.domains import get_site, get_domain, FALLBACK_SITE
+from scraper.request_filter import install_request_filter
+from scraper.host_scheduler import get_scheduler
+from scraper import nav_policy
+
+# for sequential batch scrapes (crawl_series): while one chapter is being scrolled and extracted, the
+# next `depth` chapters are already loading in their own tabs of the same context, so their
+# navigation time hides behind the current chapter's work. at most `depth` extra tabs exist at once.
+# navigation is started with location.href from evaluate, which returns right away instead of
+# blocking like goto. scrape_page sees the tab is already there and skips its own goto.
+# a prefetch navigation goes through the same gates as a goto: it holds one of the host's scheduler
+# slots until the document is in, its status is reported to the scheduler, its load time goes into
+# nav_policy's history, and its responses count towards the chapter's metrics once it's taken.
+# prefetches never hold all of a host's slots, the current chapter still needs one for its probes
+
+# tab -> url it was sent to
+_preloaded = weakref.WeakKeyDictionary()
+
+def mark_preloaded(page, url):
+    _preloaded[page] = url
+
+def is_preloaded(page, url):
+    return _preloaded.get(page) == url
+
+class Prefetcher:
+    def __init__(self, context, depth=1):
+        self.context = context
+        self.depth = max(0, depth)
+        self.pending = {} # url -> {"page", "release", "metrics", "started", "loaded", "response"}
+
+    # start loading the next few urls, skips ones that are already going. never waits: a host without
+    # a free slot or token in the scheduler just gets its prefetch on a later call
+    def fill(self, upcoming):
+        scheduler = get_scheduler()
+        for url in upcoming:
+            if len(self.pending) >= self.depth:
+                break
+            if url in self.pending:
+                continue
+            state = scheduler.state_for(url)
+            if sum(1 for other in self.pending if scheduler.state_for(other) is state) >= state.concurrency - 1:
+                break
+            release = scheduler.try_slot(url)
+            if release is None:
+                break
+
+            # same filter scrape_page would put on before navigating, metrics listen from the first request
+            page = self.context.new_page()
+            if get_site(url) is FALLBACK_SITE:
+                install_request_filter(page, url)
+            entry = {"page": page, "release": release, "metrics": ScrapeMetrics(url), "started": time.monotonic(), "loaded": None, "response": None}
+            entry["metrics"].watch_page(page)
+            page.on("response", lambda response, entry=entry: self.on_response(entry, response))
+            page.once("domcontentloaded", lambda _, entry=entry: self.on_loaded(entry))
+            try:
+                page.evaluate("url => { window.location.href = url; }", url)
+            except Exception as e:
+                print_flush(f"[!] Couldn't start prefetch of {url}: {e}", level="debug")
+                release()
+                page.close()
+                continue
+            self.pending[url] = entry
+            print_flush(f"[*] Prefetching {url} in the background", level="debug")
+
+    # the document's own response, what goto would have returned
+    def on_response(self, entry, response):
+        page = entry["page"]
+        if entry["response"] is None and response.request.is_navigation_request() and response.frame == page.main_frame:
+            entry["response"] = response
+
+    # document is in, the slot can go back without waiting for the chapter to be taken
+    def on_loaded(self, entry):
+        if entry["loaded"] is None:
+            entry["loaded"] = time.monotonic()
+        entry["release"]()
+
+    # the prefetched tab for url once it has loaded, None if it wasn't prefetched or the load failed
+    # (the caller then does a normal scrape on a fresh tab)
+    def take(self, url):
+        entry = self.pending.pop(url, None)
+        if entry is None:
+            return None
+        page = entry["page"]
+        domain = get_domain(url)
+        timeout = nav_policy.timeout_ms(domain)
+        try:
+            page.wait_for_url(lambda current: current != "about:blank", wait_until="domcontentloaded", timeout=timeout)
+        except Exception as e:
+            print_flush(f"[!] Prefetch of {url} didn't load ({e}), loading it normally", level="warn")
+            count("prefetch_misses")
+            nav_policy.record_failure(domain, "goto", e, timeout)
+            self.finish(url, entry)
+            page.close()
+            return None
+
+        self.on_loaded(entry)
+        # only as long as it took to load, not how long the tab then sat waiting to be taken
+        nav_policy.record(domain, "goto", entry["loaded"] - entry["started"])
+        self.finish(url, entry)
+        count("prefetch_hits")
+        mark_preloaded(page, url)
+        return page
+
+    # hand back the slot, report the status and move the tab's counters over to the chapter's scrape
+    def finish(self, url, entry):
+        entry["release"]()
+        response = entry["response"]
+        if response is not None:
+            get_scheduler().report(url, response.status, response.headers.get("retry-after"))
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.absorb(entry["metrics"])
+            metrics.watch_page(entry["page"])
+
+    def close(self):
+        for entry in self.pending.values():
+            entry["release"]()
+            try:
+                entry["page"].close()
+            except Exception:
+                pass
+        self.pending.clear()
@@ -0,0 +1,240 @@
+# scraper/recurring_assets.py
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+from urllib.parse import urlparse, urlunparse
+
+from scraper.events import print_flush
+from scraper.scrape_cache import normalize_url, get_domain
+
+# remembers which image urls showed up in which chapters of a site. a real chapter page belongs to
+# exactly one chapter, so anything that turns up in RECURRING_MIN_CHAPTERS different chapters is a
+# recruitment banner / credits page / ad and with EXCLUDE_RECURRING=true it gets dropped from
+# scrape results, one set lookup per image.
+# urls are compared without their query string (cdn resize / signature params). RECURRING_HASHES=true
+# also fingerprints the first and last few images of a chapter by their bytes, for banners that
+# get re-uploaded under a new url every time
+
+INDEX_PATH = os.getenv("RECURRING_INDEX_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "wormscans", "recurring_assets.sqlite3"
+)
+
+MIN_CHAPTERS = int(os.getenv("RECURRING_MIN_CHAPTERS", "3"))
+# banners sit at the start or end, only those get hashed (a range request each)
+HASH_EDGE = 3
+HASH_BYTES = 16 * 1024
+# never let the index eat most of a chapter, that means something is off with the site's urls
+MAX_DROP_FRACTION = 0.5
+
+# nothing gets written unless it's used: the index is on with EXCLUDE_RECURRING, RECURRING_INDEX=true
+# builds it up ahead of time (to look at with `list`) without dropping anything yet
+def index_enabled():
+    default = "true" if exclude_enabled() else "false"
+    return os.getenv("RECURRING_INDEX", default).lower() in ("true", "1", "yes")
+
+def exclude_enabled():
+    return os.getenv("EXCLUDE_RECURRING", "false").lower() in ("true", "1", "yes")
+
+def hashes_enabled():
+    return os.getenv("RECURRING_HASHES", "false").lower() in ("true", "1", "yes")
+
+# same image, same key: lowercase host, no www, no query, no fragment
+def normalize_asset(url):
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower().replace("www.", "")
+    return urlunparse((parsed.scheme.lower() or "https", host, parsed.path, "", "", ""))
+
+class AssetIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS sightings (
+                domain TEXT NOT NULL,
+                asset TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (domain, asset, chapter)
+            );
+            CREATE TABLE IF NOT EXISTS assets (
+                domain TEXT NOT NULL,
+                asset TEXT NOT NULL,
+                example_url TEXT NOT NULL,
+                chapters INTEGER NOT NULL DEFAULT 0,
+                keep INTEGER NOT NULL DEFAULT 0,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (domain, asset)
+            );
+            CREATE INDEX IF NOT EXISTS assets_chapters ON assets (domain, chapters);
+        """)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    # note every asset of one chapter. scraping the same chapter again doesn't count twice.
+    # keys maps image url -> extra asset key (content hash), when there is one
+    def record(self, chapter_url, image_urls, keys=None):
+        domain = get_domain(chapter_url)
+        chapter = normalize_url(chapter_url)
+        now = time.time()
+        for url in image_urls:
+            assets = [normalize_asset(url)]
+            if keys and keys.get(url):
+                assets.append(keys[url])
+            for asset in assets:
+                cursor = self.db.execute(
+                    "INSERT OR IGNORE INTO sightings (domain, asset, chapter, seen_at) VALUES (?, ?, ?, ?)",
+                    (domain, asset, chapter, now),
+                )
+                self.db.execute(
+                    "INSERT INTO assets (domain, asset, example_url, chapters, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(domain, asset) DO UPDATE SET chapters = chapters + excluded.chapters, last_seen = excluded.last_seen",
+                    (domain, asset, url, cursor.rowcount, now, now),
+                )
+        self.db.commit()
+
+    # every recurring asset key of a site, load once per scrape and check images against the set
+    def recurring(self, domain, min_chapters=MIN_CHAPTERS):
+        rows = self.db.execute(
+            "SELECT asset FROM assets WHERE domain = ? AND chapters >= ? AND keep = 0",
+            (domain, min_chapters),
+        )
+        return {row[0] for row in rows}
+
+    def top(self, domain=None, limit=50):
+        query = "SELECT domain, example_url, chapters, keep FROM assets"
+        params = []
+        if domain:
+            query += " WHERE domain = ?"
+            params.append(domain)
+        query += " ORDER BY chapters DESC LIMIT ?"
+        params.append(limit)
+        return [
+            {"domain": d, "url": url, "chapters": chapters, "keep": bool(keep)}
+            for d, url, chapters, keep in self.db.execute(query, params)
+        ]
+
+    # a false positive (same page reused on purpose), never exclude it again
+    def keep(self, url):
+        changed = self.db.execute("UPDATE assets SET keep = 1 WHERE asset = ?", (normalize_asset(url),)).rowcount
+        self.db.commit()
+        return changed
+
+    def clear(self):
+        self.db.execute("DELETE FROM sightings")
+        self.db.execute("DELETE FROM assets")
+        self.db.commit()
+
+# the index the scrape paths use, None when it's turned off or broken
+def open_index():
+    if not index_enabled():
+        return None
+    try:
+        return AssetIndex()
+    except (sqlite3.Error, OSError) as e:
+        print_flush(f"[!] Recurring asset index unavailable, continuing without it ({e})", level="warn")
+        return None
+
+# byte fingerprints for the first / last HASH_EDGE images: sha1 of the first HASH_BYTES plus total size
+def content_keys(image_urls, referer=None):
+    from scraper.image_probe import make_session, read_head
+    import requests
+
+    edge = image_urls[:HASH_EDGE] + image_urls[-HASH_EDGE:]
+    session = make_session(4)
+    keys = {}
+    for url in dict.fromkeys(edge):
+        try:
+            data, size = read_head(session, url, HASH_BYTES, referer)
+        except requests.RequestException as e:
+            print_flush(f"[!] Couldn't fingerprint {url}: {e}", level="debug")
+            continue
+        keys[url] = f"sha1:{hashlib.sha1(data).hexdigest()}:{size or len(data)}"
+    return keys
+
+# record this chapter's images and, with EXCLUDE_RECURRING on, hand back the list without the
+# recurring ones. called on every finished scrape, anything going wrong just returns the list as is
+def drop_recurring(chapter_url, image_urls):
+    if not image_urls:
+        return image_urls
+    index = open_index()
+    if index is None:
+        return image_urls
+
+    try:
+        keys = content_keys(image_urls, referer=chapter_url) if hashes_enabled() else {}
+        index.record(chapter_url, image_urls, keys)
+        if not exclude_enabled():
+            return image_urls
+
+        recurring = index.recurring(get_domain(chapter_url))
+        kept = [
+            url for url in image_urls
+            if normalize_asset(url) not in recurring and keys.get(url) not in recurring
+        ]
+    except sqlite3.Error as e:
+        print_flush(f"[!] Recurring asset index failed ({e})", level="warn")
+        return image_urls
+    finally:
+        index.close()
+
+    dropped = len(image_urls) - len(kept)
+    if dropped and dropped > len(image_urls) * MAX_DROP_FRACTION:
+        print_flush(f"[!] {dropped} of {len(image_urls)} images look recurring, keeping them all", level="warn")
+        return image_urls
+    if dropped:
+        print_flush(f"[*] Dropped {dropped} recurring images (banners / credits seen in other chapters)")
+    return kept
+
+# the streaming api can't wait for the whole chapter: it checks each image against this set as it
+# comes in (empty with EXCLUDE_RECURRING off) and calls record_chapter once it's done
+def recurring_for(chapter_url):
+    if not exclude_enabled():
+        return set()
+    index = open_index()
+    if index is None:
+        return set()
+    try:
+        return index.recurring(get_domain(chapter_url))
+    except sqlite3.Error as e:
+        print_flush(f"[!] Recurring asset index failed ({e})", level="warn")
+        return set()
+    finally:
+        index.close()
+
+def record_chapter(chapter_url, image_urls):
+    index = open_index() if image_urls else None
+    if index is None:
+        return
+    try:
+        index.record(chapter_url, image_urls)
+    except sqlite3.Error as e:
+        print_flush(f"[!] Recurring asset index failed ({e})", level="warn")
+    finally:
+        index.close()
+
+# python -m scraper.recurring_assets list [domain] | keep <image url> | clear
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    index = AssetIndex()
+    if command == "clear":
+        index.clear()
+        print("[*] Recurring asset index cleared.")
+    elif command == "keep" and len(sys.argv) > 2:
+        print(f"[*] Marked {index.keep(sys.argv[2])} asset(s) as never recurring.")
+    else:
+        domain = sys.argv[2] if len(sys.argv) > 2 else None
+        for row in index.top(domain):
+            flag = "keep" if row["keep"] else ("recurring" if row["chapters"] >= MIN_CHAPTERS else "")
+            print(json.dumps(dict(row, status=flag)))
+    index.close()
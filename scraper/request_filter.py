@@ -0,0 +1,184 @@
+# scraper/request_filter.py
+
+import re
+import weakref
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from scraper.playwright_utils import print_flush
+from scraper.metrics import current_metrics
+from scraper.domains import get_site
+
+# declarative request rules. the whole point is that these get compiled into a few narrow route
+# patterns, so first-party requests never have to round trip through python to get a yes
+DEFAULT_RULES = {
+    # ad / tracker / popup hosts, always aborted (subdomains included)
+    "blocked_hosts": [
+        "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+        "googletagmanager.com", "adservice.google.com", "amazon-adsystem.com", "facebook.net",
+        "disqus.com", "disquscdn.com", "popads.net", "popcash.net", "propellerads.com",
+        "adsterra.com", "exoclick.com", "histats.com", "hotjar.com", "taboola.com", "outbrain.com",
+        "cloudflareinsights.com", "mgid.com", "onclickads.net", "yandex.ru",
+    ],
+    # heavy stuff we never need to find chapter images, blocked by extension on any host
+    "blocked_extensions": ["woff", "woff2", "ttf", "otf", "eot", "mp4", "webm", "mp3", "m3u8"],
+    # third-party hosts that get treated like the site itself (cdns the reader needs to work)
+    "allowed_hosts": [],
+    # these resource types are fine from anywhere
+    "always_allowed_types": ["document", "image"],
+    # extensions that count as an image even if the resource type says otherwise
+    "image_extensions": ["jpg", "jpeg", "png", "webp", "gif"],
+}
+
+def get_page_domain(url):
+    hostname = urlparse(url).hostname
+    return hostname.replace("www.", "") if hostname else ""
+
+# hosts the site registry (domains/__init__.py) vouches for on this domain's pages: every domain the
+# site lives on (asurascans.com pages load from asuracomic.net) plus its allowed_hosts. globs can't go
+# in a host pattern, those are left out
+def site_hosts(page_domain):
+    site = get_site(f"https://{page_domain}/")
+    hosts = [host for host in site["domains"] if "*" not in host and "?" not in host]
+    hosts += list(site.get("allowed_hosts") or ())
+    return [host for host in dict.fromkeys(hosts) if host != page_domain]
+
+def rules_for(page_domain):
+    rules = {key: list(value) for key, value in DEFAULT_RULES.items()}
+    if page_domain:
+        rules["allowed_hosts"] += site_hosts(page_domain)
+    return rules
+
+def host_pattern(hosts):
+    return "|".join(re.escape(h) for h in hosts)
+
+# compile the rules for one page into the three patterns we actually route on
+def compile_rules(page_domain, rules=None):
+    rules = rules or rules_for(page_domain)
+    first_party = [page_domain] + rules["allowed_hosts"] if page_domain else rules["allowed_hosts"]
+    image_exts = "|".join(rules["image_extensions"])
+
+    return {
+        # known junk hosts, aborted straight away
+        "blocked_hosts": re.compile(
+            rf"^[a-z]+://([^/?#]*\.)?({host_pattern(rules['blocked_hosts'])})(:\d+)?([/?#]|$)", re.I
+        ),
+        # fonts / media on any host
+        "blocked_extensions": "**/*.{" + ",".join(rules["blocked_extensions"]) + "}",
+        # anything that isn't first-party and doesn't look like an image. only these get a python
+        # callback, and only to check the resource type
+        "third_party": re.compile(
+            rf"^[a-z]+://(?!([^/?#]*\.)?({host_pattern(first_party) or '$^'})(:\d+)?([/?#]|$))"
+            rf"(?![^?#]*\.({image_exts})([?#]|$))", re.I
+        ),
+        "always_allowed_types": set(rules["always_allowed_types"]),
+    }
+
+# any page.route() turns chromium's http cache off, which kills the whole point of a persistent
+# profile (browser_profile.py). while routes are off, blocked hosts go in as --host-resolver-rules
+# at launch instead and the rest of the filter is skipped
+_routes_off = contextvars.ContextVar("request_filter_routes_off", default=False)
+
+@contextmanager
+def routes_disabled():
+    token = _routes_off.set(True)
+    try:
+        yield
+    finally:
+        _routes_off.reset(token)
+
+def routes_enabled():
+    return not _routes_off.get()
+
+# chromium launch flag value that makes the blocked hosts (and their subdomains) fail dns
+def host_resolver_rules(page_domain, rules=None):
+    rules = rules or rules_for(page_domain)
+    return ", ".join(f"MAP {host} ~NOTFOUND, MAP *.{host} ~NOTFOUND" for host in rules["blocked_hosts"])
+
+# counts what got blocked so we can print one summary line instead of a line per request
+class RequestStats:
+    def __init__(self):
+        self.blocked = {"blocked_host": 0, "blocked_extension": 0, "third_party": 0}
+        self.allowed_in_python = 0
+        # grabbed now, route handlers don't run inside the scrape's context
+        self.metrics = current_metrics()
+
+    def block(self, reason, url):
+        self.blocked[reason] += 1
+        if self.metrics is not None:
+            self.metrics.count("requests_blocked")
+        # only shows up with LOG_LEVEL=debug, it floods the logs otherwise
+        print_flush(f"[x] Blocking request ({reason}): {url}", level="debug")
+
+    def total_blocked(self):
+        return sum(self.blocked.values())
+
+    def summary(self):
+        parts = ", ".join(f"{reason}: {count}" for reason, count in self.blocked.items())
+        print_flush(f"[*] Blocked {self.total_blocked()} requests ({parts}), {self.allowed_in_python} third-party requests let through")
+
+# page -> its RequestStats. a page only ever gets one filter, installing again hands back the first
+# one (scrape_page puts it on before navigating, the fallback scraper asks for it again afterwards)
+_installed = weakref.WeakKeyDictionary()
+
+# allowed requests use route.fallback() so other handlers (image capture) still see them
+def install_request_filter(page, url, rules=None):
+    if page in _installed:
+        return _installed[page]
+    stats = _installed[page] = RequestStats()
+    if not routes_enabled():
+        print_flush("[*] Request filter running on host rules only (keeps the profile's http cache)")
+        return stats
+    compiled = compile_rules(get_page_domain(url), rules)
+
+    def third_party(route, request):
+        if request.resource_type in compiled["always_allowed_types"]:
+            stats.allowed_in_python += 1
+            route.fallback()
+        else:
+            stats.block("third_party", request.url)
+            route.abort()
+
+    def blocked_extension(route, request):
+        stats.block("blocked_extension", request.url)
+        route.abort()
+
+    def blocked_host(route, request):
+        stats.block("blocked_host", request.url)
+        route.abort()
+
+    # last registered runs first, so the most specific rules go in last
+    page.route(compiled["third_party"], third_party)
+    page.route(compiled["blocked_extensions"], blocked_extension)
+    page.route(compiled["blocked_hosts"], blocked_host)
+    return stats
+
+async def install_request_filter_async(page, url, rules=None):
+    if page in _installed:
+        return _installed[page]
+    stats = _installed[page] = RequestStats()
+    if not routes_enabled():
+        print_flush("[*] Request filter running on host rules only (keeps the profile's http cache)")
+        return stats
+    compiled = compile_rules(get_page_domain(url), rules)
+
+    async def third_party(route, request):
+        if request.resource_type in compiled["always_allowed_types"]:
+            stats.allowed_in_python += 1
+            await route.fallback()
+        else:
+            stats.block("third_party", request.url)
+            await route.abort()
+
+    async def blocked_extension(route, request):
+        stats.block("blocked_extension", request.url)
+        await route.abort()
+
+    async def blocked_host(route, request):
+        stats.block("blocked_host", request.url)
+        await route.abort()
+
+    await page.route(compiled["third_party"], third_party)
+    await page.route(compiled["blocked_extensions"], blocked_extension)
+    await page.route(compiled["blocked_hosts"], blocked_host)
+    return stats
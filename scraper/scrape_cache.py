@@ -0,0 +1,184 @@
+# scraper/scrape_cache.py
+
+import os
+import sys
+import json
+import time
+import sqlite3
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+from scraper.events import print_flush
+
+# local cache of finished scrapes so a double submit or a retry after a failed insert doesn't
+# open a browser again. one sqlite file, safe to share between the processes the api spawns.
+# off unless SCRAPE_CACHE=true, a plain scrape should always look at the live page
+
+CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "wormscans", "scrape_cache.sqlite3"
+)
+
+# how long results stay good, in seconds. chapters basically never change once they're up,
+# chapter lists do every time a new chapter drops
+KIND_TTLS = {
+    "images": 30 * 24 * 3600,
+    "chapter_links": 6 * 3600,
+    "probe": 90 * 24 * 3600,
+}
+
+# per-domain overrides on top of KIND_TTLS, {domain: {kind: seconds}}
+DOMAIN_TTLS = {
+    "asuracomic.net": {"chapter_links": 2 * 3600},
+}
+
+DEFAULT_TTL = 24 * 3600
+
+# once the stored results get bigger than this, least recently used entries go first
+MAX_CACHE_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# query params that never change what's on the page
+TRACKING_PARAMS = ("fbclid", "gclid", "ref")
+
+def cache_enabled():
+    return os.getenv("SCRAPE_CACHE", "false").lower() in ("true", "1", "yes")
+
+def force_refresh():
+    return os.getenv("FORCE_REFRESH", "false").lower() in ("true", "1", "yes")
+
+# same chapter, same key: lowercase host, no www, no fragment, no trailing slash, sorted query without tracking junk
+def normalize_url(url):
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower().replace("www.", "")
+    if parsed.port:
+        host = f"{host}:{parsed.port}"
+    path = parsed.path.rstrip("/") or "/"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not (k.lower().startswith("utm_") or k.lower() in TRACKING_PARAMS)
+    )
+    return urlunparse((parsed.scheme.lower() or "https", host, path, "", urlencode(query), ""))
+
+def get_domain(url):
+    return (urlparse(url).hostname or "").lower().replace("www.", "")
+
+class ScrapeCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+            CREATE TABLE IF NOT EXISTS stats (
+                kind TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def ttl_for(self, kind, domain):
+        return DOMAIN_TTLS.get(domain, {}).get(kind, KIND_TTLS.get(kind, DEFAULT_TTL))
+
+    # variant keeps results apart when options change the output (lazy scroll, prepend base...)
+    def make_key(self, kind, url, variant=""):
+        return f"{kind}:{variant}:{normalize_url(url)}"
+
+    def count(self, kind, field):
+        self.db.execute(
+            f"INSERT INTO stats (kind, {field}) VALUES (?, 1) "
+            f"ON CONFLICT(kind) DO UPDATE SET {field} = {field} + 1",
+            (kind,),
+        )
+
+    def get(self, kind, url, variant=""):
+        key = self.make_key(kind, url, variant)
+        now = time.time()
+        row = self.db.execute("SELECT value, created_at, domain FROM entries WHERE key = ?", (key,)).fetchone()
+
+        if row and now - row[1] <= self.ttl_for(kind, row[2]):
+            self.db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.count(kind, "hits")
+            self.db.commit()
+            return json.loads(row[0])
+
+        # expired entries just get dropped
+        if row:
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self.count(kind, "misses")
+        self.db.commit()
+        return None
+
+    def put(self, kind, url, value, variant=""):
+        key = self.make_key(kind, url, variant)
+        payload = json.dumps(value)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (key, kind, domain, value, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, kind, get_domain(url), payload, len(payload), now, now),
+        )
+        self.evict()
+        self.db.commit()
+
+    # drop least recently used entries until we're back under the size cap
+    def evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        result = {}
+        for kind, hits, misses in self.db.execute("SELECT kind, hits, misses FROM stats"):
+            result[kind] = {"hits": hits, "misses": misses}
+        entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        result["entries"] = entries
+        result["bytes"] = size
+        return result
+
+    def clear(self):
+        self.db.execute("DELETE FROM entries")
+        self.db.execute("DELETE FROM stats")
+        self.db.commit()
+
+# the cache the cli entry points use, None when it's turned off
+def open_cache():
+    if not cache_enabled():
+        return None
+    try:
+        return ScrapeCache()
+    except (sqlite3.Error, OSError) as e:
+        print_flush(f"[!] Scrape cache unavailable, continuing without it ({e})", level="warn")
+        return None
+
+# python scraper/scrape_cache.py stats|clear
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = ScrapeCache()
+    if command == "clear":
+        cache.clear()
+        print("[*] Scrape cache cleared.")
+    else:
+        print(json.dumps(cache.stats(), indent=2))
+    cache.close()
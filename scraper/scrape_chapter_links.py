@@ -1,13 +1,17 @@
 import os
+import re
 import sys
 import random
-from urllib.parse import urlparse, urljoin
-from playwright.sync_api import sync_playwright
+from urllib.parse import urljoin
+from scraper.request_filter import install_request_filter
+from scraper.scrape_cache import open_cache, force_refresh, normalize_url
+from scraper.metrics import track_scrape, span, current_metrics
+from scraper import nav_policy
+from scraper.browser_profile import profiles_enabled, open_profile_context, first_page
+from scraper.har_replay import har_mode, har_context
 
-# print with flush so logs show immediately
-def print_flush(*args, **kwargs):
-    print(*args, **kwargs)
-    sys.stdout.flush()
+# print with flush so logs show immediately (text or ndjson, see events.py)
+from scraper.events import print_flush, emit, is_ndjson
 
 # list of user agents to rotate
 USER_AGENTS = [
@@ -40,10 +44,261 @@ VIEWPORTS = [
     (1440, 900),
 ]
 
-# scrape chapter links from a given URL
-def scrape_chapter_links(url, prepend_base=True):
+# chapter number out of a chapter url, handles 12, 12.5, 12-5 (as 12.5) and ch-12 style links
+CHAPTER_NUMBER_RE = re.compile(r"(?<![a-z])(?:chapter|ch)[-_/. ]*(\d+)(?:[-_.](\d+))?(?=\D|$)", re.IGNORECASE)
+
+# how many index pages incremental mode is allowed to walk through
+MAX_INDEX_PAGES = int(os.getenv("MAX_INDEX_PAGES", "20"))
+
+# finds the way to the next part of a paginated chapter list. "load more" buttons get clicked
+# right here in the page, real next links get handed back so we can navigate to them
+NEXT_INDEX_PAGE_JS = """
+() => {
+    const count = document.querySelectorAll("a[href]").length;
+    const rel = document.querySelector('a[rel="next"], link[rel="next"]');
+    if (rel && rel.href) return { type: "link", href: rel.href, count };
+
+    const nextText = /^\\s*(next( page)?|older( chapters)?|\u203a|\u00bb|>|>>)\\s*$/i;
+    const moreText = /^\\s*(load|show|view|see) (more|all)/i;
+    // "#", "javascript:..." or no href at all: a js widget, clicking it is the only way
+    const realHref = el => {
+        const raw = (el.getAttribute("href") || "").trim();
+        return raw && !raw.startsWith("#") && !/^javascript:/i.test(raw);
+    };
+    // a real "view all" link only counts when it stays under this series' path, the site
+    // header's "view all / see all" goes to some listing page we don't want to crawl
+    const series = location.pathname.replace(/\\/+$/, "");
+    const underSeries = el => el.origin === location.origin && el.pathname.startsWith(series);
+    for (const el of document.querySelectorAll("a, button")) {
+        const text = (el.innerText || el.textContent || "").trim();
+        const isLink = el.tagName === "A" && realHref(el);
+        if (isLink && nextText.test(text)) return { type: "link", href: el.href, count };
+        if (!moreText.test(text)) continue;
+        if (isLink) {
+            if (underSeries(el) && el.href !== location.href) return { type: "link", href: el.href, count };
+            continue;
+        }
+        el.click();
+        return { type: "button", count };
+    }
+    return null;
+}
+"""
+
+def parse_chapter_number(href):
+    match = CHAPTER_NUMBER_RE.search(href or "")
+    if not match:
+        return None
+    number = match.group(1)
+    if match.group(2):
+        number = f"{number}.{match.group(2)}"
+    return float(number)
+
+# known chapters can be given as urls or plain numbers, mixed is fine
+def parse_known(values):
+    known = {"urls": set(), "numbers": set()}
+    for value in values:
+        value = str(value).strip()
+        if not value:
+            continue
+        if value.startswith("http"):
+            known["urls"].add(normalize_url(value))
+        else:
+            try:
+                known["numbers"].add(float(value))
+            except ValueError:
+                continue
+    return known
+
+def is_known(href, number, known):
+    if number is not None and number in known["numbers"]:
+        return True
+    return href.startswith("http") and normalize_url(href) in known["urls"]
+
+# "Grabbed link:" is what the link generator parses, ndjson gets a typed event instead
+def print_link(href, number=None):
+    if is_ndjson():
+        emit("link", url=href, chapter_number=number)
+    else:
+        print_flush(f"Grabbed link: {href}")
+
+# new chapters oldest first, anything without a number goes at the end
+def sort_chapters(chapters):
+    return sorted(chapters, key=lambda ch: (ch["chapter_number"] is None, ch["chapter_number"] or 0))
+
+# try to get more of the chapter list, returns False when there is no next page
+def goto_next_index_page(page, visited):
+    nxt = page.evaluate(NEXT_INDEX_PAGE_JS)
+    if not nxt:
+        return False
+
+    if nxt["type"] == "button":
+        print_flush("[*] Clicked 'load more', waiting for more chapters...")
+        try:
+            page.wait_for_function("n => document.querySelectorAll('a[href]').length > n", arg=nxt["count"], timeout=10000)
+            return True
+        except Exception:
+            return False
+
+    if nxt["href"] in visited:
+        return False
+    visited.add(nxt["href"])
+    print_flush(f"[*] Following next index page: {nxt['href']}")
+    try:
+        nav_policy.goto(page, nxt["href"], kind="index_page")
+        nav_policy.wait_for_selector(page, nxt["href"], "a", kind="wait_links")
+        return True
+    except Exception as e:
+        print_flush(f"[!] Next index page failed: {e}")
+        return False
+
+# a chapter link the way every mode hands it back
+def as_chapter(href):
+    return {"url": href, "chapter_number": parse_chapter_number(href)}
+
+# which way an index lists its chapters, going by the numbers on a page in page order.
+# None when the page doesn't say (fewer than two numbered chapters)
+def index_order(numbers):
+    numbers = [n for n in numbers if n is not None]
+    if len(numbers) < 2 or numbers[0] == numbers[-1]:
+        return None
+    return "newest_first" if numbers[0] > numbers[-1] else "oldest_first"
+
+# whether the walk can stop after this index page. newest first: once known chapters show up,
+# every page after is older still. oldest first: the known chapters are the ones up front, the new ones
+# are on the last pages, so never. no idea: only once a whole page is known
+def reached_known_end(order, new_count, known_count):
+    if known_count == 0 or order == "oldest_first":
+        return False
+    return order == "newest_first" or new_count == 0
+
+# collect chapter links from an already loaded series page, as {"url", "chapter_number"} dicts.
+# known=None is the old behavior (every link on the page, in page order). with a known set we walk the
+# pagination until reached_known_end says stop and only return new ones, sorted oldest first
+def collect_links_on_page(page, url, prepend_base=True, known=None, max_pages=1):
+    chapter_links = []
+    seen_links = set()
+    visited = {page.url}
+    order = None # decided by the first page that shows it
+
+    for page_number in range(1, max_pages + 1):
+
+        # every href on the page in one round trip
+        hrefs = page.eval_on_selector_all("a[href]", "els => els.map(a => a.getAttribute('href'))")
+        base = page.url or url
+        new_on_page = 0
+        known_on_page = 0
+        numbers = []
+
+        for href in hrefs:
+            if not href or "chapter" not in href.lower():
+                continue
+            href = href.strip()
+
+            # normalize relative or protocol-relative URLs
+            if prepend_base:
+                href = urljoin(base, href)
+
+            # skip duplicates
+            if href in seen_links:
+                continue
+            seen_links.add(href)
+
+            number = parse_chapter_number(href)
+            numbers.append(number)
+            if known is not None and is_known(href, number, known):
+                known_on_page += 1
+                continue
+
+            chapter_links.append({"url": href, "chapter_number": number})
+            new_on_page += 1
+            if known is None:
+                print_link(href, number)
+
+        if known is None or page_number == max_pages:
+            break
+        order = order or index_order(numbers)
+        if reached_known_end(order, new_on_page, known_on_page):
+            print_flush(f"[*] Reached chapters we already have on index page {page_number}, stopping.")
+            break
+        # the next page didn't show a single link we hadn't seen yet
+        if new_on_page + known_on_page == 0 and page_number > 1:
+            break
+        if not goto_next_index_page(page, visited):
+            break
+
+    if known is None:
+        return chapter_links
+
+    new_chapters = sort_chapters(chapter_links)
+    for ch in new_chapters:
+        print_link(ch["url"], ch["chapter_number"])
+    return new_chapters
+
+# scrape chapter links from a given URL, cached results come back without starting a browser.
+# pass known (chapter urls or numbers) for incremental mode, that one always hits the live site
+def scrape_chapter_links(url, prepend_base=True, known=None, max_pages=None):
+    with track_scrape(url, kind="chapter_links") as metrics:
+        metrics.tier = "playwright"
+
+        if known is not None:
+            known = parse_known(known)
+            new_chapters = collect_chapter_links(url, prepend_base, known, max_pages or MAX_INDEX_PAGES)
+            metrics.count("links_found", len(new_chapters))
+            print_flush(f"[*] Found {len(new_chapters)} new chapters.")
+            return new_chapters
+
+        variant = "prepend" if prepend_base else "raw"
+        # recorded / replayed sessions (HAR_MODE) always load the page
+        cache = open_cache() if har_mode() is None else None
+
+        if cache is not None and not force_refresh():
+            with span("cache"):
+                cached_links = cache.get("chapter_links", url, variant)
+            if cached_links is not None:
+                metrics.tier = "cache"
+                metrics.count("links_found", len(cached_links))
+                print_flush(f"[*] Cache hit for {url}")
+                chapter_links = [as_chapter(href) for href in cached_links]
+                for ch in chapter_links:
+                    print_link(ch["url"], ch["chapter_number"])
+                print_flush(f"[*] Found {len(chapter_links)} chapter links.")
+                cache.close()
+                return chapter_links
+
+        chapter_links = collect_chapter_links(url, prepend_base, max_pages=max_pages or 1)
+        metrics.count("links_found", len(chapter_links))
+        print_flush(f"[*] Found {len(chapter_links)} chapter links.")
+
+        # only the urls are cached, numbers come back out of them
+        if cache is not None:
+            if chapter_links:
+                cache.put("chapter_links", url, [ch["url"] for ch in chapter_links], variant)
+            cache.close()
+        return chapter_links
+
+def collect_chapter_links(url, prepend_base=True, known=None, max_pages=1):
+    # imported here so a cache hit never pays for loading playwright
+    from playwright.sync_api import sync_playwright
+
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
+
+        # record to / replay from the series page's archive (har_replay.py)
+        if har_mode() is not None:
+            with span("launch"):
+                browser = p.chromium.launch(headless=True)
+            with har_context(browser, url, USER_AGENTS, VIEWPORTS, kind="chapter_links") as context:
+                chapter_links = links_from_page(context.new_page(), url, prepend_base, known, max_pages)
+            browser.close()
+            return chapter_links
+
+        # same persistent per-site profile the image scraper uses, the series page shares its bundles
+        if profiles_enabled():
+            with open_profile_context(p, url, USER_AGENTS, VIEWPORTS) as context:
+                return links_from_page(first_page(context), url, prepend_base, known, max_pages)
+
+        with span("launch"):
+            browser = p.chromium.launch(headless=True)
 
         # pick random user agent and viewport
         user_agent = random.choice(USER_AGENTS)
@@ -53,77 +308,50 @@ def scrape_chapter_links(url, prepend_base=True):
             user_agent=user_agent,
             viewport={"width": viewport_width, "height": viewport_height}
         )
-        page = context.new_page()
-
-        # get base domain for filtering
-        parsed_url = urlparse(url)
-        page_domain = parsed_url.hostname.replace("www.", "") if parsed_url.hostname else ""
-
-        # alow only safe/resource-light requests
-        def should_allow_request(request, page_domain):
-            req_url = request.url.lower()
-            req_domain = urlparse(req_url).hostname
-
-            if request.resource_type in ("document", "image"):
-                return True
-            if request.resource_type in ("script", "stylesheet", "fetch", "xhr"):
-                if req_domain and page_domain in req_domain:
-                    return True
-            print_flush(f"[x] Blocking request: {request.url}")
-            return False
-
-        # route all requests through filter
-        page.route("**/*", lambda route, request: (
-            route.continue_() if should_allow_request(request, page_domain) else route.abort()
-        ))
 
         # log session setup
         print_flush(f"[*] Using user agent: {user_agent}")
         print_flush(f"[*] Using viewport: {viewport_width}x{viewport_height}")
-        print_flush(f"[*] Navigating to URL: {url}")
+
+        chapter_links = links_from_page(context.new_page(), url, prepend_base, known, max_pages)
+        browser.close()
+        return chapter_links
+
+# load the series page on an open tab and collect its chapter links
+def links_from_page(page, url, prepend_base=True, known=None, max_pages=1):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.watch_page(page)
+
+    # alow only safe/resource-light requests, same shared rules as the image scraper
+    request_stats = install_request_filter(page, url)
+
+    print_flush(f"[*] Navigating to URL: {url}")
+
+    # timeouts / retries from the site's history, pagination included in the one deadline
+    with nav_policy.scrape_deadline():
 
         # try to navigate to page
         try:
-            page.goto(url, wait_until="domcontentloaded", timeout=15000)
+            with span("goto"):
+                nav_policy.goto(page, url)
         except Exception as e:
             print_flush(f"[!] Navigation failed: {e}")
             return []
 
         # wait for at least one link
         try:
-            page.wait_for_selector("a", timeout=10000)
+            nav_policy.wait_for_selector(page, url, "a", kind="wait_links")
         except Exception:
             print_flush("[!] No links found or page did not load in time.")
             return []
 
-        # collect all anchors with "chapter" in href
-        anchors = page.query_selector_all("a")
-        chapter_links = []
-        seen_links = set()
-
-        for a in anchors:
-            try:
-                href = a.get_attribute("href")
-                if href and "chapter" in href.lower():
-                    href = href.strip()
+        with span("extract"):
+            chapter_links = collect_links_on_page(page, url, prepend_base, known, max_pages)
 
-                    # normalize relative or protocol-relative URLs
-                    if prepend_base:
-                        href = urljoin(url, href)
-
-                    # skip duplicates
-                    if href not in seen_links:
-                        chapter_links.append(href)
-                        seen_links.add(href)
-                        print_flush(f"Grabbed link: {href}")
-
-            except Exception:
-                continue  # skip bad elements
-
-        # report count and close browser
-        print_flush(f"[*] Found {len(chapter_links)} chapter links.")
-        browser.close()
-        return chapter_links
+    # report, caller closes the browser
+    request_stats.summary()
+    return chapter_links
 
 # entry point for script
 if __name__ == "__main__":
@@ -136,4 +364,10 @@ if __name__ == "__main__":
     prepend_base_env = os.getenv("PREPEND_BASE_URL", "true").lower()
     prepend_base = prepend_base_env in ("true", "1", "yes")
 
-    scrape_chapter_links(target_url, prepend_base)
+    # KNOWN_CHAPTERS turns on incremental mode, comma separated chapter numbers and/or urls
+    known_env = os.getenv("KNOWN_CHAPTERS")
+    known = known_env.split(",") if known_env is not None else None
+
+    links = scrape_chapter_links(target_url, prepend_base, known)
+    if is_ndjson():
+        emit("result", url=target_url, ok=True, links=links)
@@ -0,0 +1,297 @@
+# scraper/scraper_daemon.py
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import itertools
+import socketserver
+from playwright.sync_api import sync_playwright
+
+from scraper.playwright_scraper import new_context, scrape_page, get_scraper, print_flush
+from scraper.static_fetch import scrape_static
+from scraper.network_capture import ImageCapture
+from scraper.metrics import track_scrape, span
+
+# results go to the real stdout as one json per line, all the scraper chatter gets moved to stderr
+RESULT_STREAM = sys.stdout
+
+# fallback ids for jobs that didn't bring their own
+job_ids = itertools.count(1)
+
+# flags can come in as a bool or the usual "true"/"false" string
+def parse_flag(value):
+    if isinstance(value, str):
+        return value.lower() in ("true", "1", "yes")
+    return bool(value)
+
+# turn one line of json into a job
+def parse_job(line):
+    data = json.loads(line)
+    if not isinstance(data, dict) or not data.get("url"):
+        raise ValueError("job needs a 'url'")
+
+    return {
+        "id": data.get("id", next(job_ids)),
+        "url": data["url"].strip(),
+        "lazy": parse_flag(data.get("lazy", False)),
+        "capture": parse_flag(data.get("capture", False)),
+        "static": parse_flag(data.get("static", False)),
+    }
+
+# what a job gets back when it couldn't even get to scraping
+def failed_result(job, error, started):
+    return {
+        "id": job["id"], "url": job["url"], "tier": "playwright", "ok": False, "images": [],
+        "error": str(error), "elapsed": round(time.perf_counter() - started, 3),
+    }
+
+# scrape one job on a fresh tab of a warm context. scrape errors come back as ok=False, only a tab
+# that can't be opened raises (the context is broken and the worker has to replace it)
+def run_job(context, job):
+    started = time.perf_counter()
+    result = {"id": job["id"], "url": job["url"], "tier": "playwright"}
+
+    with track_scrape(job["url"]) as metrics:
+
+        # browserless tier first if the job asked for it, the warm browser only gets used when needed
+        image_urls = None
+        if job["static"]:
+            try:
+                _, scraper = get_scraper(job["url"])
+                with span("static"):
+                    image_urls = scrape_static(job["url"], scraper)
+            except Exception as e:
+                print_flush(f"[!] Static tier failed for {job['url']}, using the browser ({e})", level="warn")
+
+        if image_urls is not None:
+            result.update(images=image_urls, ok=True, tier="static")
+        else:
+            page = context.new_page()
+            try:
+                capture = ImageCapture() if job["capture"] else None
+                result["images"] = scrape_page(page, job["url"], use_lazy=job["lazy"], capture=capture)
+                result["ok"] = True
+            except Exception as e:
+                result["images"] = []
+                result["ok"] = False
+                result["error"] = str(e)
+            finally:
+                try:
+                    page.close()
+                except Exception:
+                    pass
+
+        metrics.tier = result["tier"]
+        metrics.ok = result["ok"]
+        metrics.count("images_found", len(result["images"]))
+
+    result["elapsed"] = round(time.perf_counter() - started, 3)
+    result["metrics"] = metrics.summary()
+    return result
+
+# one thread = one playwright instance + one warm browser. sync playwright can't be shared across threads.
+# whatever happens, every job it takes gets a reply, otherwise whoever submitted it waits forever
+class BrowserWorker(threading.Thread):
+    def __init__(self, worker_id, jobs, pages_per_context):
+        super().__init__(name=f"browser-worker-{worker_id}", daemon=True)
+        self.worker_id = worker_id
+        self.jobs = jobs
+        self.pages_per_context = pages_per_context
+        self.browser = None
+        self.context = None
+        self.pages_served = 0
+
+    def run(self):
+        try:
+            with sync_playwright() as p:
+                self.serve(p)
+        except Exception as e:
+            # playwright itself won't start, nothing to relaunch. answer the jobs instead of hanging them
+            print_flush(f"[!] Worker {self.worker_id} couldn't start playwright: {e}", level="error")
+            self.reject_all(e)
+
+    def serve(self, p):
+        try:
+            self.ready(p)
+            print_flush(f"[*] Worker {self.worker_id} ready (browser warm)")
+        except Exception as e:
+            print_flush(f"[!] Worker {self.worker_id} couldn't launch a browser yet ({e}), trying again on the first job", level="warn")
+
+        while True:
+            job, reply = self.jobs.get()
+            if job is None:
+                break
+
+            started = time.perf_counter()
+            try:
+                self.ready(p)
+                result = run_job(self.context, job)
+                self.pages_served += 1
+            except Exception as e:
+                # launch / context / tab failed. start from a clean browser on the next job
+                print_flush(f"[!] Worker {self.worker_id} browser failed on job {job['id']} ({e}), relaunching", level="warn")
+                result = failed_result(job, e, started)
+                self.reset()
+            reply(result)
+
+        self.reset()
+
+    # a connected browser and a context that isn't due for recycling
+    def ready(self, p):
+        # browser died on us, get a new one instead of failing every job after this
+        if self.browser is not None and not self.browser.is_connected():
+            print_flush(f"[!] Worker {self.worker_id} browser disconnected, relaunching")
+            self.reset()
+        if self.browser is None:
+            self.browser = p.chromium.launch(headless=True)
+
+        # recycle the context every so often so memory doesn't just keep climbing
+        if self.context is None or self.pages_served >= self.pages_per_context:
+            if self.context is not None:
+                print_flush(f"[*] Worker {self.worker_id} recycling context after {self.pages_served} pages")
+                self.context.close()
+                self.context = None
+            self.context = new_context(self.browser)
+            self.pages_served = 0
+
+    def reset(self):
+        for thing in (self.context, self.browser):
+            if thing is not None:
+                try:
+                    thing.close()
+                except Exception:
+                    pass
+        self.browser = None
+        self.context = None
+        self.pages_served = 0
+
+    def reject_all(self, error):
+        while True:
+            job, reply = self.jobs.get()
+            if job is None:
+                break
+            reply(failed_result(job, error, time.perf_counter()))
+
+# pool of warm browsers all pulling from the same queue
+class BrowserPool:
+    def __init__(self, workers=2, pages_per_context=20):
+        self.jobs = queue.Queue()
+        self.workers = [BrowserWorker(i + 1, self.jobs, pages_per_context) for i in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, job, reply):
+        self.jobs.put((job, reply))
+
+    def shutdown(self):
+        for _ in self.workers:
+            self.jobs.put((None, None))
+        for worker in self.workers:
+            worker.join()
+
+# thread safe json line writer, results stream back as soon as each job finishes
+def make_writer(stream):
+    lock = threading.Lock()
+
+    def write(result):
+        with lock:
+            stream.write(json.dumps(result) + "\n")
+            stream.flush()
+
+    return write
+
+# read jobs from stdin until EOF, then wait for everything in flight to finish
+def serve_stdin(pool):
+    write = make_writer(RESULT_STREAM)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            job = parse_job(line)
+        except ValueError as e:
+            write({"ok": False, "error": f"bad job: {e}"})
+            continue
+        pool.submit(job, write)
+
+# same protocol over a local socket, every connection gets its own results back
+class JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        wfile = self.wfile
+
+        class SocketStream:
+            def write(self, data):
+                wfile.write(data.encode("utf-8"))
+
+            def flush(self):
+                wfile.flush()
+
+        write = make_writer(SocketStream())
+        pending = []
+
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            try:
+                job = parse_job(line)
+            except ValueError as e:
+                write({"ok": False, "error": f"bad job: {e}"})
+                continue
+
+            done = threading.Event()
+
+            def reply(result, done=done):
+                try:
+                    write(result)
+                except OSError:
+                    pass  # client hung up, nothing to do
+                done.set()
+
+            pending.append(done)
+            self.server.pool.submit(job, reply)
+
+        # client closed its side, don't drop the connection until all its jobs are answered
+        for done in pending:
+            done.wait()
+
+class JobServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, pool):
+        super().__init__(address, JobHandler)
+        self.pool = pool
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived scraper with a pool of warm browsers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("DAEMON_WORKERS", "2")))
+    parser.add_argument("--pages-per-context", type=int, default=int(os.getenv("DAEMON_PAGES_PER_CONTEXT", "20")))
+    parser.add_argument("--port", type=int, default=int(os.getenv("DAEMON_PORT", "0")),
+                        help="listen on 127.0.0.1:PORT instead of reading jobs from stdin")
+    args = parser.parse_args()
+
+    # keep stdout clean for results, logs still show up on stderr
+    sys.stdout = sys.stderr
+
+    pool = BrowserPool(workers=args.workers, pages_per_context=args.pages_per_context)
+
+    try:
+        if args.port:
+            with JobServer(("127.0.0.1", args.port), pool) as server:
+                print_flush(f"[*] Listening for jobs on 127.0.0.1:{args.port}")
+                server.serve_forever()
+        else:
+            serve_stdin(pool)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown()
+        print_flush("Worm daemon has wormed goodbye.")
+
+# cli entry point. jobs are json lines like {"id": 1, "url": "...", "lazy": true, "capture": false, "static": false}
+if __name__ == "__main__":
+    main()
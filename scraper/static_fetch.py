@@ -0,0 +1,145 @@
+# scraper/static_fetch.py
+
+import os
+import re
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from scraper.playwright_utils import print_flush
+from scraper.host_scheduler import get_scheduler
+from scraper.recurring_assets import drop_recurring
+from scraper.domains import get_site
+from scraper.image_probe import probe_many, looks_like_page
+
+# browserless tier: plain http + the same image rules the domain scrapers use.
+# only good enough when the chapter's images are already sitting in the html
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+
+# fewer kept images than this and we assume the page builds itself with js
+MIN_STATIC_IMAGES = int(os.getenv("MIN_STATIC_IMAGES", "3"))
+
+# if more than this share of the <img> tags are lazy placeholders, the real urls only show up after scrolling
+MAX_PLACEHOLDER_RATIO = 0.2
+
+PLACEHOLDER_HINTS = re.compile(r"^data:|placeholder|blank\.|lazy|loading|spinner|1x1", re.I)
+
+# one pooled keep-alive session for the whole process
+session = requests.Session()
+session.headers.update({
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+})
+session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+def static_first_enabled():
+    return os.getenv("STATIC_FIRST", "false").lower() in ("true", "1", "yes")
+
+def fetch_html(url, timeout=10):
+    scheduler = get_scheduler()
+    with scheduler.slot(url):
+        response = session.get(url, timeout=timeout)
+    scheduler.report(url, response.status_code, response.headers.get("Retry-After"))
+    response.raise_for_status()
+    return response.text
+
+def parse_size(value):
+    try:
+        return float(str(value).strip().rstrip("px"))
+    except (TypeError, ValueError):
+        return None
+
+# same record shape as extract_images, sizes come from width/height attributes (None when missing)
+def parse_image_records(html, selector="img"):
+    soup = BeautifulSoup(html, "html.parser")
+    records = []
+    for index, img in enumerate(soup.select(selector)):
+        records.append({
+            "index": index,
+            "src": img.get("src"),
+            "data-src": img.get("data-src"),
+            "data-lazy-src": img.get("data-lazy-src"),
+            "data-original": img.get("data-original"),
+            "srcset": img.get("srcset"),
+            "natural_width": 0,
+            "natural_height": 0,
+            "width": parse_size(img.get("width")),
+            "height": parse_size(img.get("height")),
+        })
+    return records
+
+def is_placeholder(record):
+    src = (record.get("src") or "").strip()
+    lazy_src = record.get("data-src") or record.get("data-lazy-src") or record.get("data-original")
+    return bool(lazy_src and src and PLACEHOLDER_HINTS.search(src))
+
+# reason string if the static result can't be trusted, None if it looks complete
+def incomplete_reason(records, image_urls):
+    if len(image_urls) < MIN_STATIC_IMAGES:
+        return f"only {len(image_urls)} images in the html"
+    placeholders = sum(1 for r in records if is_placeholder(r))
+    if records and placeholders / len(records) > MAX_PLACEHOLDER_RATIO:
+        return f"{placeholders}/{len(records)} images are lazy placeholders"
+    return None
+
+# sites with a size rule (min_width / min_height in the registry) let images without width/height
+# attributes through, their keep_image has nothing to check. asura's suggested-series thumbnails sit
+# under the same cdn prefix as the pages, so those sizes come from the image headers instead.
+# returns the urls that pass, or None when some can't be sized and only the browser can tell
+def check_sizes(records, image_urls, url):
+    site = get_site(url)
+    if not site["min_width"] and not site["min_height"]:
+        return image_urls
+
+    unsized = set()
+    for record in records:
+        if record["width"] is None or record["height"] is None:
+            unsized.update(record.get(key) for key in ("src", "data-src", "data-lazy-src", "data-original"))
+    todo = [u for u in image_urls if u in unsized]
+    if not todo:
+        return image_urls
+
+    probes = probe_many(todo, referer=url)
+    missing = [u for u in todo if not probes.get(u)]
+    if missing:
+        print_flush(f"[*] Couldn't read the size of {len(missing)} images, escalating to browser")
+        return None
+    small = {
+        u for u in todo
+        if not looks_like_page(probes[u], site["min_width"] or 0, site["min_height"] or 0, float("inf"))
+    }
+    if small:
+        print_flush(f"[*] Dropped {len(small)} images below the site's page size")
+    return [u for u in image_urls if u not in small]
+
+# try to scrape the chapter with a single http request. returns the image urls, or None when we should
+# escalate to playwright (fetch failed or the result looks incomplete)
+def scrape_static(url, scraper):
+    print_flush(f"[*] Trying static fetch first: {url}")
+    try:
+        html = fetch_html(url)
+    except requests.RequestException as e:
+        print_flush(f"[!] Static fetch failed, escalating to browser ({e})")
+        return None
+
+    records = parse_image_records(html, scraper.IMAGE_SELECTOR)
+    image_urls = scraper.filter_images(records, url)
+
+    image_urls = check_sizes(records, image_urls, url)
+    if image_urls is None:
+        return None
+
+    reason = incomplete_reason(records, image_urls)
+    if reason:
+        print_flush(f"[*] Static result looks incomplete ({reason}), escalating to browser")
+        return None
+
+    # no layout here, so scrapers that need a size check get to do it off the image headers
+    if hasattr(scraper, "post_filter"):
+        image_urls = scraper.post_filter(image_urls, url)
+    image_urls = drop_recurring(url, image_urls)
+
+    print_flush(f"[*] Static fetch got {len(image_urls)} images from {len(records)} <img> tags")
+    return image_urls
@@ -0,0 +1,7 @@
+# scraper/tests/conftest.py
+
+import os
+import sys
+
+# the scripts run as `python scraper/x.py` with the repo root on PYTHONPATH, do the same for pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -0,0 +1,73 @@
+# scraper/tests/test_chapter_links.py
+
+import pytest
+
+from scraper import nav_policy
+from scraper.scrape_chapter_links import parse_chapter_number, parse_known, collect_links_on_page
+
+@pytest.mark.parametrize("href, expected", [
+    ("https://site/series/foo/ch-12.5", 12.5),
+    ("https://site/series/foo/chapter_3", 3.0),
+    ("https://site/series/foo/chapter/10/", 10.0),
+    ("https://site/series/foo/chapter-12-5", 12.5),
+    ("https://site/series/foo/Chapter 7", 7.0),
+    ("https://site/series/foo-chapter-2?x=1", 2.0),
+    ("https://site/series/foo/epoch-4", None),
+    ("https://site/series/foo/chapters", None),
+    (None, None),
+])
+def test_parse_chapter_number(href, expected):
+    assert parse_chapter_number(href) == expected
+
+# index pages as lists of hrefs, "next" goes to the following one
+class FakeIndex:
+    def __init__(self, pages):
+        self.pages = pages
+        self.current = 0
+        self.url = "https://site/series/foo?page=1"
+
+    def eval_on_selector_all(self, selector, script):
+        return self.pages[self.current]
+
+    def evaluate(self, script):
+        if self.current + 1 >= len(self.pages):
+            return None
+        return {"type": "link", "href": f"https://site/series/foo?page={self.current + 2}", "count": 0}
+
+@pytest.fixture
+def index(monkeypatch):
+    def goto(page, href, **kwargs):
+        page.current += 1
+        page.url = href
+    monkeypatch.setattr(nav_policy, "goto", goto)
+    monkeypatch.setattr(nav_policy, "wait_for_selector", lambda *args, **kwargs: None)
+
+def chapters(*numbers):
+    return [f"/series/foo/chapter-{n}" for n in numbers]
+
+def test_legacy_mode_returns_dicts_in_page_order(index):
+    links = collect_links_on_page(FakeIndex([chapters(3, 1, 2)]), "https://site/series/foo")
+    assert links == [{"url": f"https://site/series/foo/chapter-{n}", "chapter_number": float(n)} for n in (3, 1, 2)]
+
+def test_oldest_first_index_keeps_walking_past_known_chapters(index):
+    page = FakeIndex([chapters(1, 2, 3), chapters(4, 5, 6), chapters(7, 8)])
+    links = collect_links_on_page(page, "https://site/series/foo", known=parse_known(["1", "2", "3", "4"]), max_pages=5)
+    assert [ch["chapter_number"] for ch in links] == [5.0, 6.0, 7.0, 8.0]
+
+def test_oldest_first_index_walks_through_pages_that_are_all_known(index):
+    page = FakeIndex([chapters(1, 2, 3), chapters(4, 5, 6), chapters(7, 8)])
+    links = collect_links_on_page(page, "https://site/series/foo", known=parse_known(["1", "2", "3", "4", "5", "6"]), max_pages=5)
+    assert [ch["chapter_number"] for ch in links] == [7.0, 8.0]
+
+def test_newest_first_index_stops_at_known_chapters(index):
+    page = FakeIndex([chapters(8, 7, 6), chapters(5, 4, 3), chapters(2, 1)])
+    links = collect_links_on_page(page, "https://site/series/foo", known=parse_known(["1", "2", "3", "4"]), max_pages=5)
+    assert [ch["chapter_number"] for ch in links] == [5.0, 6.0, 7.0, 8.0]
+    assert page.current == 1
+
+# one chapter per page says nothing about the order, a page with only known chapters ends it
+def test_whole_page_known_stops_the_walk_when_the_order_is_unclear(index):
+    page = FakeIndex([chapters(3), chapters(2), chapters(1)])
+    links = collect_links_on_page(page, "https://site/series/foo", known=parse_known(["2"]), max_pages=5)
+    assert [ch["chapter_number"] for ch in links] == [3.0]
+    assert page.current == 1
@@ -0,0 +1,74 @@
+# scraper/tests/test_image_probe.py
+
+import struct
+
+import pytest
+
+from scraper.image_probe import parse_image_header, looks_like_page
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x02\x00\x00\x00"
+
+def gif(width, height):
+    return b"GIF89a" + struct.pack("<HH", width, height) + b"\x00\x00\x00"
+
+# SOI, an APP0 segment to skip over, then the frame header. ends right after the dimensions
+def jpeg(width, height, marker=0xC0):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof = bytes([0xFF, marker]) + struct.pack(">HBHH", 17, 8, height, width)
+    return b"\xff\xd8" + app0 + sof
+
+def riff(chunk, payload):
+    body = b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+def webp_lossy(width, height):
+    return riff(b"VP8 ", b"\x00\x00\x00" + b"\x9d\x01\x2a" + struct.pack("<HH", width, height))
+
+def webp_lossless(width, height):
+    bits = (width - 1) | ((height - 1) << 14)
+    return riff(b"VP8L", b"\x2f" + bits.to_bytes(4, "little"))
+
+def webp_extended(width, height):
+    return riff(b"VP8X", b"\x00\x00\x00\x00" + (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little"))
+
+@pytest.mark.parametrize("data, expected", [
+    (png(800, 1200), {"format": "png", "width": 800, "height": 1200}),
+    (gif(320, 240), {"format": "gif", "width": 320, "height": 240}),
+    (jpeg(720, 5000), {"format": "jpeg", "width": 720, "height": 5000}),
+    (jpeg(720, 5000, marker=0xC2), {"format": "jpeg", "width": 720, "height": 5000}),
+    (webp_lossy(690, 1035), {"format": "webp", "width": 690, "height": 1035}),
+    (webp_lossless(300, 16383), {"format": "webp", "width": 300, "height": 16383}),
+    (webp_extended(1600, 40000), {"format": "webp", "width": 1600, "height": 40000}),
+], ids=["png", "gif", "jpeg-baseline", "jpeg-progressive", "webp-vp8", "webp-vp8l", "webp-vp8x"])
+def test_parse_image_header(data, expected):
+    assert parse_image_header(data) == expected
+
+def test_jpeg_ending_right_after_the_frame_size():
+    data = jpeg(100, 200)
+    assert len(data) == 29
+    assert parse_image_header(data)["width"] == 100
+
+def test_jpeg_huffman_table_is_not_a_frame_header():
+    dht = b"\xff\xc4" + struct.pack(">H", 6) + b"\x00\x00\x00\x00"
+    data = b"\xff\xd8" + dht + bytes([0xFF, 0xC0]) + struct.pack(">HBHH", 17, 8, 50, 60)
+    assert parse_image_header(data) == {"format": "jpeg", "width": 60, "height": 50}
+
+@pytest.mark.parametrize("data", [
+    b"",
+    png(800, 1200)[:20],
+    gif(320, 240)[:8],
+    jpeg(720, 5000)[:-2],
+    webp_lossy(690, 1035)[:28],
+    webp_extended(1600, 40000)[:26],
+    b"not an image at all",
+], ids=["empty", "png", "gif", "jpeg", "webp-vp8", "webp-vp8x", "garbage"])
+def test_truncated_or_unknown_input(data):
+    assert parse_image_header(data) is None
+
+def test_looks_like_page():
+    assert looks_like_page({"width": 800, "height": 1200})
+    assert not looks_like_page({"width": 100, "height": 1200})
+    assert not looks_like_page({"width": 1600, "height": 400})
+    # unknown sizes are kept
+    assert looks_like_page(None)
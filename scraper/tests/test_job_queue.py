@@ -0,0 +1,94 @@
+# scraper/tests/test_job_queue.py
+
+import time
+
+import pytest
+
+from scraper.job_queue import JobQueue
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(":memory:")
+    yield queue
+    queue.close()
+
+def expire_lease(queue, job_id):
+    queue.db.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+def make_due(queue, job_id):
+    queue.db.execute("UPDATE jobs SET available_at = 0 WHERE id = ?", (job_id,))
+
+def state_of(queue, job_id):
+    return queue.db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()["state"]
+
+def test_add_skips_urls_already_in_the_batch(queue):
+    assert queue.add(["https://a/1", "https://a/2"]) == 2
+    assert queue.add(["https://a/2", "https://a/3"]) == 1
+
+def test_a_job_is_only_claimed_once(queue):
+    queue.add(["https://a/1"])
+    first = queue.claim("w1")
+    assert first is not None and first["attempts"] == 1
+    assert queue.claim("w2") is None
+
+def test_expired_lease_gets_taken_over(queue):
+    queue.add(["https://a/1"])
+    first = queue.claim("w1")
+    expire_lease(queue, first["id"])
+
+    second = queue.claim("w2")
+    assert second["id"] == first["id"]
+    assert second["attempts"] == 2
+    assert queue.renew(first["id"], "w1") is False
+    assert queue.renew(second["id"], "w2") is True
+
+def test_worker_that_lost_its_lease_cant_finish_the_job(queue):
+    queue.add(["https://a/1"])
+    first = queue.claim("w1")
+    expire_lease(queue, first["id"])
+    second = queue.claim("w2")
+
+    assert queue.complete(first, "w1", {"images": ["x"]}) is False
+    assert queue.fail(first, "w1", "late failure") is None
+    assert state_of(queue, first["id"]) == "running"
+
+    assert queue.complete(second, "w2", {"images": ["x"]}) is True
+    assert state_of(queue, first["id"]) == "done"
+
+def test_same_worker_name_with_an_older_attempt_is_refused(queue):
+    queue.add(["https://a/1"])
+    first = queue.claim("w1")
+    expire_lease(queue, first["id"])
+    queue.claim("w1")
+    assert queue.complete(first, "w1", {"images": []}) is False
+
+def test_fail_requeues_until_max_attempts_then_fails(queue):
+    queue.add(["https://a/1"], max_attempts=2)
+
+    job = queue.claim("w1")
+    assert queue.fail(job, "w1", "boom") == "queued"
+    assert state_of(queue, job["id"]) == "queued"
+    # retries wait out their backoff first
+    assert queue.claim("w1") is None
+
+    make_due(queue, job["id"])
+    job = queue.claim("w1")
+    assert job["attempts"] == 2
+    assert queue.fail(job, "w1", "boom again") == "failed"
+    assert state_of(queue, job["id"]) == "failed"
+    assert not queue.has_pending()
+
+def test_crashed_last_attempt_is_marked_failed_on_claim(queue):
+    queue.add(["https://a/1"], max_attempts=1)
+    job = queue.claim("w1")
+    expire_lease(queue, job["id"])
+
+    assert queue.claim("w2") is None
+    assert state_of(queue, job["id"]) == "failed"
+
+def test_retry_failed_puts_jobs_back(queue):
+    queue.add(["https://a/1"], max_attempts=1)
+    job = queue.claim("w1")
+    queue.fail(job, "w1", "boom")
+    assert queue.retry_failed() == 1
+    assert queue.claim("w1")["attempts"] == 1
@@ -0,0 +1,26 @@
+# scraper/tests/test_network_capture.py
+
+from types import SimpleNamespace
+
+from scraper.network_capture import IMAGE_URL_PATTERN, ImageCapture
+
+def capture_of(*urls):
+    capture = ImageCapture()
+    for url in urls:
+        capture.record(SimpleNamespace(url=url, headers={}))
+    return capture
+
+def test_only_image_urls_are_routed():
+    assert IMAGE_URL_PATTERN.search("https://cdn/a/001.JPG")
+    assert IMAGE_URL_PATTERN.search("https://cdn/a/001.webp?w=720")
+    assert not IMAGE_URL_PATTERN.search("https://site/app.js")
+    assert not IMAGE_URL_PATTERN.search("https://site/jpg/chapter-1")
+
+def test_report_returns_the_network_order_when_it_matches():
+    capture = capture_of("https://cdn/2.jpg", "https://cdn/logo.png", "https://cdn/1.jpg")
+    assert capture.report(["https://cdn/1.jpg", "https://cdn/2.jpg"]) == ["https://cdn/2.jpg", "https://cdn/1.jpg"]
+
+def test_report_keeps_the_dom_list_when_the_wire_missed_images():
+    capture = capture_of("https://cdn/1.jpg")
+    dom = ["https://cdn/1.jpg", "https://cdn/2"]
+    assert capture.report(dom) == dom
@@ -0,0 +1,99 @@
+# scraper/tests/test_prefetch.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from scraper import host_scheduler, nav_policy
+from scraper.metrics import track_scrape
+from scraper.prefetch import Prefetcher, is_preloaded
+
+# asuracomic.net has 2 slots in the registry
+SERIES = "https://asuracomic.net/series/foo"
+
+class FakePage:
+    def __init__(self, status=200, loads=True):
+        self.status = status
+        self.loads = loads
+        self.handlers = {}
+        self.main_frame = object()
+        self.closed = False
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def once(self, event, handler):
+        self.on(event, handler)
+
+    def fire(self, event, value):
+        for handler in self.handlers.get(event, []):
+            handler(value)
+
+    # the navigation happens right away: document response, then domcontentloaded
+    def evaluate(self, script, url):
+        request = SimpleNamespace(is_navigation_request=lambda: True)
+        self.fire("response", SimpleNamespace(request=request, frame=self.main_frame, status=self.status, headers={"content-length": "100"}))
+        if self.loads:
+            self.fire("domcontentloaded", self)
+
+    def wait_for_url(self, predicate, wait_until=None, timeout=None):
+        if not self.loads:
+            raise TimeoutError("Timeout 30000ms exceeded")
+
+    def close(self):
+        self.closed = True
+
+class FakeContext:
+    def __init__(self, **page_kwargs):
+        self.page_kwargs = page_kwargs
+        self.pages = []
+
+    def new_page(self):
+        self.pages.append(FakePage(**self.page_kwargs))
+        return self.pages[-1]
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = host_scheduler.HostScheduler()
+    monkeypatch.setattr(host_scheduler, "_shared", scheduler)
+    return scheduler
+
+@pytest.fixture
+def recorded(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(nav_policy, "record", lambda domain, kind, seconds=None, ok=True: recorded.append((domain, ok)))
+    monkeypatch.setattr(nav_policy, "timeout_ms", lambda domain, kind="goto": 30000)
+    return recorded
+
+def test_prefetch_leaves_one_slot_free_for_the_current_chapter(scheduler, recorded):
+    prefetcher = Prefetcher(FakeContext(), depth=3)
+    prefetcher.fill([f"{SERIES}/chapter/{n}" for n in (2, 3, 4)])
+    assert list(prefetcher.pending) == [f"{SERIES}/chapter/2"]
+    prefetcher.close()
+
+def test_take_reports_status_records_latency_and_moves_counters(scheduler, recorded):
+    url = f"{SERIES}/chapter/2"
+    prefetcher = Prefetcher(FakeContext(status=429), depth=1)
+    prefetcher.fill([url])
+    state = scheduler.state_for(url)
+
+    with track_scrape(url) as metrics:
+        page = prefetcher.take(url)
+    assert is_preloaded(page, url)
+    assert metrics.counters["requests"] == 1
+    assert recorded == [("asuracomic.net", True)]
+    # the 429 put the host on hold
+    assert state.strikes == 1
+    # both slots are free again
+    assert state.semaphore.acquire(blocking=False) and state.semaphore.acquire(blocking=False)
+
+def test_failed_prefetch_gives_its_slot_back(scheduler, recorded):
+    url = f"{SERIES}/chapter/2"
+    prefetcher = Prefetcher(FakeContext(loads=False), depth=1)
+    prefetcher.fill([url])
+
+    assert prefetcher.take(url) is None
+    assert prefetcher.pending == {}
+    assert recorded == [("asuracomic.net", False)]
+    state = scheduler.state_for(url)
+    assert state.semaphore.acquire(blocking=False) and state.semaphore.acquire(blocking=False)
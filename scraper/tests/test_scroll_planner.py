@@ -0,0 +1,60 @@
+# scraper/tests/test_scroll_planner.py
+
+import pytest
+
+from scraper import playwright_utils
+from scraper.playwright_utils import ScrollPlanner
+
+# time.monotonic as far as the planner is concerned, tests move it by hand
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(playwright_utils.time, "monotonic", clock)
+    return clock
+
+def state(scroll_y, height=5000, viewport=800, pending=0, images=0, waited=200):
+    return {"scrollY": scroll_y, "scrollHeight": height, "viewportHeight": viewport, "pending": pending, "images": images, "waited": waited}
+
+def test_stops_at_the_bottom_once_it_settles(clock):
+    planner = ScrollPlanner(800, settle_checks=2)
+    assert planner.update(state(0, images=3))
+    assert planner.update(state(4200))
+    assert not planner.update(state(4200))
+    assert planner.stop_reason == "bottom"
+
+def test_new_images_at_the_bottom_keep_it_going(clock):
+    planner = ScrollPlanner(800, settle_checks=2)
+    planner.update(state(4200))
+    assert planner.update(state(4200, images=2))
+    assert planner.stop_reason is None
+
+def test_window_that_never_moves_is_not_scrolling(clock):
+    planner = ScrollPlanner(800, settle_checks=2, stuck_seconds=2.5)
+    assert planner.update(state(100))
+    assert planner.update(state(100))
+    # stuck for enough steps but not long enough yet
+    assert planner.update(state(100))
+    clock.now += 3
+    assert not planner.update(state(100))
+    assert planner.stop_reason == "not scrolling"
+
+def test_step_budget(clock):
+    planner = ScrollPlanner(800, max_steps=3)
+    assert planner.update(state(0, images=1))
+    assert planner.update(state(800, images=1))
+    assert not planner.update(state(1600, images=1))
+    assert planner.stop_reason == "step budget"
+
+def test_time_budget(clock):
+    planner = ScrollPlanner(800, max_seconds=10)
+    assert planner.update(state(0, images=1))
+    clock.now += 11
+    assert not planner.update(state(800, images=1))
+    assert planner.stop_reason == "time budget"
@@ -8,6 +8,8 @@ export async function GET(req: NextRequest) {
   if (!targetUrl) return new Response("Missing 'url' query", { status: 400 });
 
   const prependBase = searchParams.get("prependBase") ?? "true";
+  // optional comma separated chapter numbers/urls we already have, turns on incremental mode
+  const known = searchParams.get("known");
 
   const encoder = new TextEncoder();
 
@@ -27,6 +29,7 @@ export async function GET(req: NextRequest) {
               TARGET_URL: targetUrl,
               PREPEND_BASE_URL: prependBase,
               USE_LAZY: "true",
+              ...(known !== null ? { KNOWN_CHAPTERS: known } : {}),
               PYTHONPATH: path.join(process.cwd()),
             },
           }
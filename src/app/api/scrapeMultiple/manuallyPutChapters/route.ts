@@ -20,58 +20,49 @@ export async function GET(req: NextRequest) {
 
   const encoder = new TextEncoder();
 
+  const concurrency = searchParams.get("concurrency") ?? "4";
+
   const stream = new ReadableStream({
     async start(controller) {
-      for (let i = 0; i < urls.length; i++) {
-        const url = urls[i];
+      urls.forEach((url, i) =>
         controller.enqueue(
           encoder.encode(`data: [Chapter ${i + 1}] Starting scrape: ${url}\n\n`)
-        );
+        )
+      );
 
-        // spawn Python scraper for each URL
-        await new Promise<void>((resolve) => {
-          const python = spawn(
-            "python",
-            ["-u", "scraper/playwright_scraper.py"],
-            {
-              env: {
-                ...process.env,
-                TARGET_URL: url,
-                USE_LAZY: lazyFlag,
-                PYTHONPATH: path.join(process.cwd()),
-              },
-            }
-          );
+      // one python process scrapes every url concurrently in a single browser,
+      // it prefixes its own [Chapter N] lines so they can come back in any order
+      await new Promise<void>((resolve) => {
+        const python = spawn("python", ["-u", "scraper/async_scraper.py"], {
+          env: {
+            ...process.env,
+            TARGET_URLS: urls.join("\n"),
+            USE_LAZY: lazyFlag,
+            SCRAPE_CONCURRENCY: concurrency,
+            PYTHONPATH: path.join(process.cwd()),
+          },
+        });
 
-          python.stdout.on("data", (data) => {
-            const lines = data.toString().split("\n");
-            for (const line of lines) {
-              if (line.trim()) {
-                controller.enqueue(
-                  encoder.encode(`data: [Chapter ${i + 1}] ${line}\n\n`)
-                );
-              }
+        python.stdout.on("data", (data) => {
+          const lines = data.toString().split("\n");
+          for (const line of lines) {
+            if (line.trim()) {
+              controller.enqueue(encoder.encode(`data: ${line}\n\n`));
             }
-          });
+          }
+        });
 
-          python.stderr.on("data", (data) => {
-            const lines = data.toString().split("\n");
-            for (const line of lines) {
-              if (line.trim()) {
-                controller.enqueue(
-                  encoder.encode(`data: [Chapter ${i + 1}][stderr] ${line}\n\n`)
-                );
-              }
+        python.stderr.on("data", (data) => {
+          const lines = data.toString().split("\n");
+          for (const line of lines) {
+            if (line.trim()) {
+              controller.enqueue(encoder.encode(`data: [stderr] ${line}\n\n`));
             }
-          });
-
-          python.on("close", () => resolve());
+          }
         });
 
-        controller.enqueue(
-          encoder.encode(`data: [Chapter ${i + 1}] Finished scraping.\n\n`)
-        );
-      }
+        python.on("close", () => resolve());
+      });
 
       controller.enqueue(encoder.encode("event: end\ndata: done\n\n"));
       controller.close();